@@ -2,10 +2,47 @@ from flask import Flask, request, jsonify, send_from_directory, render_template_
 import os
 from celery_tasks import celery_upload_pdf
 import base64
+import hashlib
+import shutil
+import threading
+import time
+from result_index import ResultIndex
 
 app = Flask(__name__)
 current_dir = os.getcwd()
 FINAL_OUTPUT_FOLDER = os.path.join(current_dir, "./flask_received_images")
+# 结果索引的 SQLite 数据库路径
+RESULT_INDEX_PATH = os.path.join(current_dir, "./result_index.sqlite3")
+# 结果保留时间（秒），超过后由清理线程删除；0 表示不清理
+RESULT_RETENTION_SECONDS = int(os.environ.get("RESULT_RETENTION_SECONDS", 0))
+# 清理线程的运行间隔（秒）
+RESULT_SWEEP_INTERVAL = 3600
+# 列表和搜索接口每页返回的最大条数
+MAX_PAGE_SIZE = 500
+
+result_index = ResultIndex(RESULT_INDEX_PATH)
+
+def build_response(file_id, files):
+    """
+    根据结果文件列表构建 /upload 的 JSON 响应。
+
+    :param file_id: 文件的唯一 ID
+    :param files: 结果文件名列表
+    :return: 包含图片和 JSON 文件下载 URL 的字典
+    """
+    response_data = {
+        "images": [f"/download/{file_id}/{name}" for name in files if name != 'processed_figures.json']
+    }
+    if 'processed_figures.json' in files:
+        response_data["json"] = f"/download/{file_id}/processed_figures.json"
+    return response_data
+
+def get_page_args():
+    """读取分页参数 limit 和 offset"""
+    limit = min(request.args.get('limit', 50, type=int), MAX_PAGE_SIZE)
+    offset = request.args.get('offset', 0, type=int)
+    return max(limit, 0), max(offset, 0)
+
 # 主页路由，返回简短的介绍
 @app.route('/')
 def index():
@@ -30,6 +67,13 @@ def upload_pdf():
         # 获取文件并转为 base64 编码
         file = request.files['file']
         file_content = file.read()
+
+        # 相同的 PDF 已处理过时直接返回已有的结果
+        cached = result_index.find_by_hash(hashlib.sha1(file_content).hexdigest())
+        if cached and os.path.isdir(os.path.join(FINAL_OUTPUT_FOLDER, cached['file_id'])):
+            files = result_index.get_files(cached['file_id'])
+            return jsonify(build_response(cached['file_id'], files)), 200
+
         file_base64 = base64.b64encode(file_content).decode('utf-8')
 
         # 调用 Celery 任务并传递 base64 编码文件
@@ -57,8 +101,8 @@ def download_image(file_id, filename):
     # 构建图片的存储路径
     target_dir = os.path.join(FINAL_OUTPUT_FOLDER, file_id)
     
-    # 检查图片文件是否存在
-    if os.path.exists(os.path.join(target_dir, filename)):
+    # 先查结果索引，索引建立之前的结果再检查文件是否存在
+    if result_index.has_file(file_id, filename) or os.path.exists(os.path.join(target_dir, filename)):
         # 使用 Flask 的 `send_from_directory` 函数发送文件
         return send_from_directory(target_dir, filename)
     else:
@@ -76,8 +120,8 @@ def download_json(file_id):
     # 构建处理后的 JSON 文件路径
     json_file_path = os.path.join(FINAL_OUTPUT_FOLDER, file_id, 'processed_figures.json')
     
-    # 检查 JSON 文件是否存在
-    if os.path.exists(json_file_path):
+    # 先查结果索引，索引建立之前的结果再检查文件是否存在
+    if result_index.has_file(file_id, 'processed_figures.json') or os.path.exists(json_file_path):
         # 使用 Flask 的 `send_from_directory` 函数发送文件
         return send_from_directory(os.path.dirname(json_file_path), 'processed_figures.json')
     else:
@@ -105,9 +149,89 @@ def receive_file_result():
     
     # 保存文件到对应的文件夹
     file.save(os.path.join(upload_folder, file.filename))
+    result_index.add_file(fileid, file.filename)
     
     return 'File uploaded successfully', 200
 
+@app.route('/results_index', methods=['POST'])
+def receive_result_record():
+    """
+    接收 Celery worker 发送的处理记录并写入结果索引。
+    """
+    record = request.get_json(silent=True)
+    if not record or not record.get('file_id') or not record.get('status'):
+        return 'Invalid record', 400
+    result_index.record_upload(record)
+    return 'Record saved', 200
+
+@app.route('/uploads', methods=['GET'])
+def list_uploads():
+    """
+    按时间倒序列出上传记录。
+
+    查询参数：status（可选，done 或 failed）、limit、offset。
+    """
+    limit, offset = get_page_args()
+    uploads = result_index.list_uploads(request.args.get('status'), limit, offset)
+    return jsonify({"uploads": uploads}), 200
+
+@app.route('/uploads/<file_id>', methods=['GET'])
+def get_upload(file_id):
+    """
+    返回一次上传的处理记录，包括图像和下载 URL。
+
+    :param file_id: 文件的唯一 ID
+    """
+    upload = result_index.get_upload(file_id, with_figures=True)
+    if upload is None:
+        return jsonify({"error": "Upload not found"}), 404
+    upload.update(build_response(file_id, upload['files']))
+    return jsonify(upload), 200
+
+@app.route('/figures/search', methods=['GET'])
+def search_figures():
+    """
+    按标题文字搜索图像。
+
+    查询参数：q（标题中包含的文字）、type（图像类型，如 Figure 或 Table）、limit、offset。
+    """
+    limit, offset = get_page_args()
+    figures = result_index.search_figures(
+        request.args.get('q'), request.args.get('type'), limit, offset)
+    for figure in figures:
+        if figure['image']:
+            figure['url'] = f"/download/{figure['file_id']}/{figure['image']}"
+    return jsonify({"figures": figures}), 200
+
+def sweep_expired_results(max_age_seconds):
+    """
+    删除创建时间超过 max_age_seconds 的结果目录和索引记录。
+
+    :param max_age_seconds: 结果保留时间（秒）
+    :return: 删除的上传 ID 列表
+    """
+    file_ids = result_index.expired_uploads(time.time() - max_age_seconds)
+    for file_id in file_ids:
+        shutil.rmtree(os.path.join(FINAL_OUTPUT_FOLDER, file_id), ignore_errors=True)
+    result_index.delete_uploads(file_ids)
+    return file_ids
+
+def run_sweeper(max_age_seconds, interval):
+    """定期清理过期结果"""
+    while True:
+        try:
+            file_ids = sweep_expired_results(max_age_seconds)
+            if file_ids:
+                print(f"Removed {len(file_ids)} expired results")
+        except Exception as e:
+            print("Exception occurred while removing expired results:", e)
+        time.sleep(interval)
+
 if __name__ == '__main__':
+    if RESULT_RETENTION_SECONDS > 0:
+        threading.Thread(
+            target=run_sweeper,
+            args=(RESULT_RETENTION_SECONDS, RESULT_SWEEP_INTERVAL),
+            daemon=True).start()
     # 启动 Flask 应用
     app.run(debug=False, host='0.0.0.0', port=5020, threaded=True)
\ No newline at end of file
@@ -9,6 +9,8 @@ import json
 import sys
 import requests
 import base64
+import hashlib
+import time
 
 # 创建一个Celery实例，并指定消息代理（broker）为Redis
 # 创建一个Celery实例，并指定消息代理（broker）为Redis
@@ -22,6 +24,8 @@ app = Celery(
 app.conf.result_expires = 300
 
 flask_server_url ='http://192.168.1.110:5020/results_upload'
+# 任务完成后将处理记录写入 Flask 服务端的结果索引
+flask_index_url = 'http://192.168.1.110:5020/results_index'
 
 def upload_folder(folder_path, fileid):
     # 遍历文件夹并上传每个文件
@@ -36,6 +40,18 @@ def upload_folder(folder_path, fileid):
                 response = requests.post(flask_server_url, files=files, data=data)
                 print(response.status_code, response.text)
 
+def report_upload(record):
+    """
+    将一次上传的处理记录（状态、耗时、页数和图像）发送到 Flask 服务端的结果索引。
+
+    :param record: 处理记录，见 result_index.ResultIndex.record_upload
+    """
+    try:
+        response = requests.post(flask_index_url, json=record)
+        print(response.status_code, response.text)
+    except requests.RequestException as e:
+        print(f"Failed to report upload {record['file_id']}: {e}")
+
 # 打印检查
 current_dir = os.path.dirname(os.path.abspath(__file__))
 target_path = os.path.join(current_dir, 'workspaces/deepfigures-open')
@@ -85,7 +101,7 @@ def get_first_subdirectory(directory):
 
 def move_images_to_final_folder(source_dir, dest_dir, file_id):
     """
-    将 source_dir 中的 PNG 图片移动到 dest_dir，保存在以 UUID 命名的子目录中。
+    将 source_dir 中裁剪出的图片（PNG、JPEG 或 WebP）移动到 dest_dir，保存在以 UUID 命名的子目录中。
 
     :param source_dir: 源目录，包含处理后的图片
     :param dest_dir: 目标目录，保存图片的最终目录
@@ -96,10 +112,10 @@ def move_images_to_final_folder(source_dir, dest_dir, file_id):
     target_dir = os.path.join(dest_dir, file_id)
     os.makedirs(target_dir, exist_ok=True)
 
-    # 移动 PNG 图片并返回图片文件名列表
+    # 移动图片并返回图片文件名列表
     moved_images = []
     for file in os.listdir(source_dir):
-        if file.endswith('.png'):
+        if file.endswith(cut.IMAGE_EXTENSIONS):
             source_file = os.path.join(source_dir, file)
             target_file = os.path.join(target_dir, file)
             shutil.move(source_file, target_file)
@@ -131,6 +147,9 @@ def process_json_file(json_file_path, file_id, dest_dir):
         
         # 更新 data 字典中的 regionless-captions 键对应的值
         data['regionless-captions'] = updated_captions
+
+    # 记录裁剪图像的编码格式
+    data['image_format'] = cut.get_output_settings()
     
     # 生成处理后的 JSON 文件路径
     target_json_path = os.path.join(dest_dir, file_id, 'processed_figures.json')
@@ -164,6 +183,53 @@ def clear_output_directory(directory):
     except Exception as e:
         print(f"清空目录 {directory} 时出错: {e}")
 
+def count_pages(subdir_path):
+    """
+    根据 dpi100 的页面图像数量统计 PDF 的页数。
+
+    :param subdir_path: detectfigures 的结果子目录
+    :return: 页数，找不到页面图像时返回 None
+    """
+    pdf_file_name = cut.find_pdf_file(subdir_path)
+    if not pdf_file_name:
+        return None
+    pages_dir = os.path.join(subdir_path, f'{pdf_file_name}.pdf-images', 'ghostscript', 'dpi100')
+    if not os.path.isdir(pages_dir):
+        return None
+    return sum(1 for file in os.listdir(pages_dir) if file.endswith('.png'))
+
+def collect_figures(subdir_path, moved_images):
+    """
+    从结果文件中读取图像记录，用于写入结果索引。
+
+    :param subdir_path: detectfigures 的结果子目录
+    :param moved_images: 已移动到最终目录的图片文件名列表
+    :return: 图像字典列表
+    """
+    json_file = cut.find_result_file(subdir_path)
+    if not json_file:
+        return []
+    data = cut.load_json(json_file)
+    pdf_file_name = cut.find_pdf_file(subdir_path)
+    raw_output = cut.load_raw_pdffigures_output(data, json_file, subdir_path, pdf_file_name)
+    moved_images = set(moved_images)
+    figures = []
+    for figure in data.get("figures", []) + raw_output.get("regionless-captions", []):
+        boundary = figure.get('figure_boundary', figure.get('boundary')) or {}
+        image = cut.get_cropped_image_name(figure)
+        figures.append({
+            "page": figure['page'],
+            "figure_type": figure.get("figure_type", figure.get("figType")),
+            "name": figure.get("name"),
+            "caption_text": figure.get("caption_text", figure.get("text")),
+            "image": image if image in moved_images else None,
+            "x1": boundary.get('x1'),
+            "y1": boundary.get('y1'),
+            "x2": boundary.get('x2'),
+            "y2": boundary.get('y2'),
+        })
+    return figures
+
 @app.task
 def celery_upload_pdf(file_base64):
     """
@@ -175,15 +241,46 @@ def celery_upload_pdf(file_base64):
     4. 使用 `python manage.py detectfigures` 处理 PDF。
     5. 使用 `cut_images.py` 进一步处理生成的图片。
     6. 返回生成的图片 URL 列表给前端。
+
+    无论成功与否，处理记录都会发送到 Flask 服务端的结果索引。
     
     :return: JSON 响应，包含生成的图片列表或错误信息。
     """
 
     # 为文件生成一个唯一的 ID，避免文件名冲突
     file_id = str(uuid.uuid4())
+    record = {"file_id": file_id, "created_at": time.time()}
+    response_data, status_code = {"error": "Unexpected error"}, 500
+    try:
+        response_data, status_code = process_pdf(file_id, file_base64, record)
+    except Exception as e:
+        # 未预料的异常照常抛出，但仍记录为失败
+        response_data, status_code = {"error": str(e)}, 500
+        raise
+    finally:
+        record["finished_at"] = time.time()
+        record["total_seconds"] = record["finished_at"] - record["created_at"]
+        if status_code == 200:
+            record["status"] = "done"
+        else:
+            record["status"] = "failed"
+            record["error"] = response_data.get("error")
+        report_upload(record)
+    return response_data, status_code
+
+def process_pdf(file_id, file_base64, record):
+    """
+    执行 celery_upload_pdf 的处理步骤，并将哈希、耗时、页数和图像写入 record。
+
+    :param file_id: 文件的唯一 ID
+    :param file_base64: base64 编码的 PDF 文件内容
+    :param record: 结果索引的处理记录
+    :return: (JSON 响应, 状态码)
+    """
     try:
         # 解码 base64 字符串为文件内容
         file_content = base64.b64decode(file_base64)
+        record["pdf_sha1"] = hashlib.sha1(file_content).hexdigest()
 
         # 保存文件到本地（根据需要选择保存路径）
         pdf_save_path = os.path.join(UPLOAD_FOLDER, f"{file_id}.pdf")
@@ -196,6 +293,7 @@ def celery_upload_pdf(file_base64):
     output_path = os.path.join(OUTPUT_FOLDER, file_id)
 
     # Step 2: 调用 `manage.py detectfigures` 处理 PDF 文件
+    step_start = time.time()
     try:
         # 构建命令行参数，调用 detectfigures
         detectfigures_command = [
@@ -208,14 +306,17 @@ def celery_upload_pdf(file_base64):
     except subprocess.CalledProcessError as e:
         # 如果命令执行失败，返回错误信息
         return {"error": f"Failed to run detectfigures: {str(e)}"}, 500
+    record["detect_seconds"] = time.time() - step_start
 
     # Step 3: 调用 `cut_images.py` 进一步处理生成的图片
+    step_start = time.time()
     try:
         cut.process_output_directory(output_path)
         cut.process_output_directory(output_path)
     except subprocess.CalledProcessError as e:
         # 如果命令执行失败，返回错误信息
         return {"error": f"Failed to run cut_images: {str(e)}"}, 500
+    record["cut_seconds"] = time.time() - step_start
 
     # Step 4: 查找生成的图片和 JSON 文件
     first_subdir = get_first_subdirectory(output_path)
@@ -246,6 +347,13 @@ def celery_upload_pdf(file_base64):
     # Move images to final output folder
     moved_images = move_images_to_final_folder(images_dir, FINAL_OUTPUT_FOLDER, file_id)
 
+    # 记录页数和图像，用于结果索引；读取失败不影响本次处理结果
+    try:
+        record["page_count"] = count_pages(first_subdir)
+        record["figures"] = collect_figures(first_subdir, moved_images)
+    except (KeyError, ValueError, OSError) as e:
+        print(f"Failed to collect figures for {file_id}: {e}")
+
     # Step 6: 清理 output 目录
     clear_output_directory(output_path)
 
@@ -259,6 +367,7 @@ def celery_upload_pdf(file_base64):
     # 将图片和 JSON 文件返回给flask服务端
     upload_dir = os.path.join(FINAL_OUTPUT_FOLDER, file_id)
     upload_folder(upload_dir,file_id)
+    record["files"] = sorted(os.listdir(upload_dir))
 
     return response_data, 200
 
@@ -2,8 +2,6 @@ import os
 import glob
 import requests
 import json
-from PIL import Image
-from io import BytesIO
 from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor
 import shutil
@@ -112,10 +110,11 @@ def download_images(image_urls: list, pdf_path: str) -> list:
             full_img_url = f"{BASE_URL}{img_url}"  # 拼接完整的图片 URL
             img_response = requests.get(full_img_url)
             img_response.raise_for_status()
-            img = Image.open(BytesIO(img_response.content))
             file_name = os.path.basename(urlparse(img_url).path)
             file_path = os.path.join(img_dir, file_name)
-            img.save(file_path)
+            # 直接保存服务端编码好的图片，不再解码和重新编码
+            with open(file_path, 'wb') as f:
+                f.write(img_response.content)
             img_list.append(file_path)
         except requests.RequestException as e:
             print(f"Failed to download image {img_url}: {e}")
@@ -0,0 +1,218 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# 结果索引的表结构：
+# uploads: 每次上传一行，记录 PDF 哈希、状态、耗时和页数
+# files:   每个可下载的结果文件一行（图片和 processed_figures.json）
+# figures: 每个提取出的图像一行
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    file_id TEXT PRIMARY KEY,
+    pdf_sha1 TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    page_count INTEGER,
+    figure_count INTEGER,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    detect_seconds REAL,
+    cut_seconds REAL,
+    total_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS uploads_pdf_sha1 ON uploads (pdf_sha1, status);
+CREATE INDEX IF NOT EXISTS uploads_created_at ON uploads (created_at);
+
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    PRIMARY KEY (file_id, filename)
+);
+
+CREATE TABLE IF NOT EXISTS figures (
+    file_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    figure_type TEXT,
+    name TEXT,
+    caption_text TEXT,
+    image TEXT,
+    x1 REAL,
+    y1 REAL,
+    x2 REAL,
+    y2 REAL
+);
+CREATE INDEX IF NOT EXISTS figures_file_id ON figures (file_id);
+"""
+
+UPLOAD_COLUMNS = [
+    'file_id', 'pdf_sha1', 'status', 'error', 'page_count',
+    'figure_count', 'created_at', 'finished_at', 'detect_seconds',
+    'cut_seconds', 'total_seconds'
+]
+
+FIGURE_COLUMNS = [
+    'page', 'figure_type', 'name', 'caption_text', 'image',
+    'x1', 'y1', 'x2', 'y2'
+]
+
+
+class ResultIndex(object):
+    """
+    记录处理结果的 SQLite 索引。
+
+    下载接口通过主键查找结果文件，无需遍历目录；同时支持列出、搜索上传记录，
+    按 PDF 哈希查找已处理的结果，以及按时间清理过期结果。
+
+    :param db_path: SQLite 数据库文件路径
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # 每个线程使用各自的连接（Flask 以多线程模式运行）
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            # WAL 模式下读操作不会被写操作阻塞
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        with conn:
+            yield conn
+
+    def record_upload(self, record):
+        """
+        写入（或覆盖）一次上传的处理结果，包括其中的所有图像。
+
+        :param record: 字典，键为 UPLOAD_COLUMNS 中的列名，另可包含
+            "figures"（图像字典列表，键为 FIGURE_COLUMNS）和
+            "files"（可下载的文件名列表）
+        """
+        upload = {column: record.get(column) for column in UPLOAD_COLUMNS}
+        if upload['created_at'] is None:
+            upload['created_at'] = time.time()
+        figures = record.get('figures') or []
+        if upload['figure_count'] is None:
+            upload['figure_count'] = len(figures)
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO uploads ({}) VALUES ({})'.format(
+                    ', '.join(UPLOAD_COLUMNS), ', '.join('?' * len(UPLOAD_COLUMNS))),
+                [upload[column] for column in UPLOAD_COLUMNS])
+            conn.execute('DELETE FROM figures WHERE file_id = ?', (upload['file_id'],))
+            conn.executemany(
+                'INSERT INTO figures (file_id, {}) VALUES (?, {})'.format(
+                    ', '.join(FIGURE_COLUMNS), ', '.join('?' * len(FIGURE_COLUMNS))),
+                [
+                    [upload['file_id']] + [figure.get(column) for column in FIGURE_COLUMNS]
+                    for figure in figures
+                ])
+            conn.executemany(
+                'INSERT OR IGNORE INTO files (file_id, filename) VALUES (?, ?)',
+                [(upload['file_id'], filename) for filename in record.get('files') or []])
+
+    def add_file(self, file_id, filename):
+        """记录一个已保存的结果文件"""
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO files (file_id, filename) VALUES (?, ?)',
+                (file_id, filename))
+
+    def has_file(self, file_id, filename):
+        """检查结果文件是否存在于索引中"""
+        row = self._connect().execute(
+            'SELECT 1 FROM files WHERE file_id = ? AND filename = ?',
+            (file_id, filename)).fetchone()
+        return row is not None
+
+    def get_files(self, file_id):
+        """返回一次上传的所有结果文件名"""
+        rows = self._connect().execute(
+            'SELECT filename FROM files WHERE file_id = ? ORDER BY filename',
+            (file_id,)).fetchall()
+        return [row['filename'] for row in rows]
+
+    def get_upload(self, file_id, with_figures=False):
+        """
+        返回一次上传的记录，不存在时返回 None。
+
+        :param with_figures: 是否一并返回图像和文件列表
+        """
+        row = self._connect().execute(
+            'SELECT * FROM uploads WHERE file_id = ?', (file_id,)).fetchone()
+        if row is None:
+            return None
+        upload = dict(row)
+        if with_figures:
+            upload['figures'] = [
+                dict(figure) for figure in self._connect().execute(
+                    'SELECT {} FROM figures WHERE file_id = ? ORDER BY page, rowid'.format(
+                        ', '.join(FIGURE_COLUMNS)),
+                    (file_id,))
+            ]
+            upload['files'] = self.get_files(file_id)
+        return upload
+
+    def find_by_hash(self, pdf_sha1):
+        """返回相同 PDF 最近一次成功处理的记录，用于缓存查找"""
+        row = self._connect().execute(
+            'SELECT * FROM uploads WHERE pdf_sha1 = ? AND status = ?'
+            ' ORDER BY created_at DESC LIMIT 1',
+            (pdf_sha1, 'done')).fetchone()
+        return dict(row) if row is not None else None
+
+    def list_uploads(self, status=None, limit=50, offset=0):
+        """按时间倒序列出上传记录"""
+        query = 'SELECT * FROM uploads'
+        params = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        return [dict(row) for row in self._connect().execute(query, params)]
+
+    def search_figures(self, text=None, figure_type=None, limit=50, offset=0):
+        """
+        按标题文字和图像类型搜索图像。
+
+        :param text: 标题中包含的文字（不区分大小写）
+        :param figure_type: 图像类型，例如 "Figure" 或 "Table"
+        """
+        query = 'SELECT file_id, {} FROM figures WHERE 1'.format(', '.join(FIGURE_COLUMNS))
+        params = []
+        if text:
+            query += " AND caption_text LIKE ? ESCAPE '\\'"
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append('%' + escaped + '%')
+        if figure_type:
+            query += ' AND figure_type = ?'
+            params.append(figure_type)
+        query += ' ORDER BY rowid LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        return [dict(row) for row in self._connect().execute(query, params)]
+
+    def expired_uploads(self, before):
+        """返回创建时间早于 before（Unix 时间戳）的上传 ID"""
+        rows = self._connect().execute(
+            'SELECT file_id FROM uploads WHERE created_at < ?', (before,)).fetchall()
+        return [row['file_id'] for row in rows]
+
+    def delete_uploads(self, file_ids):
+        """从索引中删除上传记录及其图像和文件"""
+        params = [(file_id,) for file_id in file_ids]
+        with self._transaction() as conn:
+            for table in ['uploads', 'files', 'figures']:
+                conn.executemany(
+                    'DELETE FROM {} WHERE file_id = ?'.format(table), params)
@@ -0,0 +1,113 @@
+"""result_index.ResultIndex 的测试"""
+
+import os
+import tempfile
+import unittest
+
+from result_index import ResultIndex
+
+
+def make_record(file_id, created_at, pdf_sha1='abc', status='done', figures=None, files=None):
+    return {
+        'file_id': file_id,
+        'pdf_sha1': pdf_sha1,
+        'status': status,
+        'created_at': created_at,
+        'figures': figures or [],
+        'files': files or [],
+    }
+
+
+def make_figure(page, caption_text, figure_type='Figure'):
+    return {
+        'page': page,
+        'figure_type': figure_type,
+        'name': '1',
+        'caption_text': caption_text,
+        'image': None,
+        'x1': 1.0, 'y1': 2.0, 'x2': 3.0, 'y2': 4.0,
+    }
+
+
+class TestResultIndex(unittest.TestCase):
+    """测试 ResultIndex 的写入、查询和清理"""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.index = ResultIndex(os.path.join(self._tmpdir.name, 'index.db'))
+
+    def tearDown(self):
+        self.index._connect().close()
+        self._tmpdir.cleanup()
+
+    def test_record_upload_replaces(self):
+        """再次写入同一上传时覆盖原记录及其图像"""
+        self.index.record_upload(make_record(
+            'a', 1.0, status='failed',
+            figures=[make_figure(1, 'old one'), make_figure(2, 'old two')],
+            files=['f1.png']))
+        self.index.record_upload(make_record(
+            'a', 1.0, figures=[make_figure(3, 'new')], files=['f2.png']))
+        upload = self.index.get_upload('a', with_figures=True)
+        self.assertEqual(upload['status'], 'done')
+        self.assertEqual(upload['figure_count'], 1)
+        self.assertEqual(
+            [(figure['page'], figure['caption_text']) for figure in upload['figures']],
+            [(3, 'new')])
+        self.assertEqual(upload['files'], ['f1.png', 'f2.png'])
+        self.assertTrue(self.index.has_file('a', 'f2.png'))
+
+    def test_find_by_hash(self):
+        """按哈希只返回处理成功的最近一次上传"""
+        self.index.record_upload(make_record('a', 1.0, pdf_sha1='h'))
+        self.index.record_upload(make_record('b', 2.0, pdf_sha1='h', status='failed'))
+        self.index.record_upload(make_record('c', 3.0, pdf_sha1='other'))
+        self.assertEqual(self.index.find_by_hash('h')['file_id'], 'a')
+        self.index.record_upload(make_record('d', 4.0, pdf_sha1='h'))
+        self.assertEqual(self.index.find_by_hash('h')['file_id'], 'd')
+        self.assertIsNone(self.index.find_by_hash('missing'))
+        self.index.record_upload(make_record('e', 5.0, pdf_sha1='f', status='failed'))
+        self.assertIsNone(self.index.find_by_hash('f'))
+
+    def test_search_figures_escapes_like(self):
+        """搜索文字中的 %、_ 和反斜杠按字面匹配"""
+        self.index.record_upload(make_record('a', 1.0, figures=[
+            make_figure(1, 'accuracy of 50% on set A'),
+            make_figure(1, 'accuracy of 50 on set B'),
+            make_figure(2, 'the x_1 axis'),
+            make_figure(2, 'the xy1 axis'),
+            make_figure(3, 'path C:\\data'),
+            make_figure(3, 'Results', figure_type='Table'),
+        ]))
+
+        def captions(**kwargs):
+            return [figure['caption_text'] for figure in self.index.search_figures(**kwargs)]
+
+        self.assertEqual(captions(text='50%'), ['accuracy of 50% on set A'])
+        self.assertEqual(captions(text='x_1'), ['the x_1 axis'])
+        self.assertEqual(captions(text=':\\d'), ['path C:\\data'])
+        self.assertEqual(captions(text='ACCURACY'), [
+            'accuracy of 50% on set A', 'accuracy of 50 on set B'])
+        self.assertEqual(captions(figure_type='Table'), ['Results'])
+        self.assertEqual(captions(text='accuracy', limit=1, offset=1), [
+            'accuracy of 50 on set B'])
+
+    def test_expire_and_delete(self):
+        """按时间找出过期上传并删除其记录、图像和文件"""
+        self.index.record_upload(make_record(
+            'old', 10.0, figures=[make_figure(1, 'old')], files=['old.png']))
+        self.index.record_upload(make_record(
+            'new', 30.0, figures=[make_figure(1, 'new')], files=['new.png']))
+        expired = self.index.expired_uploads(20.0)
+        self.assertEqual(expired, ['old'])
+        self.index.delete_uploads(expired)
+        self.assertIsNone(self.index.get_upload('old'))
+        self.assertEqual(self.index.get_files('old'), [])
+        self.assertEqual(
+            [figure['file_id'] for figure in self.index.search_figures()], ['new'])
+        self.assertIsNotNone(self.index.get_upload('new'))
+        self.assertEqual(self.index.expired_uploads(20.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
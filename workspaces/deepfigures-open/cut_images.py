@@ -1,26 +1,165 @@
 import os
+import gzip
 import json
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import pwd
 import grp
 
-def process_output_directory(output_dir):
-    """遍历输出目录下的每个子目录，处理其中的 .json 文件"""
+# 并行裁剪页面和编码图像的线程数。Pillow 在解码和编码时会释放 GIL，因此线程即可并行
+CROP_WORKERS = min(8, os.cpu_count() or 1)
+
+# 裁剪方式：page 从 DPI 200 的整页图像中裁剪；region 直接从 PDF 渲染每个图像的区域
+# （需要 Ghostscript 和 pdfinfo），此时不需要整页的 DPI 200 图像，见 settings.RENDER_CROPPED_PAGES
+CROP_BACKENDS = ('page', 'region')
+CROP_BACKEND = os.environ.get('CUT_IMAGES_BACKEND', 'page')
+# region 方式下渲染图像的 DPI
+REGION_DPI = int(os.environ.get('CUT_IMAGES_DPI', 200))
+
+# 裁剪结果的编码格式，见 OUTPUT_FORMATS
+OUTPUT_FORMAT = os.environ.get('CUT_IMAGES_FORMAT', 'png')
+# jpeg 和 webp 的质量（0-100）；webp-lossless 下为压缩力度，越大文件越小、编码越慢
+OUTPUT_QUALITY = int(os.environ.get('CUT_IMAGES_QUALITY', 85))
+# png 的 zlib 压缩级别（0-9），6 为 Pillow 的默认值
+PNG_COMPRESS_LEVEL = int(os.environ.get('CUT_IMAGES_PNG_COMPRESS_LEVEL', 6))
+
+# 支持的编码格式：Pillow 格式名和文件扩展名
+OUTPUT_FORMATS = {
+    'png': ('PNG', '.png'),
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+    'webp-lossless': ('WEBP', '.webp'),
+}
+
+# 所有编码格式的图像扩展名
+IMAGE_EXTENSIONS = tuple(sorted(set(extension for _, extension in OUTPUT_FORMATS.values())))
+
+def get_output_settings(output_format=None, quality=None, compress_level=None):
+    """
+    返回裁剪结果的编码设置，未指定的参数使用模块中的默认值。
+
+    :param output_format: 编码格式，OUTPUT_FORMATS 中的一个
+    :param quality: jpeg 和 webp 的质量，webp-lossless 的压缩力度
+    :param compress_level: png 的压缩级别
+    :return: 编码设置的字典，会记录到 processed_figures.json 中
+    """
+    output_format = output_format or OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+    settings = {"format": output_format, "extension": OUTPUT_FORMATS[output_format][1]}
+    if output_format == 'png':
+        settings["compress_level"] = PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+    else:
+        settings["quality"] = OUTPUT_QUALITY if quality is None else quality
+    return settings
+
+def check_crop_backend(crop_backend=None):
+    """
+    检查裁剪方式是否有效，且与 settings.RENDER_CROPPED_PAGES 匹配。
+
+    page 方式需要提取时渲染的 DPI 200 整页图像，RENDER_CROPPED_PAGES 为 False 时
+    这些图像不存在，每个图像都会裁剪失败，因此直接报错。
+
+    :param crop_backend: 裁剪方式，CROP_BACKENDS 中的一个，默认为 CROP_BACKEND
+    """
+    from deepfigures import settings
+
+    crop_backend = crop_backend or CROP_BACKEND
+    if crop_backend not in CROP_BACKENDS:
+        raise ValueError(f"CUT_IMAGES_BACKEND must be one of {', '.join(CROP_BACKENDS)}")
+    if crop_backend == 'page' and not settings.RENDER_CROPPED_PAGES:
+        raise ValueError(
+            "CUT_IMAGES_BACKEND=page needs the DPI 200 page images, which are not rendered "
+            "when settings.RENDER_CROPPED_PAGES is False; set CUT_IMAGES_BACKEND=region")
+
+def save_image(image, output_path, output_settings):
+    """按编码设置保存图像"""
+    output_format = output_settings["format"]
+    options = {}
+    if output_format == 'png':
+        options["compress_level"] = output_settings["compress_level"]
+    elif output_format == 'jpeg':
+        # JPEG 不支持透明通道和调色板
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options.update(quality=output_settings["quality"], optimize=True)
+    elif output_format == 'webp':
+        options.update(quality=output_settings["quality"], method=4)
+    else:
+        options.update(lossless=True, quality=output_settings["quality"], method=4)
+    image.save(output_path, OUTPUT_FORMATS[output_format][0], **options)
+
+def process_output_directory(output_dir, output_settings=None):
+    """
+    遍历输出目录下的每个子目录，处理其中的 .json 文件
+
+    :param output_settings: 编码设置，见 get_output_settings，默认使用模块中的设置
+    """
     for subdir in os.listdir(output_dir):
         subdir_path = os.path.join(output_dir, subdir)
         if os.path.isdir(subdir_path):
-            # 遍历子目录中的所有文件，寻找 .json 文件
-            for file in os.listdir(subdir_path):
-                if file.endswith('.json'):
-                    json_file = os.path.join(subdir_path, file)
-                    print(f"Processing JSON file: {json_file}")
-                    # 处理权限问题
-                    ensure_file_accessible(json_file)
-                    process_json_file(json_file, subdir_path)
-                    break  # 处理完第一个找到的 .json 文件后退出
+            # 寻找结果 JSON 文件
+            json_file = find_result_file(subdir_path)
+            if json_file:
+                print(f"Processing JSON file: {json_file}")
+                # 处理权限问题
+                ensure_file_accessible(json_file)
+                process_json_file(json_file, subdir_path, output_settings)
             else:
                 print(f"No JSON file found in: {subdir_path}")
 
+def find_result_file(subdir_path):
+    """
+    查找子目录中的 deepfigures 结果文件（.json 或压缩的 .json.gz）。
+
+    sidecar 模式下目录中还有原始输出的 JSON 文件，因此优先选择结果文件；
+    找不到时退回到第一个 .json 文件。
+
+    :param subdir_path: 子目录路径
+    :return: 结果文件路径，如果没有找到则返回 None
+    """
+    files = sorted(os.listdir(subdir_path))
+    for file in files:
+        if file.endswith(('deepfigures-results.json', 'deepfigures-results.json.gz')):
+            return os.path.join(subdir_path, file)
+    for file in files:
+        if file.endswith('.json'):
+            return os.path.join(subdir_path, file)
+    return None
+
+def load_json(json_file):
+    """读取 JSON 文件，支持 gzip 压缩的 .json.gz 文件"""
+    if json_file.endswith('.gz'):
+        with gzip.open(json_file, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_raw_pdffigures_output(data, json_file, subdir_path, pdf_file_name):
+    """
+    获取 pdffigures 的原始输出。
+
+    依次尝试：结果文件中内嵌的 raw_pdffigures_output（full / compressed 模式）、
+    sidecar 文件（sidecar 模式）、pdffigures 目录中的原始 JSON 文件（slim 模式）。
+
+    :return: pdffigures 的原始输出，如果都不存在则返回空字典
+    """
+    raw_output = data.get("raw_pdffigures_output")
+    if raw_output is not None:
+        return raw_output
+    sidecar = (data.get("sidecars") or {}).get("raw_pdffigures_output")
+    if sidecar:
+        sidecar_path = os.path.join(os.path.dirname(json_file), sidecar)
+        if os.path.exists(sidecar_path):
+            return load_json(sidecar_path)
+    pdffigures_json = os.path.join(subdir_path, 'pdffigures', f'{pdf_file_name}.json')
+    if os.path.exists(pdffigures_json):
+        return load_json(pdffigures_json)
+    return {}
+
 def ensure_file_accessible(file_path):
     """
     确保文件对当前用户可访问。如果需要，修改文件的所有权。
@@ -49,16 +188,16 @@ def ensure_file_accessible(file_path):
     except Exception as e:
         print(f"Error occurred while changing ownership of {file_path}: {e}")
 
-def process_json_file(json_file, subdir_path):
+def process_json_file(json_file, subdir_path, output_settings=None):
     """根据 JSON 文件裁剪图像并保存"""
+    check_crop_backend()
     if not json_file or not os.path.exists(json_file):
         print(f"JSON file not found: {json_file}")
         return  # 如果没有找到 JSON 文件，则直接返回
 
     print(f"Processing JSON file: {json_file}")  # 调试信息
 
-    with open(json_file, 'r') as f:
-        data = json.load(f)
+    data = load_json(json_file)
 
     # 动态查找 PDF 文件名（无后缀）
     pdf_file_name = find_pdf_file(subdir_path)
@@ -73,13 +212,16 @@ def process_json_file(json_file, subdir_path):
     images_dir = os.path.join(subdir_path, 'images')
     os.makedirs(images_dir, exist_ok=True)
 
-    # 处理 figures
-    for figure in data.get("figures", []):
-        process_figure(figure, images_base_path, images_dir, pdf_file_name)
-
-    # 处理 regionless-captions
-    for caption in data.get("raw_pdffigures_output", {}).get("regionless-captions", []):
-        process_figure(caption, images_base_path, images_dir, pdf_file_name)
+    raw_output = load_raw_pdffigures_output(data, json_file, subdir_path, pdf_file_name)
+    figures = data.get("figures", []) + raw_output.get("regionless-captions", [])
+    start = time.time()
+    if CROP_BACKEND == 'region':
+        # 直接从 PDF 渲染每个图像的区域
+        crop_figures_from_pdf(figures, subdir_path, pdf_file_name, images_dir, output_settings)
+    else:
+        # figures 和 regionless-captions 一起按页分组，每页只解码一次
+        crop_figures(figures, images_base_path, images_dir, pdf_file_name, output_settings)
+    print(f"Cropped {len(figures)} figures from {json_file} in {time.time() - start:.2f}s")
 
 def find_pdf_file(subdir_path):
     """根据子目录中的 .pdf 文件动态获取 PDF 文件名（无后缀）"""
@@ -88,31 +230,170 @@ def find_pdf_file(subdir_path):
             return os.path.splitext(file)[0]  # 返回文件名，不带 .pdf 后缀
     return None
 
+def get_page_image_path(images_base_path, pdf_file_name, page_number):
+    """返回 JSON 页码（从 0 开始）对应的 DPI 200 页面图像路径"""
+    # 页码加1计算实际图像文件名 (JSON 页码 + 1)
+    return os.path.join(images_base_path, f'{pdf_file_name}.pdf-dpi200-page{page_number + 1:04d}.png')
+
+def crop_figures(figures, images_base_path, images_dir, pdf_file_name, output_settings=None):
+    """
+    按页裁剪 figures 和 captions 并保存。
+
+    每个页面图像只解码一次，其上的所有图像都从解码后的页面中裁剪；页面的解码和
+    裁剪结果的编码都在线程池中并行进行。
+
+    :param figures: figure 或 regionless caption 的字典列表
+    :param images_base_path: DPI 200 页面图像所在目录
+    :param images_dir: 裁剪结果的保存目录
+    :param pdf_file_name: PDF 文件名（无后缀）
+    :param output_settings: 编码设置，见 get_output_settings，默认使用模块中的设置
+    """
+    if output_settings is None:
+        output_settings = get_output_settings()
+    if figures and not os.path.isdir(images_base_path):
+        # 整个目录不存在时，逐页报告 Image file not found 会掩盖原因
+        raise FileNotFoundError(
+            f"Page images not found: {images_base_path}. They are not rendered when "
+            f"settings.RENDER_CROPPED_PAGES is False; use CUT_IMAGES_BACKEND=region")
+    # 按页分组，保持原有顺序（同名文件以后出现的为准）
+    crops_by_page = OrderedDict()
+    for figure in figures:
+        cropped_image_name = get_cropped_image_name(figure, output_settings["extension"])
+        # 跳过 figure_type 或 name 为 "unknown" 的情况
+        if cropped_image_name is None:
+            print(f"Skipping figure with unknown type or name: "
+                  f"{figure.get('figure_type', 'unknown')}, {figure.get('name', 'unknown')}")
+            continue
+        boundary = figure.get('figure_boundary', figure.get('boundary'))
+        crops_by_page.setdefault(figure['page'], []).append(
+            (convert_dpi100_to_dpi200(boundary), os.path.join(images_dir, cropped_image_name)))
+
+    def crop_page(page_number):
+        image_path = get_page_image_path(images_base_path, pdf_file_name, page_number)
+        # 如果图像文件存在，则裁剪
+        if os.path.exists(image_path):
+            return crop_page_image(image_path, crops_by_page[page_number])
+        print(f"Image file not found: {image_path}")
+        return []
+
+    def save(cropped_image, output_path):
+        save_image(cropped_image, output_path, output_settings)
+        print(f"Saved cropped image to {output_path}")
+
+    if CROP_WORKERS <= 1:
+        for page_number in crops_by_page:
+            for cropped_image, output_path in crop_page(page_number):
+                save(cropped_image, output_path)
+        return
+    with ThreadPoolExecutor(max_workers=CROP_WORKERS) as executor:
+        # 每页裁剪完成后立即提交编码任务，页面图像随即释放。
+        # 同一文件名的编码按提交顺序完成，保证以后出现的为准
+        futures = {}
+        for crops in executor.map(crop_page, crops_by_page):
+            for cropped_image, output_path in crops:
+                previous = futures.get(output_path)
+                futures[output_path] = executor.submit(
+                    save_after, previous, save, cropped_image, output_path)
+        # 使线程中的异常在这里抛出
+        for future in futures.values():
+            future.result()
+
+def crop_figures_from_pdf(figures, subdir_path, pdf_file_name, images_dir, output_settings=None, dpi=None):
+    """
+    直接从 PDF 渲染每个 figure 和 caption 的区域并保存，不需要整页的高分辨率图像。
+
+    边界使用 DPI 100 的坐标。页面高度（点）用 pdfinfo 从 PDF 中读取，而不是从取整到
+    像素的页面图像推算，因此区域不会偏移。每个区域由一个 Ghostscript 进程渲染，
+    多个区域在线程池中并行渲染。
+
+    :param figures: figure 或 regionless caption 的字典列表
+    :param subdir_path: detectfigures 的结果子目录
+    :param pdf_file_name: PDF 文件名（无后缀）
+    :param images_dir: 裁剪结果的保存目录
+    :param output_settings: 编码设置，见 get_output_settings，默认使用模块中的设置
+    :param dpi: 渲染的 DPI，默认为 REGION_DPI
+    """
+    from deepfigures.extraction.renderers import GhostScriptRenderer
+
+    if output_settings is None:
+        output_settings = get_output_settings()
+    dpi = dpi or REGION_DPI
+    renderer = GhostScriptRenderer()
+    pdf_path = os.path.join(subdir_path, f'{pdf_file_name}.pdf')
+    # 每页的 (宽, 高)，单位为点
+    page_sizes = renderer.get_page_sizes(pdf_path)
+    if page_sizes is None:
+        raise RuntimeError(f"Failed to read the page sizes of {pdf_path}, is pdfinfo installed?")
+    # DPI 100 的像素坐标转换为 PDF 的点（1/72 英寸）
+    scale = 72 / 100
+
+    # 同名文件以后出现的为准
+    regions = OrderedDict()
+    for figure in figures:
+        cropped_image_name = get_cropped_image_name(figure, output_settings["extension"])
+        if cropped_image_name is None:
+            print(f"Skipping figure with unknown type or name: "
+                  f"{figure.get('figure_type', 'unknown')}, {figure.get('name', 'unknown')}")
+            continue
+        boundary = figure.get('figure_boundary', figure.get('boundary'))
+        if boundary is None:
+            print(f"Invalid boundary for cropping: {boundary}")
+            continue
+        regions[os.path.join(images_dir, cropped_image_name)] = (figure['page'], boundary)
+
+    def render(output_path):
+        page_number, boundary = regions[output_path]
+        if not 0 <= page_number < len(page_sizes):
+            print(f"Page {page_number + 1} not found in {pdf_path}")
+            return
+        _, page_height = page_sizes[page_number]
+        box = tuple(boundary[key] * scale for key in ('x1', 'y1', 'x2', 'y2'))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            region_path = renderer.render_region(
+                pdf_path, page_number + 1, box, page_height,
+                os.path.join(tmp_dir, 'region.png'), dpi=dpi)
+            if not os.path.exists(region_path):
+                print(f"Failed to render region of page {page_number + 1}: {box}")
+                return
+            with Image.open(region_path) as region:
+                region.load()
+                save_image(region, output_path, output_settings)
+        print(f"Saved cropped image to {output_path}")
+
+    if CROP_WORKERS <= 1:
+        for output_path in regions:
+            render(output_path)
+        return
+    with ThreadPoolExecutor(max_workers=CROP_WORKERS) as executor:
+        # list() 使线程中的异常在这里抛出
+        list(executor.map(render, regions))
+
+def save_after(previous, save, cropped_image, output_path):
+    """等待同一文件名的上一次编码完成后再保存"""
+    if previous is not None:
+        previous.result()
+    save(cropped_image, output_path)
+
 def process_figure(figure, images_base_path, images_dir, pdf_file_name):
     """处理单个 figure 或 caption 并裁剪保存"""
-    boundary = figure.get('figure_boundary', figure.get('boundary'))
-    page_number = figure['page']
+    crop_figures([figure], images_base_path, images_dir, pdf_file_name)
+
+def get_cropped_image_name(figure, extension=None):
+    """
+    返回 figure 或 caption 裁剪后的图像文件名。
+
+    :param figure: figure 或 regionless caption 的字典
+    :param extension: 文件扩展名，默认使用 OUTPUT_FORMAT 的扩展名
+    :return: 图像文件名，figure_type 或 name 未知时返回 None
+    """
     figure_type = figure.get("figure_type", "unknown")
     figure_name = figure.get("name", "unknown")
-
-    # 跳过 figure_type 或 name 为 "unknown" 的情况
     if figure_type == "unknown" or figure_name == "unknown":
-        print(f"Skipping figure with unknown type or name: {figure_type}, {figure_name}")
-        return
-
+        return None
+    if extension is None:
+        extension = OUTPUT_FORMATS[OUTPUT_FORMAT][1]
     # 页码加1计算实际图像文件名 (JSON 页码 + 1)
-    adjusted_page_number = page_number + 1
-
-    # 构建 DPI 200 图像的文件路径
-    image_path = os.path.join(images_base_path, f'{pdf_file_name}.pdf-dpi200-page{adjusted_page_number:04d}.png')
-
-    # 如果图像文件存在，则裁剪并保存
-    if os.path.exists(image_path):
-        cropped_image_path = os.path.join(images_dir, f'{figure_type}_page{adjusted_page_number:04d}_{figure_type}_{figure_name}.png')
-        adjusted_boundary = convert_dpi100_to_dpi200(boundary)  # 将边界从 DPI 100 转换为 DPI 200
-        crop_image(image_path, adjusted_boundary, cropped_image_path)
-    else:
-        print(f"Image file not found: {image_path}")
+    return f'{figure_type}_page{figure["page"] + 1:04d}_{figure_type}_{figure_name}{extension}'
 
 def convert_dpi100_to_dpi200(boundary):
     """将 dpi100 的坐标转换为 dpi200 的坐标"""
@@ -125,18 +406,33 @@ def convert_dpi100_to_dpi200(boundary):
         }
     return None
 
-def crop_image(image_path, boundary, output_path):
+def crop_image(image_path, boundary, output_path, output_settings=None):
     """裁剪图像并保存"""
-    if boundary is None:
-        print(f"Invalid boundary for cropping: {boundary}")
-        return
+    if output_settings is None:
+        output_settings = get_output_settings()
+    for cropped_image, path in crop_page_image(image_path, [(boundary, output_path)]):
+        save_image(cropped_image, path, output_settings)
+        print(f"Saved cropped image to {path}")
 
+def crop_page_image(image_path, crops):
+    """
+    解码一次页面图像，裁剪出其上的所有图像。
+
+    :param image_path: 页面图像路径
+    :param crops: (boundary, output_path) 列表，boundary 为 DPI 200 坐标
+    :return: (裁剪后的图像, output_path) 列表
+    """
+    cropped_images = []
     with Image.open(image_path) as im:
-        # 裁剪图像
-        cropped_image = im.crop((boundary['x1'], boundary['y1'], boundary['x2'], boundary['y2']))
-        # 保存裁剪后的图像
-        cropped_image.save(output_path)
-        print(f"Saved cropped image to {output_path}")
+        im.load()
+        for boundary, output_path in crops:
+            if boundary is None:
+                print(f"Invalid boundary for cropping: {boundary}")
+                continue
+            # 裁剪图像（crop 会复制像素，页面图像关闭后仍可使用）
+            cropped_image = im.crop((boundary['x1'], boundary['y1'], boundary['x2'], boundary['y2']))
+            cropped_images.append((cropped_image, output_path))
+    return cropped_images
 
 def set_directory_permissions(directory_path):
     """将目录及其所有子目录和文件的权限递归设置为 777"""
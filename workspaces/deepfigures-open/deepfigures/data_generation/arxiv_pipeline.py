@@ -21,7 +21,7 @@ import scipy as sp
 import bs4
 
 from deepfigures import settings
-from deepfigures.utils import file_util, config, settings_utils
+from deepfigures.utils import file_util, config, image_util, settings_utils
 from deepfigures.extraction import figure_utils, renderers
 from deepfigures.extraction.figure_utils import Figure, BoxClass
 
@@ -47,6 +47,20 @@ BEGIN_DOC = r'\begin{document}'
 COLOR_STR = (IMPORT_STR % ('red', 'yellow', 'green', 'blue')) + BEGIN_DOC
 BLACK_STR = (IMPORT_STR % ('white', 'white', 'black', 'black')) + BEGIN_DOC
 
+# The members of a bulk arXiv source tarfile are the gzipped sources of
+# each paper. A paper's sources may read files of any type when they are
+# compiled, so all but the large files which TeX never reads (videos,
+# nested archives and binary datasets) are extracted
+BULK_TAR_MEMBER_FILTER = file_util.suffix_filter('.gz')
+PAPER_TAR_MEMBER_FILTER = file_util.suffix_filter(
+    '.mp4', '.m4v', '.avi', '.mov', '.mkv', '.webm', '.mpg', '.mpeg', '.wmv',
+    '.flv', '.wav', '.mp3', '.tar', '.tgz', '.tar.gz', '.tar.bz2', '.tar.xz',
+    '.zip', '.rar', '.7z', '.h5', '.hdf5', '.npy', '.npz', '.mat', '.pkl',
+    '.pickle', '.fits', '.parquet', '.sqlite', '.db',
+    exclude=True)
+# arXiv limits the size of a submission to 50 MB
+MAX_TAR_MEMBER_SIZE = 50 * 2 ** 20
+
 ARXIV_SRC_DIR = os.path.join(
     settings.ARXIV_DATA_OUTPUT_DIR,
     'src/')
@@ -194,8 +208,12 @@ def proposal_right(full_box: BoxClass, caption_box: BoxClass) -> BoxClass:
     )
 
 
-def get_figure_box(full_box: BoxClass, caption_box: BoxClass,
-                   im: np.ndarray) -> Optional[BoxClass]:
+def get_figure_box(
+    full_box: BoxClass,
+    caption_box: BoxClass,
+    im: np.ndarray,
+    ink_index: Optional[image_util.InkIndex]=None
+) -> Optional[BoxClass]:
     """Find the largest box inside the full figure box that doesn't overlap the caption."""
     proposals = [
         f(full_box, caption_box)
@@ -203,7 +221,7 @@ def get_figure_box(full_box: BoxClass, caption_box: BoxClass,
     ]
     proposal_areas = [p.get_area() for p in proposals]
     proposal = proposals[np.argmax(proposal_areas)]
-    return proposal.crop_whitespace_edges(im)
+    return proposal.crop_whitespace_edges(im, ink_index)
 
 
 def find_figures_and_captions(
@@ -219,6 +237,7 @@ def find_figures_and_captions(
         )
     ).all(axis=2)
     components = measure.label(all_box_mask)
+    ink_index = image_util.InkIndex(im, settings.BACKGROUND_COLOR)
     # Component id 0 is for background
     for component_id in np.unique(components)[1:]:
         (box_ys, box_xs) = np.where(components == component_id)
@@ -245,7 +264,7 @@ def find_figures_and_captions(
             x2=float(max(cap_xs) + 1),
             y2=float(max(cap_ys) + 1),
         )
-        fig_box = get_figure_box(full_box, cap_box, im)
+        fig_box = get_figure_box(full_box, cap_box, im, ink_index)
         if fig_box is None:
             continue
         box_color = diff_im[box_ys[0], box_xs[0], :]
@@ -303,7 +322,10 @@ def process_paper_tar(paper_tarname: str) -> None:
         return
     print('.', end='', flush=True)
     try:
-        file_util.extract_tarfile(paper_tarname, paper_dir)
+        file_util.extract_tarfile(
+            paper_tarname, paper_dir,
+            member_filter=PAPER_TAR_MEMBER_FILTER,
+            max_member_size=MAX_TAR_MEMBER_SIZE)
     except tarfile.ReadError:
         logging.debug('File %s is not a tar' % paper_tarname)
         return
@@ -321,7 +343,8 @@ def process_paper_tar(paper_tarname: str) -> None:
     file_util.write_json_atomic(
         result_path,
         config.JsonSerializable.serialize(figures_by_page),
-        sort_keys=True
+        sort_keys=True,
+        compact=settings.COMPACT_JSON_OUTPUT
     )
 
 
@@ -339,7 +362,8 @@ def download_and_extract_tar(
                 raise
             logging.exception('Download failed, retrying')
             time.sleep(10)
-    file_util.extract_tarfile(cached_file, extract_dir)
+    file_util.extract_tarfile(
+        cached_file, extract_dir, member_filter=BULK_TAR_MEMBER_FILTER)
     os.remove(cached_file)
 
 
@@ -1,20 +1,20 @@
 import collections
+import concurrent.futures
 import datetime
+import functools
 import glob
 import logging
 import math
-import multiprocessing
 import os
 import re
 import subprocess
-from typing import List, Tuple, Optional, Dict, Iterable
+import threading
+from typing import List, Tuple, Optional, Dict, Iterable, Iterator, Union
 
 import bs4
-from bs4 import BeautifulSoup
 import cv2
 import editdistance
 import numpy as np
-import scipy as sp
 from PIL import Image
 from botocore.vendored.requests.exceptions import ReadTimeout
 
@@ -23,14 +23,17 @@ from deepfigures.extraction import (
     figure_utils,
     exceptions,
     datamodels,
-    renderers)
+    renderers,
+    xml_parsing)
 from deepfigures.utils import (
     stringmatch,
     config,
     traits,
     file_util,
+    image_ops,
     image_util,
-    settings_utils)
+    settings_utils,
+    work_queue)
 from deepfigures.settings import (
     PUBMED_INPUT_DIR,
     PUBMED_INTERMEDIATE_DIR,
@@ -40,10 +43,17 @@ from deepfigures.settings import (
 
 LOCAL_INTERMEDIATE_DIR = LOCAL_PUBMED_DISTANT_DATA_DIR + 'intermediate/'
 LOCAL_FIGURE_JSON_DIR = LOCAL_PUBMED_DISTANT_DATA_DIR + 'figure-jsons/'
+# The tarfiles run_on_all has finished, so a restart can skip them
+MANIFEST_PATH = LOCAL_PUBMED_DISTANT_DATA_DIR + 'completed-tars.txt'
 
 PDFTOTEXT_DPI = 72
 MAX_PAGES = 50
 
+# The members of a PMC source tarfile which the pipeline reads; the rest
+# (supplementary videos, datasets, etc.) are not extracted
+TAR_MEMBER_FILTER = file_util.suffix_filter('.pdf', '.nxml', '.jpg')
+MAX_TAR_MEMBER_SIZE = 200 * 2 ** 20
+
 pdf_renderer = settings_utils.import_setting(
     settings.DEEPFIGURES_PDF_RENDERER)()
 
@@ -107,13 +117,50 @@ class PubmedMatchedFigure(config.JsonSerializable):
     page_num = traits.Int()
 
 
-def get_xml_soup(pdf: str) -> Optional[BeautifulSoup]:
+def get_xml_figures(pdf: str) -> Optional[List[xml_parsing.NxmlFigure]]:
     xml = pdf[:-4] + '.nxml'
     if not os.path.isfile(xml):
         return None
-    with open(xml, 'r') as f:
-        xml_soup = BeautifulSoup(f, 'xml')
-    return xml_soup
+    return xml_parsing.parse_nxml_figures(xml)
+
+
+class PageImages(object):
+    """The pages of a PDF rendered at the inference dpi, each rendered
+    when it is first read.
+
+    Pages are rendered one at a time with PDFRenderer.render_page, to the
+    paths render would give them, and their images are cached, so a PDF
+    whose figures fail to match before any page is read is never
+    rendered at all. Pages may be read from several threads at once.
+
+    :param str pdf: the path to the PDF.
+    """
+
+    def __init__(self, pdf: str) -> None:
+        self.pdf = pdf
+        self._images = {}  # type: Dict[int, np.ndarray]
+        self._lock = threading.Lock()
+        # held while each page is rendered, so it is only rendered once
+        self._page_locks = {}  # type: Dict[int, threading.Lock]
+
+    def get_name(self, page_num: int) -> str:
+        """Render the page, 0 indexed, if needed and return its path."""
+        return pdf_renderer.render_page(
+            pdf_path=self.pdf,
+            page_num=page_num + 1,
+            output_dir=os.path.dirname(self.pdf),
+            dpi=settings.DEFAULT_INFERENCE_DPI,
+            check_retcode=True
+        )
+
+    def __getitem__(self, page_num: int) -> np.ndarray:
+        with self._lock:
+            page_lock = self._page_locks.setdefault(page_num, threading.Lock())
+        with page_lock:
+            if page_num not in self._images:
+                self._images[page_num] = image_util.read_tensor(
+                    self.get_name(page_num))
+        return self._images[page_num]
 
 
 def get_author_name(author: bs4.Tag) -> Optional[str]:
@@ -128,74 +175,137 @@ def get_author_name(author: bs4.Tag) -> Optional[str]:
     return ' '.join([name.text for name in given_names + [surname]])
 
 
-def find_str_words_in_pdf(
+class PdfTextIndex(object):
+    """The text of a PDF's pages, prepared once for matching strings.
+
+    Holds each page's words, its text cleaned with clean_str and,
+    computed on first use, the offset in the cleaned text at which each
+    word starts, so that matches can be mapped back to words by binary
+    search. The words' boxes at the inference dpi, and the cost of
+    matching a string against every page, are cached too. Build one per
+    PDF and share it between all of its figures and tables.
+
+    :param List[PageWords] pages: the words of each page, from
+      xml_parsing.parse_pdftotext_bbox.
+    """
+
+    def __init__(self, pages: List[xml_parsing.PageWords]) -> None:
+        self.pages = pages
+        self.clean_pages = [clean_str(' '.join(page.texts)) for page in pages]
+        self._word_offsets = {}
+        self._word_boxes = {}
+        self._match_costs = {}
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def add_keys(self, keys: Iterable[str]) -> None:
+        """Find the cost of matching each of keys against every page.
+
+        The keys are cleaned with clean_str and matched against a page
+        at a time with a single stringmatch.match_many call, which finds
+        only the cost of each match and not where it is.
+        """
+        clean_keys = [
+            clean_key for clean_key in dict.fromkeys(map(clean_str, keys))
+            if clean_key not in self._match_costs
+        ]
+        if len(clean_keys) == 0:
+            return
+        page_matches = [
+            stringmatch.match_many(clean_keys, page, max_cost=-1)
+            for page in self.clean_pages
+        ]
+        for key_idx, clean_key in enumerate(clean_keys):
+            self._match_costs[clean_key] = [
+                matches[key_idx].cost for matches in page_matches
+            ]
+
+    def get_match_costs(self, key: str) -> List[int]:
+        """Return the cost of matching key against each page."""
+        self.add_keys([key])
+        return self._match_costs[clean_str(key)]
+
+    def get_word_offsets(self, page_num: int) -> np.ndarray:
+        """Return the cumulative cleaned lengths of the page's words.
+
+        Element i is the offset in the cleaned page text at which word
+        i starts, and the last element is the length of all the words.
+        """
+        if page_num not in self._word_offsets:
+            self._word_offsets[page_num] = np.cumsum(
+                [0] + [len(clean_str(text))
+                       for text in self.get_word_texts(page_num)])
+        return self._word_offsets[page_num]
+
+    def get_word_texts(self, page_num: int) -> List[str]:
+        """Return the text of each of the page's words."""
+        return self.pages[page_num].texts
+
+    def get_word_boxes(self, page_num: int) -> datamodels.BoxArray:
+        """Return the boxes of the page's words at the inference dpi."""
+        if page_num not in self._word_boxes:
+            self._word_boxes[page_num] = self.pages[page_num].boxes.rescale(
+                settings.DEFAULT_INFERENCE_DPI / 72)
+        return self._word_boxes[page_num]
+
+    def get_match_word_range(self, page_num: int, match: MatchedString) -> Tuple[int, int]:
+        """Return the start and end indices of the words covered by match.
+
+        Partially matching words at either end are included.
+        """
+        offsets = self.get_word_offsets(page_num)
+        # the first words whose cleaned text ends at or after each position
+        start_token_idx = int(np.searchsorted(offsets, match.start_pos))
+        end_token_idx = max(
+            start_token_idx, int(np.searchsorted(offsets, match.end_pos)))
+        if end_token_idx >= len(offsets):
+            raise IndexError('match extends past the words of the page')
+        return start_token_idx, end_token_idx
+
+    def get_match_words(self, page_num: int, match: MatchedString) -> List[str]:
+        """Return the words of the page covered by match."""
+        (start_token_idx, end_token_idx) = self.get_match_word_range(page_num, match)
+        return self.get_word_texts(page_num)[start_token_idx:end_token_idx]
+
+
+def find_str_word_range(
     key: str,
-    html_pages: List[bs4.Tag],
+    text_index: PdfTextIndex,
     pages: Optional[List[int]]=None,
     max_dist: int=math.inf,
-) -> Tuple[Optional[List[bs4.Tag]], int]:
+) -> Tuple[Optional[Tuple[int, int]], int]:
+    """Find the page best matching key and the range of its words matched.
+
+    :returns: the start and end indices of the matched words, or None
+      if the match is farther than max_dist from key, and the page's
+      index in text_index.
+    """
     if pages is None:
-        pages = list(range(len(html_pages)))
-    text_pages = [
-        re.sub('\n', ' ', html_page.text) for html_page in html_pages
-    ]
-    clean_key = clean_str(key)
-    matches = [
-        MatchedString.
-        from_match(stringmatch.match(clean_key, clean_str(page)))
-        for (page_num, page) in enumerate(text_pages) if page_num in pages
+        pages = list(range(len(text_index)))
+    page_nums = [
+        page_num for page_num in range(len(text_index)) if page_num in pages
     ]
-    page_num = int(np.argmin([match.cost for match in matches]))
-    match = matches[page_num]
-    if match.cost > max_dist:
-        matched_words = None
+    costs = text_index.get_match_costs(key)
+    page_num = page_nums[int(np.argmin([costs[page] for page in page_nums]))]
+    if costs[page_num] > max_dist:
+        word_range = None
     else:
-        matched_words = find_match_words(html_pages[page_num], match)
-        matched_word_text = ' '.join([word.text for word in matched_words])
+        # Only the best page's match needs to be located
+        match = MatchedString.from_match(
+            stringmatch.match(clean_str(key), text_index.clean_pages[page_num]))
+        word_range = text_index.get_match_word_range(page_num, match)
+        matched_word_text = ' '.join(
+            text_index.get_word_texts(page_num)[word_range[0]:word_range[1]])
         if editdistance.eval(key, matched_word_text) > max_dist:
-            matched_words = None
-    return matched_words, page_num
-
-
-def find_match_words(page: bs4.Tag, match: MatchedString) -> List[bs4.Tag]:
-    words = page.find_all('word')
-    start_pos = 0
-    start_token_idx = 0
-    while start_pos < match.start_pos:
-        # Start at the end of partially matching tokens
-        start_pos += len(clean_str(words[start_token_idx].text))
-        start_token_idx += 1
-    end_pos = start_pos
-    end_token_idx = start_token_idx
-    while end_pos < match.end_pos:
-        # Stop at the end of partially matching tokens
-        end_pos += len(clean_str(words[end_token_idx].text))
-        end_token_idx += 1
-    matching_words = words[start_token_idx:end_token_idx]
-    return matching_words
-
-
-def words_to_box(
-    words: Optional[List[bs4.Tag]], target_dpi=settings.DEFAULT_INFERENCE_DPI
-) -> Optional[datamodels.BoxClass]:
-    if words is None or len(words) == 0:
-        return None
-    word_boxes = [
-        datamodels.BoxClass.from_xml(word, target_dpi) for word in words
-    ]
-    return datamodels.enclosing_box(word_boxes)
+            word_range = None
+    return word_range, page_num
 
 
-def tag_to_tokens(tag: bs4.Tag) -> Iterable[str]:
-    for c in tag.contents:
-        if type(c) == bs4.NavigableString:
-            s = c
-        elif hasattr(c, 'text'):
-            s = c.text
-        else:
-            s = ''
-        for token in s.split():
-            yield token
+def count_boxes_inside(box: datamodels.BoxClass, boxes: datamodels.BoxArray) -> int:
+    """Return the number of boxes which box contains, see BoxClass.contains_box."""
+    return int(np.count_nonzero(
+        datamodels.BoxArray.from_boxes([box]).contains_box(boxes)))
 
 
 def match_figures(pdf: str, ignore_errors=False
@@ -203,32 +313,31 @@ def match_figures(pdf: str, ignore_errors=False
     print('.', end='', flush=True)
     logging.info('Matching figures for %s' % pdf)
     try:
-        page_names = pdf_renderer.render(
-            pdf_path=pdf,
-            output_dir=os.path.dirname(pdf),
-            dpi=settings.DEFAULT_INFERENCE_DPI,
-            max_pages=MAX_PAGES,
-            check_retcode=True
-        )
-    except subprocess.CalledProcessError:
-        logging.exception('Failed to render pdf: %s' % pdf)
-        return None
-    try:
-        xml_soup = get_xml_soup(pdf)
-        if xml_soup is None:
+        xml_figures = get_xml_figures(pdf)
+        if xml_figures is None:
             # This can be caused by files with multiple PDFs
-            logging.info('No xml soup found for %s' % pdf)
+            logging.info('No xml found for %s' % pdf)
             return None
-        html_soup = pdf_renderer.extract_text(pdf)
-        if html_soup is None:
-            # pdftotext fails on some corrupt pdfs
-            logging.warning('Pdftotext failed, pdf corrupt: %s' % pdf)
-        html_pages = html_soup.findAll('page')
-        xml_figures = xml_soup.findAll('fig')
-        xml_tables = xml_soup.findAll('table-wrap')
+        # Raises PDFProcessingError if pdftotext fails, as it does on
+        # some corrupt pdfs
+        pdf_pages = xml_parsing.parse_pdftotext_bbox(
+            pdf_renderer.extract_text_path(pdf))
+        # shared by the captions of every figure and table
+        text_index = PdfTextIndex(pdf_pages)
+        text_index.add_keys(
+            xml_fig.label + ' ' + xml_fig.caption
+            for xml_fig in xml_figures
+            if xml_fig.caption is not None and xml_fig.label is not None)
+        # pages are only rendered once a figure's caption is found on them
+        page_images = PageImages(pdf)
         matched_figures = []
-        for xml_fig in xml_figures + xml_tables:
-            matched_figure = match_figure(xml_fig, html_pages, pdf, page_names)
+        # figures are matched in parallel when the concurrency budget
+        # has units to spare, and stop being started once one fails
+        for matched_figure in work_queue.parallel_imap(
+                functools.partial(
+                    match_figure, pdf_pages=text_index, pdf=pdf,
+                    page_images=page_images),
+                xml_figures):
             if matched_figure is None:
                 return None
             else:
@@ -237,12 +346,24 @@ def match_figures(pdf: str, ignore_errors=False
             # Some papers contain figures but don't use standard XML tags
             return None
         else:
+            # The result lists every page, including those without
+            # figures, so the pages not yet read are rendered for it
+            page_names = pdf_renderer.render(
+                pdf_path=pdf,
+                output_dir=os.path.dirname(pdf),
+                dpi=settings.DEFAULT_INFERENCE_DPI,
+                max_pages=MAX_PAGES,
+                check_retcode=True
+            )
             figures_by_page = {page_name: []
                                for page_name in page_names
                               }  # type: Dict[str, List[datamodels.Figure]]
             for fig in matched_figures:
                 figures_by_page[page_names[fig.page]].append(fig)
             return figures_by_page
+    except subprocess.CalledProcessError:
+        logging.exception('Failed to render pdf: %s' % pdf)
+        return None
     except Exception:
         logging.exception('Exception for pdf %s' % pdf)
         if ignore_errors:
@@ -252,43 +373,49 @@ def match_figures(pdf: str, ignore_errors=False
 
 
 def match_figure(
-    xml_fig: bs4.Tag,
-    html_pages: List[bs4.Tag],
+    xml_fig: xml_parsing.NxmlFigure,
+    pdf_pages: Union[List[xml_parsing.PageWords], PdfTextIndex],
     pdf: str,
-    page_names: Optional[List[str]]=None
+    page_images: Union[List[str], PageImages]
 ) -> Optional[datamodels.Figure]:
+    if isinstance(pdf_pages, PdfTextIndex):
+        text_index = pdf_pages
+    else:
+        text_index = PdfTextIndex(pdf_pages)
     if xml_fig.caption is None or xml_fig.label is None:
         # Some tables contain no caption
         logging.warning(
             'No caption or label found for %s in %s' % (xml_fig.name, pdf)
         )
         return None
-    label = xml_fig.label.text
-    caption = label + ' ' + xml_fig.caption.text
-    caption_words, page_num = find_str_words_in_pdf(caption, html_pages)
-    caption_boundary = words_to_box(caption_words)
-    if caption_boundary is None:
+    label = xml_fig.label
+    caption = label + ' ' + xml_fig.caption
+    caption_range, page_num = find_str_word_range(caption, text_index)
+    if caption_range is None or caption_range[0] == caption_range[1]:
         logging.warning('Failed to locate caption for %s in %s' % (label, pdf))
         return None
-    html_page = html_pages[page_num]
-    page_words = html_page.find_all('word')
-    words_inside_box = [
-        word for word in page_words
-        if caption_boundary.contains_box(datamodels.BoxClass.from_xml(word))
-    ]
-    if len(words_inside_box) / len(caption_words) > 1.5:
+    word_boxes = text_index.get_word_boxes(page_num)
+    caption_boundary = word_boxes[caption_range[0]:caption_range[1]].enclosing_box()
+    n_words_inside_box = count_boxes_inside(caption_boundary, word_boxes)
+    n_caption_words = caption_range[1] - caption_range[0]
+    if n_words_inside_box / n_caption_words > 1.5:
         logging.warning(
             '%s in %s includes too many non-caption words: %f' %
-            (label, pdf, len(words_inside_box) / len(caption_words))
+            (label, pdf, n_words_inside_box / n_caption_words)
         )
     if page_num >= MAX_PAGES:  # page_num is 0 indexed
         return None
-    page_im = image_util.read_tensor(page_names[page_num])
+    if work_queue.should_stop():
+        # match_figures has already failed on another figure, so skip
+        # rendering the page and matching the figure
+        return None
+    if isinstance(page_images, PageImages):
+        page_im = page_images[page_num]
+    else:
+        page_im = image_util.read_tensor(page_images[page_num])
     page_height, page_width = page_im.shape[:2]
-    if xml_fig.graphic is not None:
-        image_name = xml_fig.graphic.get('xlink:href')
-        if image_name is None:
-            image_name = xml_fig.graphic.get('href')
+    if xml_fig.has_graphic:
+        image_name = xml_fig.graphic_href
         if image_name is None:
             logging.warning('Figure graphic contains no image')
             return None
@@ -305,21 +432,14 @@ def match_figure(
             return None
     elif xml_fig.name == 'table-wrap':
         # Need to search for footer and table separately since they can be separated in the token stream
-        table_header = xml_fig.find_all('th')
-        table_body = xml_fig.find_all('td')
-        table_footer = xml_fig.find_all('table-wrap-foot')
-        table_tokens = [
-            token
-            for t in table_header + table_body for token in tag_to_tokens(t)
-        ]
-        footer_tokens = [
-            token for t in table_footer for token in t.text.split()
-        ]
-        page_table_content_words, content_dist = find_page_table_words(
-            table_tokens, page_words
+        table_tokens = xml_fig.table_tokens
+        footer_tokens = xml_fig.footer_tokens
+        page_tokens = text_index.get_word_texts(page_num)
+        content_start, content_end, content_dist = find_page_table_word_range(
+            table_tokens, page_tokens
         )
-        page_table_footer_words, footer_dist = find_page_table_words(
-            footer_tokens, page_words
+        footer_start, footer_end, footer_dist = find_page_table_word_range(
+            footer_tokens, page_tokens
         )
         total_dist = content_dist + footer_dist
         total_tokens = len(table_tokens) + len(footer_tokens)
@@ -335,17 +455,15 @@ def match_figure(
                 (label, pdf, total_dist / total_tokens)
             )
             return None
-        page_table_words = page_table_content_words + page_table_footer_words
-        figure_boundary = words_to_box(page_table_words)
-        words_inside_box = [
-            word for word in page_words
-            if
-            figure_boundary.contains_box(datamodels.BoxClass.from_xml(word))
-        ]
-        if len(words_inside_box) / total_tokens > 1.2:
+        figure_boundary = datamodels.BoxArray.concatenate([
+            word_boxes[content_start:content_end],
+            word_boxes[footer_start:footer_end]
+        ]).enclosing_box()
+        n_words_inside_box = count_boxes_inside(figure_boundary, word_boxes)
+        if n_words_inside_box / total_tokens > 1.2:
             logging.warning(
                 '%s in %s includes too many non-table words: %f' %
-                (label, pdf, len(words_inside_box) / total_tokens)
+                (label, pdf, n_words_inside_box / total_tokens)
             )
             return None
     else:
@@ -370,34 +488,72 @@ def match_figure(
     )
 
 
-def find_page_table_words(table_tokens: List[str], page_words: List[bs4.Tag]) -> \
-        Tuple[List[bs4.Tag], int]:
-    if len(table_tokens) == 0:
-        return [], 0
-    assert len(page_words) > 0
+def _get_match_limits(table_tokens: List[str], page_tokens: List[str]) -> List[int]:
+    """Return, for each page token, the last window start it is unmatched from.
+
+    A window of page_tokens starting at start_idx matches the token at
+    idx against table_tokens if fewer occurrences of that token than
+    in table_tokens come before idx in the window, i.e. if start_idx is
+    greater than the returned limit. The limit is idx for tokens not in
+    the table, which are never matched, and -1 for tokens which are
+    matched from every start.
+    """
     table_token_counter = collections.Counter(table_tokens)
-    table_token_count = sum(table_token_counter.values())
-    page_tokens = [word.text for word in page_words]
+    # the last table_token_counter[token] positions of each token
+    previous_idxs = collections.defaultdict(collections.deque)
+    limits = []
+    for idx, token in enumerate(page_tokens):
+        table_count = table_token_counter[token]
+        if table_count == 0:
+            limits.append(idx)
+            continue
+        token_idxs = previous_idxs[token]
+        limits.append(token_idxs[0] if len(token_idxs) == table_count else -1)
+        token_idxs.append(idx)
+        if len(token_idxs) > table_count:
+            token_idxs.popleft()
+    return limits
+
+
+def find_page_table_word_range(table_tokens: List[str], page_tokens: List[str]) -> \
+        Tuple[int, int, int]:
+    """Find the window of page_tokens closest to the multiset table_tokens.
+
+    Returns the window's start and end indices and its distance.
+
+    The distance of a window is the size of the symmetric difference
+    between its tokens and table_tokens. Windows end before the last
+    page word, and ties go to the earliest start and then the earliest
+    end.
+
+    Rather than recounting tokens for every start, the distances of all
+    windows ending at the current word are kept in an array indexed by
+    start and updated as the end advances. Each new word is matched
+    for starts after its match limit, decreasing their distances by one,
+    and unmatched for the rest, increasing them by one.
+    """
+    if len(table_tokens) == 0:
+        return 0, 0, 0
+    assert len(page_tokens) > 0
+    limits = _get_match_limits(table_tokens, page_tokens)
 
+    # distances of the windows [start_idx, end_idx) for each start_idx
+    dists = np.full(len(page_tokens), len(table_tokens), dtype=np.int64)
     best_dist = math.inf
     best_seq = None
-    for start_idx in range(len(page_words)):
-        diff_counter = table_token_counter.copy()
-        cur_dist = table_token_count
-        for end_idx in range(start_idx + 1, len(page_tokens)):
-            cur_token = page_tokens[end_idx - 1]
-            token_count = diff_counter[cur_token]
-            diff_counter[cur_token] = token_count - 1
-            if token_count <= 0:
-                cur_dist += 1
-            else:
-                cur_dist -= 1
-            if cur_dist < best_dist:
-                best_dist = cur_dist
-                best_seq = (start_idx, end_idx)
+    for end_idx in range(1, len(page_tokens)):
+        limit = limits[end_idx - 1]
+        dists[:limit + 1] += 1
+        dists[limit + 1:end_idx] -= 1
+        start_idx = int(np.argmin(dists[:end_idx]))
+        cur_dist = int(dists[start_idx])
+        if cur_dist < best_dist or (
+                cur_dist == best_dist and start_idx < best_seq[0]):
+            best_dist = cur_dist
+            best_seq = (start_idx, end_idx)
     assert best_seq is not None
     best_start, best_end = best_seq
-    return page_words[best_start:best_end], best_dist
+    return best_start, best_end, best_dist
 
 
 def clean_str(s: str) -> str:
@@ -408,68 +564,178 @@ def clean_str(s: str) -> str:
 
 SCALE_FACTOR = .1
 
+# find_fig_box first matches every COARSE_SCALE_STRIDE-th scale, and then
+# the scales around the COARSE_SCALE_PEAKS best of those
+COARSE_SCALE_STRIDE = 3
+COARSE_SCALE_PEAKS = 3
 
-def find_template_in_image(fig_im: np.ndarray, page_im: np.ndarray, scales: List[float], use_canny: bool) -> \
-        Optional[Tuple[datamodels.BoxClass, float, float]]:
-    """
-    Find the position of the best match for fig_im on page_im by checking at each of a list of scales.
-    Each scale is a float in (0,1] representing the ratio of the size of fig_im to page_im (maximum of height ratio and
-    width ratio).
+# The number of threads matching scales at once. run_full_pipeline already
+# runs a process per core, so scales are matched serially by default.
+TEMPLATE_MATCH_WORKERS = 1
+
+
+class TemplateMatcher(object):
+    """Find the best match for a figure's image on a page image at many scales.
+
+    The template and page are prepared once, and the best match at each
+    size the page is resized to is cached, so that scales can be searched
+    coarse to fine without repeating work. OpenCV and Pillow release the
+    GIL, so scales can be matched in parallel threads.
+
+    Each scale is a float in (0,1] representing the ratio of the size of
+    fig_im to page_im (maximum of height ratio and width ratio).
+
+    :param np.ndarray fig_im: the figure's image.
+    :param np.ndarray page_im: the image of the page to search.
+    :param bool use_canny: whether to match the Canny edges of the
+      images rather than the images.
+
+    Raises ValueError if fig_im is too small to be scaled by SCALE_FACTOR.
     """
-    try:
-        template = sp.misc.imresize(fig_im, SCALE_FACTOR)
-    except ValueError:
+
+    def __init__(self, fig_im: np.ndarray, page_im: np.ndarray, use_canny: bool) -> None:
         # This may cause some very small images to have size 0 which causes a ValueError
-        return None
-    (template_height, template_width) = template.shape[:2]
-    (page_height, page_width) = page_im.shape[:2]
-    if use_canny:
-        template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-        template = cv2.Canny(template, 100, 200)
-        page_im = cv2.cvtColor(page_im, cv2.COLOR_BGR2GRAY)
-    found = None
-    best_scale = None
-    template_page_size_ratio = max(
-        template_height / page_height, template_width / page_width
-    )
-    # loop over the scales of the image
-    for scale in (scales)[::-1]:
-        # resize the image according to the scale, and keep track of the ratio of the resizing.
-        page_resized = sp.misc.imresize(
-            page_im, template_page_size_ratio / scale
+        template = image_ops.rescale(fig_im, SCALE_FACTOR)
+        if use_canny:
+            template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            template = cv2.Canny(template, 100, 200)
+            page_im = cv2.cvtColor(page_im, cv2.COLOR_BGR2GRAY)
+        self.template = template
+        self.page_im = page_im
+        self.use_canny = use_canny
+        (self.template_height, self.template_width) = template.shape[:2]
+        (page_height, page_width) = page_im.shape[:2]
+        self.template_page_size_ratio = max(
+            self.template_height / page_height, self.template_width / page_width
         )
-        r = page_im.shape[1] / float(page_resized.shape[1])
+        # the (score, location, ratio) of the best match at each page size
+        self._matches = {}  # type: Dict[Tuple[int, int], Tuple[float, Tuple[int, int], float]]
+
+    def _get_page_size(self, scale: float) -> Tuple[int, int]:
+        # resize the page so that the template is scale of its size
+        (page_height, page_width) = self.page_im.shape[:2]
+        factor = self.template_page_size_ratio / scale
+        return (int(page_height * factor), int(page_width * factor))
+
+    def _match_size(self, page_size: Tuple[int, int]) -> None:
+        if page_size in self._matches:
+            return
+        page_resized = image_ops.resize(self.page_im, page_size)
         assert (
-            page_resized.shape[0] >= template_height and
-            page_resized.shape[1] >= template_width
+            page_resized.shape[0] >= self.template_height and
+            page_resized.shape[1] >= self.template_width
         )
-        if use_canny:
+        if self.use_canny:
             page_resized = cv2.Canny(page_resized, 50, 200)
         result = cv2.matchTemplate(
-            page_resized, template, cv2.TM_CCOEFF_NORMED
+            page_resized, self.template, cv2.TM_CCOEFF_NORMED
         )
         (_, maxVal, _, maxLoc) = cv2.minMaxLoc(result)
-
-        if found is None or maxVal > found[0]:
-            found = (maxVal, maxLoc, r)
-            best_scale = scale
-            logging.debug('Scale: %.03f, Score: %.03f' % (scale, maxVal))
-
-    assert found is not None
-    (score, maxLoc, r) = found
-    (startX, startY) = (int(maxLoc[0] * r), int(maxLoc[1] * r))
-    (endX, endY) = (
-        int((maxLoc[0] + template_width) * r),
-        int((maxLoc[1] + template_height) * r)
-    )
-    fig_box = datamodels.BoxClass(x1=startX, y1=startY, x2=endX, y2=endY)
-    return fig_box, score, best_scale
+        r = self.page_im.shape[1] / float(page_resized.shape[1])
+        self._matches[page_size] = (maxVal, maxLoc, r)
+
+    def get_scores(self, scales: List[float], max_workers: int=TEMPLATE_MATCH_WORKERS) -> List[float]:
+        """Return the score of the best match at each of scales."""
+        page_sizes = [self._get_page_size(scale) for scale in scales]
+        new_sizes = [
+            page_size for page_size in dict.fromkeys(page_sizes)
+            if page_size not in self._matches
+        ]
+        if max_workers > 1 and len(new_sizes) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(self._match_size, new_sizes))
+        else:
+            for page_size in new_sizes:
+                self._match_size(page_size)
+        return [self._matches[page_size][0] for page_size in page_sizes]
+
+    def find_best(self, scales: List[float], max_workers: int=TEMPLATE_MATCH_WORKERS) -> \
+            Tuple[datamodels.BoxClass, float, float]:
+        """Return the box, score and scale of the best match over scales.
+
+        Ties go to the largest scale.
+        """
+        scores = self.get_scores(scales, max_workers)
+        found = None
+        best_scale = None
+        # loop over the scales of the image
+        for (scale, score) in reversed(list(zip(scales, scores))):
+            if found is None or score > found[0]:
+                found = self._matches[self._get_page_size(scale)]
+                best_scale = scale
+                logging.debug('Scale: %.03f, Score: %.03f' % (scale, score))
+
+        assert found is not None
+        (score, maxLoc, r) = found
+        (startX, startY) = (int(maxLoc[0] * r), int(maxLoc[1] * r))
+        (endX, endY) = (
+            int((maxLoc[0] + self.template_width) * r),
+            int((maxLoc[1] + self.template_height) * r)
+        )
+        fig_box = datamodels.BoxClass(x1=startX, y1=startY, x2=endX, y2=endY)
+        return fig_box, score, best_scale
+
+    def search(
+        self,
+        scales: List[float],
+        stride: int=COARSE_SCALE_STRIDE,
+        n_peaks: int=COARSE_SCALE_PEAKS,
+        max_workers: int=TEMPLATE_MATCH_WORKERS
+    ) -> Tuple[datamodels.BoxClass, float, float]:
+        """Find the best match over the sorted scales, coarse to fine.
+
+        Every stride-th scale, and the last, is matched first. Then only
+        the scales next to the n_peaks best of those are matched, and
+        the best match over all the matched scales is returned as with
+        find_best.
+        """
+        coarse_idxs = list(range(0, len(scales), stride))
+        if coarse_idxs[-1] != len(scales) - 1:
+            coarse_idxs.append(len(scales) - 1)
+        coarse_scores = self.get_scores(
+            [scales[idx] for idx in coarse_idxs], max_workers)
+        peak_idxs = [
+            idx for (_, idx) in sorted(
+                zip(coarse_scores, coarse_idxs), key=lambda x: -x[0]
+            )[:n_peaks]
+        ]
+        idxs = set(coarse_idxs)
+        for idx in peak_idxs:
+            idxs.update(range(max(idx - stride + 1, 0), min(idx + stride, len(scales))))
+        return self.find_best([scales[idx] for idx in sorted(idxs)], max_workers)
+
+
+def find_template_in_image(
+    fig_im: np.ndarray,
+    page_im: np.ndarray,
+    scales: List[float],
+    use_canny: bool,
+    max_workers: int=TEMPLATE_MATCH_WORKERS
+) -> Optional[Tuple[datamodels.BoxClass, float, float]]:
+    """
+    Find the position of the best match for fig_im on page_im by checking at each of a list of scales.
+    Each scale is a float in (0,1] representing the ratio of the size of fig_im to page_im (maximum of height ratio and
+    width ratio).
+    """
+    try:
+        matcher = TemplateMatcher(fig_im, page_im, use_canny)
+    except ValueError:
+        return None
+    return matcher.find_best(scales, max_workers)
 
 
 def find_fig_box(
-    fig_im: np.ndarray, page_im: np.ndarray, use_canny: bool=False
+    fig_im: np.ndarray,
+    page_im: np.ndarray,
+    use_canny: bool=False,
+    max_workers: int=TEMPLATE_MATCH_WORKERS
 ) -> Optional[datamodels.BoxClass]:
-    """Find the position of the best match for fig_im on page_im through multi scale template matching."""
+    """Find the position of the best match for fig_im on page_im through multi scale template matching.
+
+    The coarse scales are searched coarse to fine with TemplateMatcher.search,
+    and then refined around the best of them. The matcher is shared by both
+    passes, so page sizes they have in common are only matched once.
+    """
     # If we get a score below this threshold, it's probably a bad detection
     score_threshold = 0.8
     scales = np.concatenate(
@@ -479,25 +745,32 @@ def find_fig_box(
         ),
         axis=0
     )  # type: List
-    res = find_template_in_image(fig_im, page_im, scales, use_canny)
-    if res is None:
+    try:
+        matcher = TemplateMatcher(fig_im, page_im, use_canny)
+    except ValueError:
         return None
-    fig_box, score, best_scale = res
+    fig_box, score, best_scale = matcher.search(scales, max_workers=max_workers)
     refined_scales = [
         scale
         for scale in np.linspace(.97 * best_scale, 1.03 * best_scale, 16)
         if scale <= 1.0
     ]
     (refined_fig_box, refined_score,
-     best_refined_scale) = find_template_in_image(
-         fig_im, page_im, refined_scales, use_canny
-     )
+     best_refined_scale) = matcher.find_best(refined_scales, max_workers)
     if refined_score < score_threshold:
         return None
     else:
         return refined_fig_box
 
 
+def match_pdf(pdf: str) -> Optional[Dict[str, List[datamodels.Figure]]]:
+    """Record the SHA-1 of pdf next to it and return match_figures(pdf)."""
+    sha1sum = file_util.compute_sha1(pdf)
+    with open(pdf + '.sha1', 'w') as f:
+        print(sha1sum, file=f)
+    return match_figures(pdf)
+
+
 def run_full_pipeline(
     tarpath: str, skip_done: bool=True, save_intermediate: bool=False
 ) -> None:
@@ -510,7 +783,10 @@ def run_full_pipeline(
     d = LOCAL_INTERMEDIATE_DIR + get_bin(tarpath)
     while True:
         try:
-            file_util.extract_tarfile(tarpath, d, streaming=False)
+            file_util.extract_tarfile(
+                tarpath, d, streaming=False,
+                member_filter=TAR_MEMBER_FILTER,
+                max_member_size=MAX_TAR_MEMBER_SIZE)
             # botocore.vendored.requests.packages.urllib3.exceptions.ReadTimeoutError can't be caught because it doesn't
             # inherit from BaseException, so don't use streaming
             break
@@ -518,13 +794,11 @@ def run_full_pipeline(
             logging.exception('Failure reading %s, retrying' % tarpath)
         except ReadTimeout as e:
             logging.exception('Timeout reading %s, retrying' % tarpath)
-    pdfs = glob.glob(d + foldername + '/' + '*.pdf')
+    pdfs = sorted(glob.glob(d + foldername + '/' + '*.pdf'))
     res = dict()
-    for pdf in pdfs:
-        sha1sum = file_util.compute_sha1(pdf)
-        with open(pdf + '.sha1', 'w') as f:
-            print(sha1sum, file=f)
-        paper_figures = match_figures(pdf)
+    # PDFs are matched in parallel when the concurrency budget has units
+    # to spare, and their results merged in order
+    for paper_figures in work_queue.parallel_imap(match_pdf, pdfs):
         if paper_figures is not None:
             res.update(paper_figures)
     if save_intermediate:
@@ -538,33 +812,35 @@ def run_full_pipeline(
         result_path,
         config.JsonSerializable.serialize(res),
         indent=2,
-        sort_keys=True
+        sort_keys=True,
+        compact=settings.COMPACT_JSON_OUTPUT
     )
 
 
+def iterate_input_tars() -> Iterator[str]:
+    """Yields the PMC source tarfiles, listing one top-level directory at a time."""
+    for n in range(256):
+        yield from get_input_tars('%.2x' % n)
+
+
 def run_on_all() -> None:
     Image.MAX_IMAGE_PIXELS = int(1e8)  # Don't render very large PDFs.
     Image.warnings.simplefilter('error', Image.DecompressionBombWarning)
 
     print(datetime.datetime.now())
     print('Starting', flush=True)
-    topdirs = ['%.2x' % n for n in range(256)]
-    dirs_per_partition = 32
-    for partition in range(0, len(topdirs), dirs_per_partition):
-        curdirs = topdirs[partition:partition + dirs_per_partition]
-        print(datetime.datetime.now())
-        print('Processing dirs: %s' % str(curdirs))
-        with multiprocessing.Pool() as p:
-            nested_tarfiles = p.map(
-                get_input_tars, [topdir for topdir in curdirs]
-            )
-        tarfiles = [t for tarfiles in nested_tarfiles for t in tarfiles]
-        assert len(tarfiles) == len(set(tarfiles))
-        print(datetime.datetime.now())
-        print('Processing %d tarfiles in %s' % (len(tarfiles), str(curdirs)))
-        with multiprocessing.Pool(processes=round(1.5 * os.cpu_count())) as p:
-            p.map(run_full_pipeline, tarfiles)
-        print('All done')
+    processes = round(1.5 * os.cpu_count())
+    work_queue.run_work_queue(
+        run_full_pipeline,
+        iterate_input_tars(),
+        processes=processes,
+        manifest_path=MANIFEST_PATH,
+        # PDFs and figures fan out to threads only once every tarfile
+        # is listed and fewer than processes are left running
+        concurrency=processes,
+        report=lambda progress: print(
+            datetime.datetime.now(), progress, flush=True))
+    print('All done')
 
 
 if __name__ == "__main__":
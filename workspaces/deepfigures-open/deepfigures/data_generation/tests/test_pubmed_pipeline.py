@@ -0,0 +1,372 @@
+"""Tests for deepfigures.data_generation.pubmed_pipeline."""
+
+import collections
+import math
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from deepfigures import settings
+from deepfigures.data_generation import pubmed_pipeline
+from deepfigures.extraction import datamodels, xml_parsing
+
+
+def brute_force_table_word_range(table_tokens, page_tokens):
+    """Search every window of page_tokens, counting each one afresh."""
+    if len(table_tokens) == 0:
+        return 0, 0, 0
+    table_token_counter = collections.Counter(table_tokens)
+    best_dist = math.inf
+    best_seq = None
+    for start_idx in range(len(page_tokens)):
+        diff_counter = table_token_counter.copy()
+        cur_dist = len(table_tokens)
+        for end_idx in range(start_idx + 1, len(page_tokens)):
+            token_count = diff_counter[page_tokens[end_idx - 1]]
+            diff_counter[page_tokens[end_idx - 1]] = token_count - 1
+            if token_count <= 0:
+                cur_dist += 1
+            else:
+                cur_dist -= 1
+            if cur_dist < best_dist:
+                best_dist = cur_dist
+                best_seq = (start_idx, end_idx)
+    if best_seq is None:
+        return None
+    return best_seq[0], best_seq[1], best_dist
+
+
+def brute_force_match_limits(table_tokens, page_tokens):
+    """Find the last start of a window in which each token is unmatched."""
+    table_token_counter = collections.Counter(table_tokens)
+    limits = []
+    for idx, token in enumerate(page_tokens):
+        limit = -1
+        for start_idx in range(idx + 1):
+            if (page_tokens[start_idx:idx].count(token) >=
+                    table_token_counter[token]):
+                limit = start_idx
+        limits.append(limit)
+    return limits
+
+
+def random_tokens(rng):
+    """Return random table and page tokens, with many repeats."""
+    vocab = ['w%d' % i for i in range(rng.randint(1, 8))]
+    page_tokens = [rng.choice(vocab) for _ in range(rng.randint(2, 40))]
+    table_tokens = [
+        rng.choice(vocab + ['missing']) for _ in range(rng.randint(0, 15))]
+    return table_tokens, page_tokens
+
+
+class TestGetMatchLimits(unittest.TestCase):
+    """Test deepfigures.data_generation.pubmed_pipeline._get_match_limits."""
+
+    def test_matches_brute_force(self):
+        """Test the limits match a search over every window start."""
+        rng = random.Random(0)
+        for _ in range(500):
+            table_tokens, page_tokens = random_tokens(rng)
+            self.assertEqual(
+                pubmed_pipeline._get_match_limits(table_tokens, page_tokens),
+                brute_force_match_limits(table_tokens, page_tokens),
+                msg=(table_tokens, page_tokens))
+
+    def test_empty(self):
+        """Test tokens are never matched against an empty table."""
+        self.assertEqual(
+            pubmed_pipeline._get_match_limits([], ['a', 'b', 'a']),
+            [0, 1, 2])
+        self.assertEqual(pubmed_pipeline._get_match_limits(['a'], []), [])
+
+
+class TestFindPageTableWordRange(unittest.TestCase):
+    """Test deepfigures.data_generation.pubmed_pipeline.find_page_table_word_range."""
+
+    def test_matches_brute_force(self):
+        """Test the window, distance and tie-breaking match a full search."""
+        rng = random.Random(1)
+        for _ in range(500):
+            table_tokens, page_tokens = random_tokens(rng)
+            self.assertEqual(
+                pubmed_pipeline.find_page_table_word_range(
+                    table_tokens, page_tokens),
+                brute_force_table_word_range(table_tokens, page_tokens),
+                msg=(table_tokens, page_tokens))
+
+    def test_repeated_tokens(self):
+        """Test tokens repeated in the table are each matched once."""
+        page_tokens = ['x', 'a', 'a', 'a', 'b', 'a', 'y', 'z']
+        table_tokens = ['a', 'a', 'b']
+        self.assertEqual(
+            pubmed_pipeline.find_page_table_word_range(
+                table_tokens, page_tokens),
+            brute_force_table_word_range(table_tokens, page_tokens))
+        self.assertEqual(
+            pubmed_pipeline.find_page_table_word_range(
+                table_tokens, page_tokens),
+            (2, 5, 0))
+
+    def test_empty_table(self):
+        """Test an empty table matches the empty window."""
+        self.assertEqual(
+            pubmed_pipeline.find_page_table_word_range([], ['a', 'b']),
+            (0, 0, 0))
+        self.assertEqual(
+            pubmed_pipeline.find_page_table_word_range([], []), (0, 0, 0))
+
+    def test_one_word_page(self):
+        """Test a one-word page has no windows, as in a full search."""
+        self.assertIsNone(brute_force_table_word_range(['a'], ['a']))
+        with self.assertRaises(AssertionError):
+            pubmed_pipeline.find_page_table_word_range(['a'], ['a'])
+
+
+# the scales find_fig_box searches
+FIG_BOX_SCALES = np.concatenate((
+    np.logspace(np.log10(.1), np.log10(.2), 5),
+    np.logspace(np.log10(.2), np.log10(.95), 40)
+))
+
+
+def make_page_and_figure(rng, scale, position):
+    """Return a figure's image and a page with it pasted in at scale of
+    the page's width, with its top left corner at position."""
+    page = np.full((1100, 850, 3), 255, np.uint8)
+    # rows of text-like marks
+    for y in range(60, 1040, 14):
+        for x in range(60, 790, 9):
+            if rng.rand() < .7:
+                page[y:y + 8, x:x + 6] = rng.randint(0, 80)
+    fig = np.full((600, 800, 3), 255, np.uint8)
+    for _ in range(40):
+        cv2.line(
+            fig,
+            (int(rng.randint(800)), int(rng.randint(600))),
+            (int(rng.randint(800)), int(rng.randint(600))),
+            tuple(int(c) for c in rng.randint(0, 255, 3)), 3)
+    cv2.rectangle(fig, (0, 0), (799, 599), (0, 0, 0), 2)
+    width = int(850 * scale)
+    height = width * 3 // 4
+    (x, y) = position
+    page[y:y + height, x:x + width] = cv2.resize(
+        fig, (width, height), interpolation=cv2.INTER_AREA)
+    return fig, page
+
+
+class TestFindFigBox(unittest.TestCase):
+    """Test deepfigures.data_generation.pubmed_pipeline.find_fig_box."""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.cases = [
+            ((x, y, int(850 * scale)),
+             make_page_and_figure(rng, scale, (x, y)))
+            for (scale, x, y) in [(.3, 400, 100), (.55, 50, 600), (.8, 80, 200)]
+        ]
+
+    def test_matches_full_search(self):
+        """Test the coarse to fine search matches every scale."""
+        for ((x, y, width), (fig, page)) in self.cases:
+            matcher = pubmed_pipeline.TemplateMatcher(fig, page, False)
+            _, _, best_scale = matcher.find_best(FIG_BOX_SCALES)
+            refined_scales = [
+                scale
+                for scale in np.linspace(.97 * best_scale, 1.03 * best_scale, 16)
+                if scale <= 1.0
+            ]
+            full_box, _, _ = matcher.find_best(refined_scales)
+            fig_box = pubmed_pipeline.find_fig_box(fig, page)
+            self.assertIsNotNone(fig_box)
+            for (found, expected) in zip(
+                    (fig_box.x1, fig_box.y1, fig_box.x2, fig_box.y2),
+                    (full_box.x1, full_box.y1, full_box.x2, full_box.y2)):
+                self.assertLessEqual(abs(found - expected), 1)
+            # and both find the figure where it was pasted
+            self.assertLessEqual(abs(fig_box.x1 - x), 10)
+            self.assertLessEqual(abs(fig_box.y1 - y), 10)
+            self.assertLessEqual(abs(fig_box.x2 - fig_box.x1 - width), 10)
+
+    def test_scores_reused(self):
+        """Test each page size is only matched once."""
+        ((_, _, _), (fig, page)) = self.cases[0]
+        matcher = pubmed_pipeline.TemplateMatcher(fig, page, False)
+        with mock.patch.object(
+                pubmed_pipeline.cv2, 'matchTemplate',
+                wraps=cv2.matchTemplate) as match_template:
+            _, _, best_scale = matcher.search(FIG_BOX_SCALES)
+            searched_calls = match_template.call_count
+            self.assertEqual(searched_calls, len(matcher._matches))
+            self.assertLess(searched_calls, len(FIG_BOX_SCALES))
+            # the best scale's page size has already been matched
+            matcher.find_best([best_scale])
+            self.assertEqual(match_template.call_count, searched_calls)
+            matcher.find_best(FIG_BOX_SCALES)
+            self.assertEqual(
+                match_template.call_count, len(matcher._matches))
+            self.assertEqual(
+                len(matcher._matches),
+                len({matcher._get_page_size(scale) for scale in FIG_BOX_SCALES}))
+
+
+def layout_lines(lines):
+    """Lay out lines of words as pdftotext would box them, in points.
+
+    :param lines: (words, x, y) for each line, with the line starting at
+      (x, y).
+
+    :returns: the texts and boxes of the words, in order.
+    """
+    texts = []
+    coords = []
+    for (words, x, y) in lines:
+        for word in words.split():
+            texts.append(word)
+            coords.append((x, y, x + 6 * len(word), y + 10))
+            x += 6 * len(word) + 4
+    return texts, coords
+
+
+class TestMatchFigure(unittest.TestCase):
+    """Test deepfigures.data_generation.pubmed_pipeline.match_figure."""
+
+    caption_lines = [
+        ('Table 1 Characteristics of the patients in each', 72, 100),
+        ('treatment group', 72, 112),
+    ]
+    table_lines = [
+        ('Group Age Weight', 72, 130),
+        ('A 34 70', 72, 142),
+        ('B 41 82', 72, 154),
+    ]
+    footer_lines = [('Values are means', 72, 170)]
+    body_lines = [
+        ('The patients were followed up for two years after', 72, 300),
+        ('treatment and none were lost to follow up.', 72, 312),
+    ]
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+        self.pdf = os.path.join(self.tmpdir, 'paper.pdf')
+        self.page_images = []
+        for page_num in range(2):
+            page_image = os.path.join(self.tmpdir, 'page-%d.png' % page_num)
+            cv2.imwrite(page_image, np.full((1100, 850, 3), 255, np.uint8))
+            self.page_images.append(page_image)
+        self.xml_fig = xml_parsing.NxmlFigure(
+            name='table-wrap',
+            label='Table 1',
+            caption='Characteristics of the patients in each treatment group',
+            table_tokens='Group Age Weight A 34 70 B 41 82'.split(),
+            footer_tokens='Values are means'.split())
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _match(self, extra_lines=()):
+        intro_texts, intro_coords = layout_lines(
+            [('Introduction Many trials have compared the treatments', 72, 72)])
+        texts, coords = layout_lines(
+            self.caption_lines + self.table_lines + self.footer_lines +
+            self.body_lines + list(extra_lines))
+        text_index = pubmed_pipeline.PdfTextIndex([
+            xml_parsing.PageWords(
+                intro_texts, datamodels.BoxArray(np.array(intro_coords))),
+            xml_parsing.PageWords(texts, datamodels.BoxArray(np.array(coords)))
+        ])
+        return pubmed_pipeline.match_figure(
+            self.xml_fig, text_index, self.pdf, self.page_images)
+
+    def _get_box(self, lines):
+        _, coords = layout_lines(lines)
+        return datamodels.BoxArray(np.array(coords)).rescale(
+            settings.DEFAULT_INFERENCE_DPI / 72).enclosing_box()
+
+    def test_table(self):
+        """Test the caption and table are boxed at the inference dpi."""
+        figure = self._match()
+        self.assertEqual(figure.page, 1)
+        self.assertEqual(figure.figure_type, 'Table')
+        self.assertEqual(figure.name, 'Table 1')
+        self.assertEqual(
+            figure.caption_boundary.to_dict(),
+            self._get_box(self.caption_lines).to_dict())
+        self.assertEqual(
+            figure.figure_boundary.to_dict(),
+            self._get_box(self.table_lines + self.footer_lines).to_dict())
+        self.assertEqual((figure.page_height, figure.page_width), (1100, 850))
+
+    def test_non_caption_words(self):
+        """Test words inside the caption's box are warned about."""
+        # read after the body, but inside the caption's box
+        figure_notes = [('see fig 2 and 3 in text', 200, 112)]
+        with self.assertLogs(level='WARNING') as logs:
+            figure = self._match(figure_notes)
+        self.assertIn('too many non-caption words', logs.output[0])
+        self.assertEqual(
+            figure.caption_boundary.to_dict(),
+            self._get_box(self.caption_lines).to_dict())
+
+    def test_non_table_words(self):
+        """Test a table whose box holds too many other words is rejected."""
+        margin_notes = [
+            ('a b c d e f', 120, 142),
+            ('a b c d e f', 120, 154),
+        ]
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertIsNone(self._match(margin_notes))
+        self.assertIn('too many non-table words', logs.output[-1])
+
+    def test_table_not_found(self):
+        """Test a table whose words are not on the page is rejected."""
+        self.xml_fig.table_tokens = 'Dose Response X Y Z 1 2 3 4'.split()
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertIsNone(self._match())
+        self.assertIn('too far from the xml table', logs.output[-1])
+
+
+def make_text_index(pages):
+    """Return a PdfTextIndex of pages, each a list of lines for layout_lines."""
+    page_words = []
+    for lines in pages:
+        texts, coords = layout_lines(lines)
+        page_words.append(xml_parsing.PageWords(
+            texts, datamodels.BoxArray(np.array(coords))))
+    return pubmed_pipeline.PdfTextIndex(page_words)
+
+
+class TestFindStrWordRange(unittest.TestCase):
+    """Test deepfigures.data_generation.pubmed_pipeline.find_str_word_range."""
+
+    def setUp(self):
+        self.text_index = make_text_index([
+            [('Introduction Many trials have compared the treatments', 72, 72)],
+            [('Figure 1 Survival of the patients by group', 72, 100),
+             ('The patients were followed up for two years', 72, 300)],
+        ])
+
+    def test_match(self):
+        """Test the best page and its matched words are found."""
+        self.assertEqual(
+            pubmed_pipeline.find_str_word_range(
+                'Figure 1 Survival of the patients', self.text_index),
+            ((0, 6), 1))
+
+    def test_pages(self):
+        """Test the page and words found are those of text_index."""
+        self.assertEqual(
+            pubmed_pipeline.find_str_word_range(
+                'The patients were followed up', self.text_index, pages=[1]),
+            ((8, 13), 1))
+
+    def test_max_dist(self):
+        """Test a key farther than max_dist from every page is not matched."""
+        word_range, _ = pubmed_pipeline.find_str_word_range(
+            'zzzzzzzz', self.text_index, max_dist=1)
+        self.assertIsNone(word_range)
@@ -9,8 +9,8 @@ from typing import List, Optional, Tuple, Union
 from matplotlib import patches
 import numpy as np
 
-from deepfigures.utils import traits
-from deepfigures.utils.config import JsonSerializable
+from deepfigures.utils import image_util, traits
+from deepfigures.utils.config import JsonRecord, JsonSerializable
 
 from deepfigures.settings import (DEFAULT_INFERENCE_DPI, BACKGROUND_COLOR)
 
@@ -20,11 +20,30 @@ ImageSize = Union[Tuple[float, float], Tuple[float, float, float]
                  ]  # Page sizes may have a third color channel
 
 
-class BoxClass(JsonSerializable):
-    x1 = traits.Float(allow_none=False)
-    y1 = traits.Float(allow_none=False)
-    x2 = traits.Float(allow_none=False)
-    y2 = traits.Float(allow_none=False)
+class BoxClass(JsonRecord):
+    """A box with corners (x1, y1) and (x2, y2) in pixel coordinates.
+
+    Boxes are created in very large numbers when generating data, so they
+    are slotted records rather than traitlets. See BoxArray for
+    operations over many boxes at once.
+    """
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
+    def __init__(
+        self, x1: float=0., y1: float=0., x2: float=0., y2: float=0.
+    ) -> None:
+        self.x1 = float(x1)
+        self.y1 = float(y1)
+        self.x2 = float(x2)
+        self.y2 = float(y2)
+
+    def to_dict(self) -> dict:
+        return {'x1': self.x1, 'y1': self.y1, 'x2': self.x2, 'y2': self.y2}
+
+    @staticmethod
+    def from_dict(json_data: dict) -> 'BoxClass':
+        return BoxClass(
+            json_data['x1'], json_data['y1'], json_data['x2'], json_data['y2'])
 
     @staticmethod
     def from_tuple(t: Tuple[float, float, float, float]) -> 'BoxClass':
@@ -41,7 +60,7 @@ class BoxClass(JsonSerializable):
 
     @staticmethod
     def from_xml(word, target_dpi=DEFAULT_INFERENCE_DPI) -> 'BoxClass':
-        scale_factor = DEFAULT_INFERENCE_DPI / 72
+        scale_factor = target_dpi / 72
         return BoxClass(
             x1=float(word.get('xMin')),
             y1=float(word.get('yMin')),
@@ -109,27 +128,32 @@ class BoxClass(JsonSerializable):
         (x1, y1, x2, y2) = self.get_rounded()
         return image[y1:y2, x1:x2]
 
-    def crop_whitespace_edges(self, im: np.ndarray) -> Optional['BoxClass']:
-        (rounded_x1, rounded_y1, rounded_x2, rounded_y2) = self.get_rounded()
-        white_im = im.copy()
-        white_im[:, :rounded_x1] = BACKGROUND_COLOR
-        white_im[:, rounded_x2:] = BACKGROUND_COLOR
-        white_im[:rounded_y1, :] = BACKGROUND_COLOR
-        white_im[rounded_y2:, :] = BACKGROUND_COLOR
-        is_white = (white_im == BACKGROUND_COLOR).all(axis=2)
-        nonwhite_columns = np.where(is_white.all(axis=0) != 1)[0]
-        nonwhite_rows = np.where(is_white.all(axis=1) != 1)[0]
-        if len(nonwhite_columns) == 0 or len(nonwhite_rows) == 0:
+    def crop_whitespace_edges(
+        self,
+        im: np.ndarray,
+        ink_index: Optional[image_util.InkIndex]=None
+    ) -> Optional['BoxClass']:
+        """Shrink the box to the non-background pixels of im inside it.
+
+        :param np.ndarray im: the page image.
+        :param Optional[InkIndex] ink_index: an index of im. Building it
+          once per page makes cropping each box on the page much cheaper.
+
+        :returns: the cropped box, or None if the box holds only background.
+        """
+        rounded = self.get_rounded()
+        (rounded_x1, rounded_y1, rounded_x2, rounded_y2) = rounded
+        if ink_index is None:
+            extent = image_util.ink_extent(im, rounded, BACKGROUND_COLOR)
+        else:
+            extent = ink_index.ink_extent(rounded)
+        if extent is None:
             return None
-        x1 = min(nonwhite_columns)
-        x2 = max(nonwhite_columns) + 1
-        y1 = min(nonwhite_rows)
-        y2 = max(nonwhite_rows) + 1
+        (x1, y1, x2, y2) = extent
         assert x1 >= rounded_x1, 'ERROR:  x1:%d box[0]:%d' % (x1, rounded_x1)
         assert y1 >= rounded_y1, 'ERROR:  y1:%d box[1]:%d' % (y1, rounded_y1)
         assert x2 <= rounded_x2, 'ERROR:  x2:%d box[2]:%d' % (x2, rounded_x2)
         assert y2 <= rounded_y2, 'ERROR:  y2:%d box[3]:%d' % (y2, rounded_y2)
-        # np.where returns np.int64, cast back to python types
         return BoxClass(x1=float(x1), y1=float(y1), x2=float(x2), y2=float(y2))
 
     def distance_to_other(self, other: 'BoxClass') -> float:
@@ -192,6 +216,178 @@ def enclosing_box(boxes: List[BoxClass]) -> BoxClass:
     )
 
 
+def box_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Return BoxClass.distance_to_other for broadcastable arrays of boxes.
+
+    :param np.ndarray a: an array of shape (..., 4) holding rows of
+      (x1, y1, x2, y2).
+    :param np.ndarray b: an array of boxes broadcastable against a.
+    """
+    # The x and y gaps between the boxes, 0 if they overlap
+    gaps = np.maximum(
+        np.maximum(a[..., :2] - b[..., 2:], b[..., :2] - a[..., 2:]), 0)
+    # Take the dot product with matmul, which gives the same rounding
+    # as the np.linalg.norm call in BoxClass.distance_to_other.
+    return np.sqrt((gaps[..., None, :] @ gaps[..., :, None])[..., 0, 0])
+
+
+class BoxArray(object):
+    """An array of N boxes, stored as the rows (x1, y1, x2, y2) of coords.
+
+    The methods mirror those of BoxClass, applied to every box at once.
+    Methods comparing two sets of boxes return an N x M matrix holding
+    the result for each pair of boxes.
+
+    :param np.ndarray coords: an array of shape (N, 4).
+    """
+    __slots__ = ('coords',)
+
+    def __init__(self, coords: np.ndarray) -> None:
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+
+    @staticmethod
+    def from_boxes(boxes: List[BoxClass]) -> 'BoxArray':
+        return BoxArray([(box.x1, box.y1, box.x2, box.y2) for box in boxes])
+
+    @staticmethod
+    def concatenate(box_arrays: List['BoxArray']) -> 'BoxArray':
+        return BoxArray(np.concatenate(
+            [box_array.coords for box_array in box_arrays] + [np.zeros((0, 4))]))
+
+    def to_boxes(self) -> List[BoxClass]:
+        return [BoxClass(*row) for row in self.coords.tolist()]
+
+    @staticmethod
+    def from_xml(words, target_dpi=DEFAULT_INFERENCE_DPI) -> 'BoxArray':
+        """Load the boxes of pdftotext word tags, see BoxClass.from_xml."""
+        return BoxArray([
+            (word.get('xMin'), word.get('yMin'), word.get('xMax'), word.get('yMax'))
+            for word in words
+        ]).rescale(target_dpi / 72)
+
+    @staticmethod
+    def from_dicts(json_data: List[dict]) -> 'BoxArray':
+        """Load boxes from a list of BoxClass.to_dict outputs."""
+        return BoxArray([
+            (box['x1'], box['y1'], box['x2'], box['y2']) for box in json_data
+        ])
+
+    def to_dicts(self) -> List[dict]:
+        """Return the boxes as a list of BoxClass.to_dict outputs."""
+        return [
+            {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+            for (x1, y1, x2, y2) in self.coords.tolist()
+        ]
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def __getitem__(self, key) -> Union[BoxClass, 'BoxArray']:
+        if isinstance(key, (int, np.integer)):
+            return BoxClass(*self.coords[key].tolist())
+        return BoxArray(self.coords[key])
+
+    def __repr__(self):
+        return 'BoxArray(%r)' % self.coords
+
+    @property
+    def x1(self) -> np.ndarray:
+        return self.coords[:, 0]
+
+    @property
+    def y1(self) -> np.ndarray:
+        return self.coords[:, 1]
+
+    @property
+    def x2(self) -> np.ndarray:
+        return self.coords[:, 2]
+
+    @property
+    def y2(self) -> np.ndarray:
+        return self.coords[:, 3]
+
+    def get_widths(self) -> np.ndarray:
+        return self.x2 - self.x1
+
+    def get_heights(self) -> np.ndarray:
+        return self.y2 - self.y1
+
+    def get_areas(self) -> np.ndarray:
+        widths = self.get_widths()
+        heights = self.get_heights()
+        return np.where((widths > 0) & (heights > 0), widths * heights, 0.)
+
+    def get_rounded(self) -> np.ndarray:
+        """Return the integer (N, 4) array of BoxClass.get_rounded."""
+        # np.round rounds halves to even, like python 3's round
+        return np.round(self.coords).astype(np.int64)
+
+    def rescale(self, ratio: float) -> 'BoxArray':
+        return BoxArray(self.coords * ratio)
+
+    def resize_by_page(
+        self, cur_page_size: ImageSize, target_page_size: ImageSize
+    ) -> 'BoxArray':
+        (orig_h, orig_w) = cur_page_size[:2]
+        (target_h, target_w) = target_page_size[:2]
+        height_scale = target_h / orig_h
+        width_scale = target_w / orig_w
+        return BoxArray(
+            self.coords *
+            np.array([width_scale, height_scale, width_scale, height_scale])
+        )
+
+    def expand_box(self, amount: float) -> 'BoxArray':
+        return BoxArray(self.coords + np.array([-amount, -amount, amount, amount]))
+
+    def crop_to_page(self, page_shape: ImageSize) -> 'BoxArray':
+        page_height, page_width = page_shape[:2]
+        return BoxArray(np.stack([
+            np.maximum(self.x1, 0),
+            np.maximum(self.y1, 0),
+            np.minimum(self.x2, page_width),
+            np.minimum(self.y2, page_height),
+        ], axis=1))
+
+    def intersection(self, other: 'BoxArray') -> np.ndarray:
+        """Return the area of the intersection of each pair of boxes."""
+        widths = (
+            np.minimum(self.x2[:, None], other.x2[None, :]) -
+            np.maximum(self.x1[:, None], other.x1[None, :]))
+        heights = (
+            np.minimum(self.y2[:, None], other.y2[None, :]) -
+            np.maximum(self.y1[:, None], other.y1[None, :]))
+        return np.where((widths > 0) & (heights > 0), widths * heights, 0.)
+
+    def iou(self, other: 'BoxArray') -> np.ndarray:
+        intersection = self.intersection(other)
+        union = (
+            self.get_areas()[:, None] + other.get_areas()[None, :] -
+            intersection)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(union == 0, 0., intersection / union)
+
+    def contains_box(
+        self, other: 'BoxArray', overlap_threshold=.5
+    ) -> np.ndarray:
+        """Return whether each box of self contains each box of other."""
+        other_areas = other.get_areas()[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (other_areas != 0) & (
+                self.intersection(other) / other_areas >= overlap_threshold)
+
+    def distance_to_other(self, other: 'BoxArray') -> np.ndarray:
+        """Return the distance between each pair of boxes."""
+        return box_distances(self.coords[:, None, :], other.coords[None, :, :])
+
+    def enclosing_box(self) -> BoxClass:
+        """Return the smallest box enclosing every box, see enclosing_box."""
+        assert len(self) > 0
+        (x1, y1) = self.coords[:, :2].min(axis=0).tolist()
+        (x2, y2) = self.coords[:, 2:].max(axis=0).tolist()
+        return BoxClass(x1=x1, y1=y1, x2=x2, y2=y2)
+
+
 class Figure(JsonSerializable):
     figure_boundary = traits.Instance(BoxClass)
     caption_boundary = traits.Instance(BoxClass)
@@ -1,7 +1,5 @@
 """Functions for detecting and extracting figures."""
 
-import os
-
 from typing import List, Tuple, Iterable
 
 import cv2  # Need to import OpenCV before tensorflow to avoid import error
@@ -13,12 +11,13 @@ import imageio
 # 使用 imageio 的 imread 和 imsave
 imread = imageio.imread
 imsave = imageio.imwrite
-import numpy as np
 
 from deepfigures.extraction import (
     tensorbox_fourchannel,
+    page_filter,
     pdffigures_wrapper,
-    figure_utils)
+    figure_utils,
+    result_io)
 from deepfigures import settings
 from deepfigures.extraction.datamodels import (
     BoxClass,
@@ -27,7 +26,7 @@ from deepfigures.extraction.datamodels import (
     CaptionOnly)
 from deepfigures import settings
 from deepfigures.utils import (
-    file_util,
+    image_util,
     settings_utils)
 from deepfigures.utils import misc
 
@@ -63,44 +62,44 @@ def extract_figures_json(
 
     :returns: path to the JSON file containing the detection results.
     """
-    page_images_array = np.array([
-        imread(page_image_path)
-        for page_image_path in page_image_paths
-    ])
     detector = get_detector()
-    figure_boxes_by_page = detector.get_detections(
-        page_images_array)
-    pdffigures_captions = pdffigures_wrapper.get_captions(
+    caption_index = pdffigures_wrapper.get_captions_by_page(
         pdffigures_output=pdffigures_output,
         target_dpi=settings.DEFAULT_INFERENCE_DPI)
+    page_skipper = page_filter.PageFilter()
+    figure_boxes_by_page = []
     figures_by_page = []
-    for page_num in range(len(page_image_paths)):
-        figure_boxes = figure_boxes_by_page[page_num]
-        pf_page_captions = [
-            caption
-            for caption in pdffigures_captions
-            if caption.page == page_num
-        ]
-        caption_boxes = [
-            caption.caption_boundary
-            for caption in pf_page_captions
-        ]
+    # Decode, detect and pair one page at a time so that only a single
+    # page image is held in memory, regardless of the document length.
+    for page_num, page_image_path in enumerate(page_image_paths):
+        page_image = imread(page_image_path)
+        page_captions = caption_index.get_page(page_num)
+        if page_skipper.get_skip_reason(page_image, page_captions.captions):
+            figure_boxes_by_page.append([])
+            continue
+        # Shared by the detector and the crops below
+        ink_index = image_util.InkIndex(page_image, settings.BACKGROUND_COLOR)
+        figure_boxes = detector.get_page_detections(
+            page_image, ink_index=ink_index)
+        figure_boxes_by_page.append(figure_boxes)
         figure_indices, caption_indices = figure_utils.pair_boxes(
-            figure_boxes, caption_boxes)
-        page_image = page_images_array[page_num]
+            figure_boxes, page_captions.boundaries)
         pad_pixels = PAD_FACTOR * min(page_image.shape[:2])
         for (figure_idx, caption_idx) in zip(figure_indices, caption_indices):
+            caption = page_captions.captions[caption_idx]
             figures_by_page.append(
                 Figure(
                     figure_boundary=figure_boxes[figure_idx].expand_box(
                         pad_pixels).crop_to_page(
                         page_image.shape).crop_whitespace_edges(
-                            page_image),
-                    caption_boundary=caption_boxes[caption_idx],
-                    caption_text=pf_page_captions[caption_idx].caption_text,
-                    name=pf_page_captions[caption_idx].name,
-                    figure_type=pf_page_captions[caption_idx].figure_type,
+                            page_image, ink_index),
+                    caption_boundary=caption.caption_boundary,
+                    caption_text=caption.caption_text,
+                    name=caption.name,
+                    figure_type=caption.figure_type,
                     page=page_num))
+        del page_image, ink_index
+    page_skipper.log_summary(pdf_path)
     pdf_detection_result = PdfDetectionResult(
         pdf=pdf_path,
         figures=figures_by_page,
@@ -108,12 +107,4 @@ def extract_figures_json(
         raw_detected_boxes=figure_boxes_by_page,
         raw_pdffigures_output=pdffigures_output)
 
-    output_path = os.path.join(
-        output_directory,
-        os.path.basename(pdf_path)[:-4] + 'deepfigures-results.json')
-    file_util.write_json_atomic(
-        output_path,
-        pdf_detection_result.to_dict(),
-        indent=2,
-        sort_keys=True)
-    return output_path
+    return result_io.write_result(pdf_detection_result, output_directory)
@@ -0,0 +1,353 @@
+"""A columnar store of the figures from many PDFs.
+
+Figures are written one JSON file per PDF, PubMed tar or arXiv paper.
+``ingest`` compacts these into Parquet files holding one row per figure,
+partitioned by source in hive style::
+
+    <store_directory>/source=deepfigures/part-00000.parquet
+    <store_directory>/source=pubmed/part-00000.parquet
+    <store_directory>/source=arxiv/part-00000.parquet
+
+``FigureStore`` then filters and aggregates the figures one Parquet file
+at a time, reading only the columns a query uses.
+
+The sources are:
+
+- 'deepfigures': the ``*deepfigures-results.json`` files written by
+  ``detection.extract_figures_json`` in any output profile. The pdf
+  column holds the PDF's path, and the pdf_hash is the name of the
+  directory holding the result, which the extraction pipeline names
+  after the PDF's sha1.
+- 'pubmed' and 'arxiv': the figure JSON files from the data generation
+  pipelines, which map page image names to lists of figures. The pdf
+  column holds the name of the PDF for PubMed and the name of the
+  paper for arXiv. The pdf_hash is read from the ``.sha1`` file the
+  PubMed pipeline writes next to each PDF, when it still exists.
+"""
+
+import logging
+import os
+import re
+import shutil
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from deepfigures.extraction import result_io
+from deepfigures.extraction.renderers import PDFRenderer
+from deepfigures.utils import file_util
+
+
+logger = logging.getLogger(__name__)
+
+
+SOURCES = ['deepfigures', 'pubmed', 'arxiv']
+
+BOX_FIELDS = ['x1', 'y1', 'x2', 'y2']
+
+# The columns of the store, with their dtypes.
+COLUMNS = [
+    ('pdf', object),
+    ('pdf_hash', object),
+    ('json_path', object),
+    ('page', np.int64),
+    ('figure_type', object),
+    ('name', object),
+    ('caption_text', object),
+    ('dpi', np.int64),
+] + [
+    ('figure_' + field, np.float64) for field in BOX_FIELDS
+] + [
+    ('caption_' + field, np.float64) for field in BOX_FIELDS
+]
+
+# Operators accepted in query filters.
+FILTER_OPS = {
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    'in': lambda column, value: column.isin(value),
+    'not in': lambda column, value: ~column.isin(value),
+}
+
+Filter = Tuple[str, str, object]
+
+_SHA1_RE = re.compile(r'[0-9a-f]{40}')
+
+
+def find_json_files(directory: str, source: str) -> List[str]:
+    """Return the figure JSON files of source under directory, sorted.
+
+    :param str directory: the directory to search recursively.
+    :param str source: one of SOURCES.
+    """
+    if source not in SOURCES:
+        raise ValueError(
+            'source must be one of {}'.format(', '.join(SOURCES)))
+    if source == 'deepfigures':
+        suffixes = (
+            result_io.RESULT_SUFFIX, result_io.RESULT_SUFFIX + '.gz')
+    else:
+        suffixes = ('.json',)
+    return sorted(
+        os.path.join(dirpath, filename)
+        for (dirpath, _, filenames) in os.walk(directory)
+        for filename in filenames if filename.endswith(suffixes))
+
+
+def _figure_row(figure: dict, pdf: str, pdf_hash: Optional[str], json_path: str) -> dict:
+    row = {
+        'pdf': pdf,
+        'pdf_hash': pdf_hash,
+        'json_path': json_path,
+        'page': figure['page'],
+        'figure_type': figure.get('figure_type'),
+        'name': figure.get('name'),
+        'caption_text': figure.get('caption_text'),
+        'dpi': figure.get('dpi', 0),
+    }
+    for prefix in ['figure', 'caption']:
+        box = figure.get(prefix + '_boundary') or {}
+        for field in BOX_FIELDS:
+            row[prefix + '_' + field] = box.get(field, np.nan)
+    return row
+
+
+def _read_sha1(pdf_path: str) -> Optional[str]:
+    sha1_path = pdf_path + '.sha1'
+    if not os.path.exists(sha1_path):
+        return None
+    with open(sha1_path) as f:
+        return f.read().strip()
+
+
+def iter_figure_rows(json_path: str, source: str) -> Iterator[dict]:
+    """Yield a row for each figure in the JSON file at json_path.
+
+    :param str json_path: the path to a figure JSON file.
+    :param str source: one of SOURCES, the kind of file at json_path.
+    """
+    if source == 'deepfigures':
+        result = result_io.ResultFile(json_path)
+        directory_name = os.path.basename(os.path.dirname(json_path))
+        pdf_hash = directory_name if _SHA1_RE.fullmatch(directory_name) else None
+        pdf = result.data['pdf']
+        for figure in result.figures:
+            yield _figure_row(figure, pdf, pdf_hash, json_path)
+        return
+    figures_by_page = file_util.read_json(json_path)
+    paper_name = os.path.splitext(os.path.basename(json_path))[0]
+    pdf_hashes = {}
+    for (page_name, figures) in figures_by_page.items():
+        match = PDFRenderer.IMAGE_FILENAME_RE.fullmatch(os.path.basename(page_name))
+        if source == 'arxiv' or match is None:
+            pdf = paper_name
+            pdf_hash = None
+        else:
+            pdf = match.group('pdf_name')
+            if pdf not in pdf_hashes:
+                # Page images are written to
+                # <output_dir>/<pdf_name>-images/<engine>/dpi<dpi>/
+                output_dir = os.path.dirname(os.path.dirname(os.path.dirname(
+                    os.path.dirname(page_name))))
+                pdf_hashes[pdf] = _read_sha1(os.path.join(output_dir, pdf))
+            pdf_hash = pdf_hashes[pdf]
+        for figure in figures:
+            yield _figure_row(figure, pdf, pdf_hash, json_path)
+
+
+def _rows_to_frame(rows: List[dict]) -> pd.DataFrame:
+    return pd.DataFrame({
+        column: np.array([row[column] for row in rows], dtype=dtype)
+        for (column, dtype) in COLUMNS
+    })
+
+
+def ingest(
+        store_directory: str,
+        json_paths: Iterable[str],
+        source: str,
+        rows_per_file: int=500000) -> int:
+    """Write the figures in json_paths to the store's partition for source.
+
+    Any existing files in the partition are replaced. The JSON files are
+    read one at a time, and their rows are written out whenever
+    rows_per_file of them have accumulated. The files are written to a
+    temporary sibling directory which is renamed into place once all of
+    them are written, so the partition keeps its old figures until then
+    and if ingesting fails.
+
+    :param str store_directory: the root directory of the store.
+    :param Iterable[str] json_paths: the figure JSON files to ingest.
+    :param str source: one of SOURCES, the kind of the JSON files.
+    :param int rows_per_file: the minimum number of rows in each
+      Parquet file but the last.
+
+    :returns: the number of figures written.
+    """
+    if source not in SOURCES:
+        raise ValueError(
+            'source must be one of {}'.format(', '.join(SOURCES)))
+    partition_dir = os.path.join(store_directory, 'source=' + source)
+    # Hidden, so FigureStore.sources never lists them
+    tmp_dir = os.path.join(store_directory, '.source={}.tmp'.format(source))
+    old_dir = os.path.join(store_directory, '.source={}.old'.format(source))
+    for path in [tmp_dir, old_dir]:
+        if os.path.exists(path):
+            # left by an interrupted ingest
+            shutil.rmtree(path)
+    os.makedirs(tmp_dir)
+
+    n_files = 0
+    n_rows = 0
+    rows = []
+
+    def flush():
+        nonlocal n_files, rows
+        path = os.path.join(tmp_dir, 'part-{:05d}.parquet'.format(n_files))
+        _rows_to_frame(rows).to_parquet(path, index=False)
+        n_files += 1
+        rows = []
+
+    try:
+        for json_path in json_paths:
+            try:
+                file_rows = list(iter_figure_rows(json_path, source))
+            except (OSError, ValueError, KeyError):
+                logger.exception('Failed to ingest %s', json_path)
+                continue
+            rows.extend(file_rows)
+            n_rows += len(file_rows)
+            if len(rows) >= rows_per_file:
+                flush()
+        if rows or not n_files:
+            flush()
+    except BaseException:
+        shutil.rmtree(tmp_dir)
+        raise
+    # A directory can't be renamed over a non-empty one, so the old
+    # partition is moved aside first
+    if os.path.exists(partition_dir):
+        os.rename(partition_dir, old_dir)
+    os.rename(tmp_dir, partition_dir)
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+    logger.info(
+        'Ingested %d %s figures into %d files', n_rows, source, n_files)
+    return n_rows
+
+
+class FigureStore(object):
+    """Query the figures written by ``ingest``.
+
+    Filters are (column, op, value) tuples, with op one of FILTER_OPS,
+    and a row must pass every filter. Filters on the source column
+    choose which partitions are read.
+
+    :param str store_directory: the root directory of the store.
+    """
+
+    def __init__(self, store_directory: str) -> None:
+        self.store_directory = store_directory
+
+    @property
+    def sources(self) -> List[str]:
+        """The sources which have been ingested."""
+        return sorted(
+            name[len('source='):]
+            for name in os.listdir(self.store_directory)
+            if name.startswith('source='))
+
+    def _get_paths(self, filters: Sequence[Filter]) -> List[Tuple[str, str]]:
+        sources = pd.Series(self.sources, dtype=object)
+        for (column, op, value) in filters:
+            if column == 'source':
+                sources = sources[FILTER_OPS[op](sources, value)]
+        paths = []
+        for source in sources:
+            partition_dir = os.path.join(
+                self.store_directory, 'source=' + source)
+            paths.extend(
+                (source, os.path.join(partition_dir, filename))
+                for filename in sorted(os.listdir(partition_dir))
+                if filename.endswith('.parquet'))
+        return paths
+
+    def iter_batches(
+            self,
+            columns: Optional[Sequence[str]]=None,
+            filters: Sequence[Filter]=()) -> Iterator[pd.DataFrame]:
+        """Yield the matching rows of each Parquet file in turn.
+
+        :param Optional[Sequence[str]] columns: the columns to return,
+          defaults to all of them and the source.
+        :param Sequence[Filter] filters: the filters rows must pass.
+        """
+        for (column, op, _) in filters:
+            if op not in FILTER_OPS:
+                raise ValueError(
+                    'op must be one of {}'.format(', '.join(FILTER_OPS)))
+        if columns is None:
+            columns = ['source'] + [column for (column, _) in COLUMNS]
+        file_filters = [f for f in filters if f[0] != 'source']
+        read_columns = sorted(
+            (set(columns) | set(column for (column, _, _) in file_filters)) -
+            {'source'})
+        for (source, path) in self._get_paths(filters):
+            batch = pd.read_parquet(path, columns=read_columns)
+            if file_filters:
+                mask = np.ones(len(batch), dtype=bool)
+                for (column, op, value) in file_filters:
+                    mask &= np.asarray(FILTER_OPS[op](batch[column], value))
+                batch = batch[mask]
+            batch.insert(0, 'source', source)
+            yield batch[list(columns)]
+
+    def read(
+            self,
+            columns: Optional[Sequence[str]]=None,
+            filters: Sequence[Filter]=()) -> pd.DataFrame:
+        """Return the matching rows as a single DataFrame.
+
+        See iter_batches.
+        """
+        batches = list(self.iter_batches(columns, filters))
+        if not batches:
+            if columns is None:
+                columns = ['source'] + [column for (column, _) in COLUMNS]
+            return pd.DataFrame(columns=columns)
+        return pd.concat(batches, ignore_index=True)
+
+    def count(
+            self,
+            by: Optional[Sequence[str]]=None,
+            filters: Sequence[Filter]=()) -> Union[int, Dict]:
+        """Count the matching figures, in total or for each group.
+
+        Only the columns in by and filters are read, one file at a time.
+
+        :param Optional[Sequence[str]] by: the columns to group by.
+        :param Sequence[Filter] filters: the filters rows must pass.
+
+        :returns: the number of matching figures if by is None, else a
+          dictionary mapping each group's value, or tuple of values for
+          several columns, to its count.
+        """
+        if by is None:
+            return sum(
+                len(batch) for batch in self.iter_batches(['page'], filters))
+        by = list(by)
+        counts = None
+        for batch in self.iter_batches(by, filters):
+            batch_counts = batch.groupby(by, dropna=False).size()
+            counts = batch_counts if counts is None else counts.add(
+                batch_counts, fill_value=0)
+        if counts is None:
+            return {}
+        return {
+            key: int(count) for (key, count) in counts.items()
+        }
@@ -1,7 +1,7 @@
 import collections
 import os
 import subprocess
-from typing import Callable, Dict, Iterable, List, Tuple, TypeVar
+from typing import Callable, Dict, Iterable, List, Tuple, TypeVar, Union
 
 from matplotlib import axes
 import matplotlib.pyplot as plt
@@ -11,7 +11,8 @@ import scipy.optimize as opt
 from deepfigures.utils import file_util
 from deepfigures.extraction.renderers import PDFRenderer
 from deepfigures.extraction.exceptions import LatexException
-from deepfigures.extraction.datamodels import (BoxClass, Figure)
+from deepfigures.extraction.datamodels import (
+    BoxArray, BoxClass, Figure, box_distances)
 from deepfigures.settings import DEFAULT_INFERENCE_DPI
 
 
@@ -59,27 +60,63 @@ def im_diff(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     return diff_image
 
 
-def pair_boxes(a_boxes: List[BoxClass],
-               b_boxes: List[BoxClass]) -> Tuple[List[int], List[int]]:
+BoxList = Union[List[BoxClass], BoxArray]
+
+
+def _as_box_array(boxes: BoxList) -> BoxArray:
+    if isinstance(boxes, BoxArray):
+        return boxes
+    return BoxArray.from_boxes(boxes)
+
+
+def pair_boxes(a_boxes: BoxList,
+               b_boxes: BoxList) -> Tuple[List[int], List[int]]:
     """
     Find the pairing between boxes with the lowest total distance, e.g. for matching figures to their captions.
     This is an instance of the linear assignment problem and can be solved efficiently using the Hungarian algorithm.
     Return the indices of matched boxes. If a_boxes and b_boxes are of unequal length, not all boxes will be paired.
     Length of returned lists is min(len(a_boxes), len(b_boxes)).
     """
-    a_len = len(a_boxes)
-    b_len = len(b_boxes)
-    cost_matrix = np.zeros([a_len, b_len])
-    cost_matrix[:] = np.nan
-    for (a_idx, a_box) in enumerate(a_boxes):
-        for (b_idx, b_box) in enumerate(b_boxes):
-            cost_matrix[a_idx, b_idx] = a_box.distance_to_other(b_box)
-    assert (cost_matrix != np.nan).all()
+    cost_matrix = _as_box_array(a_boxes).distance_to_other(
+        _as_box_array(b_boxes))
     (a_indices, b_indices) = opt.linear_sum_assignment(cost_matrix)
     assert len(a_indices) == len(b_indices)
     return a_indices, b_indices
 
 
+def pair_boxes_by_page(
+    a_boxes_by_page: List[BoxList], b_boxes_by_page: List[BoxList]
+) -> List[Tuple[List[int], List[int]]]:
+    """
+    Run pair_boxes on each page of a document, e.g. to match the figures on every page to the captions on the same
+    page. The distances between the boxes on every page are computed in a single vectorized call.
+    """
+    assert len(a_boxes_by_page) == len(b_boxes_by_page)
+    a_arrays = [_as_box_array(boxes) for boxes in a_boxes_by_page]
+    b_arrays = [_as_box_array(boxes) for boxes in b_boxes_by_page]
+    a_counts = np.array([len(boxes) for boxes in a_arrays], dtype=int)
+    b_counts = np.array([len(boxes) for boxes in b_arrays], dtype=int)
+    a_offsets = np.cumsum(a_counts) - a_counts
+    b_offsets = np.cumsum(b_counts) - b_counts
+    # Enumerate the pairs of boxes on the same page, page by page in row
+    # major order, so that each page's cost matrix is a contiguous run.
+    pair_counts = a_counts * b_counts
+    pair_ends = np.cumsum(pair_counts)
+    pair_pages = np.repeat(np.arange(len(a_arrays)), pair_counts)
+    pair_idx = np.arange(pair_ends[-1] if len(pair_ends) else 0) - np.repeat(
+        pair_ends - pair_counts, pair_counts)
+    a_idx = a_offsets[pair_pages] + pair_idx // b_counts[pair_pages]
+    b_idx = b_offsets[pair_pages] + pair_idx % b_counts[pair_pages]
+    distances = box_distances(
+        BoxArray.concatenate(a_arrays).coords[a_idx],
+        BoxArray.concatenate(b_arrays).coords[b_idx])
+    return [
+        opt.linear_sum_assignment(cost_matrix.reshape(a_count, b_count))
+        for (cost_matrix, a_count, b_count) in zip(
+            np.split(distances, pair_ends[:-1]), a_counts, b_counts)
+    ]
+
+
 def load_figures_json(filename: str) -> Dict[str, List[Figure]]:
     d = file_util.read_json(filename)
     res = {
@@ -0,0 +1,165 @@
+"""Cheap tests for skipping pages which cannot contain a figure.
+
+Running the detector is by far the most expensive step of extracting
+figures from a page, so pages which certainly have no figures are
+skipped before inference. The available filters are, from most to least
+conservative:
+
+- 'blank': the page image has no non-background pixels. Every box on
+  such a page is dropped by ``BoxClass.crop_whitespace_edges``, so
+  skipping it never changes the output.
+- 'captionless': pdffigures2 found no captions on the page. Detected
+  figures are only kept when paired with a caption on the same page, so
+  skipping these pages leaves the extracted figures unchanged; only the
+  page's entry in ``raw_detected_boxes`` is empty.
+- 'text_only': every 8-connected component of ink on the page is small
+  enough to be a glyph. Plots, images, and ruled tables all contain
+  long lines or large blobs, but this filter is a heuristic and should
+  be checked with ``evaluate`` before being enabled.
+"""
+
+import collections
+import logging
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from deepfigures import settings
+from deepfigures.extraction.datamodels import BoxClass, CaptionOnly
+
+
+logger = logging.getLogger(__name__)
+
+
+FILTERS = ['blank', 'captionless', 'text_only']
+
+# Pixels at least this much darker than the background count as ink for
+# the text_only filter, which ignores faint anti-aliasing.
+INK_MARGIN = 64
+
+# Components larger than these fractions of the page's height or width
+# are taken to be part of a figure rather than glyphs of text.
+MAX_GLYPH_HEIGHT_FRACTION = 0.03
+MAX_GLYPH_WIDTH_FRACTION = 0.2
+
+
+def is_blank_page(page_image: np.ndarray) -> bool:
+    """Return True if every pixel of page_image is background."""
+    return bool((page_image == settings.BACKGROUND_COLOR).all())
+
+
+def is_text_only_page(
+        page_image: np.ndarray,
+        max_glyph_height_fraction: float=MAX_GLYPH_HEIGHT_FRACTION,
+        max_glyph_width_fraction: float=MAX_GLYPH_WIDTH_FRACTION) -> bool:
+    """Return True if all the ink on page_image looks like text.
+
+    :param np.ndarray page_image: an HWC page image; only the first three
+      (RGB) channels are used.
+    :param float max_glyph_height_fraction: the largest height of a
+      connected component, as a fraction of the page height, which is
+      still considered text.
+    :param float max_glyph_width_fraction: the same for the width.
+    """
+    ink = np.minimum(
+        np.minimum(page_image[:, :, 0], page_image[:, :, 1]),
+        page_image[:, :, 2]) < settings.BACKGROUND_COLOR - INK_MARGIN
+    (_, _, stats, _) = cv2.connectedComponentsWithStats(
+        ink.view(np.uint8), connectivity=8)
+    # Label 0 is the background
+    stats = stats[1:]
+    (height, width) = ink.shape
+    return bool(
+        (stats[:, cv2.CC_STAT_HEIGHT] <= max_glyph_height_fraction * height).all() and
+        (stats[:, cv2.CC_STAT_WIDTH] <= max_glyph_width_fraction * width).all())
+
+
+class PageFilter(object):
+    """Decide which pages to skip, keeping counts of the reasons.
+
+    :param Optional[Sequence[str]] filters: the names of the filters to
+      apply, a subset of FILTERS. Defaults to settings.PAGE_FILTERS.
+    """
+
+    def __init__(self, filters: Optional[Sequence[str]]=None):
+        if filters is None:
+            filters = settings.PAGE_FILTERS
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(
+                'Unknown page filters: {}'.format(', '.join(sorted(unknown))))
+        self.filters = list(filters)
+        self.counts = collections.Counter()
+
+    def get_skip_reason(
+            self,
+            page_image: np.ndarray,
+            page_captions: List[CaptionOnly]) -> Optional[str]:
+        """Return the name of the filter rejecting the page, or None.
+
+        :param np.ndarray page_image: the image that would be passed to
+          the detector.
+        :param List[CaptionOnly] page_captions: the captions found by
+          pdffigures2 on this page.
+        """
+        self.counts['pages'] += 1
+        reason = None
+        # Check the cheapest filters first.
+        if 'captionless' in self.filters and not page_captions:
+            reason = 'captionless'
+        elif 'blank' in self.filters and is_blank_page(page_image):
+            reason = 'blank'
+        elif 'text_only' in self.filters and is_text_only_page(page_image):
+            reason = 'text_only'
+        if reason is not None:
+            self.counts['skipped'] += 1
+            self.counts[reason] += 1
+        return reason
+
+    @property
+    def skip_rate(self) -> float:
+        if not self.counts['pages']:
+            return 0.
+        return self.counts['skipped'] / self.counts['pages']
+
+    def log_summary(self, name: str) -> None:
+        logger.info(
+            'Skipped %d of %d pages (%.1f%%) of %s: %s',
+            self.counts['skipped'],
+            self.counts['pages'],
+            100 * self.skip_rate,
+            name,
+            ', '.join(
+                '{} {}'.format(self.counts[f], f)
+                for f in self.filters if self.counts[f]) or 'none')
+
+
+def evaluate(
+        labeled_pages: Iterable[Tuple[np.ndarray, List[CaptionOnly], List[BoxClass]]],
+        filters: Sequence[str]) -> dict:
+    """Measure the skip rate and recall loss of filters on labeled pages.
+
+    :param labeled_pages: an iterable of (page_image, page_captions,
+      gold_figure_boxes) tuples, one for each page.
+    :param Sequence[str] filters: the filters to evaluate.
+
+    :returns: a dictionary with the number of pages and figures, the
+      fraction of pages skipped and the fraction of gold figures which
+      lie on skipped pages.
+    """
+    page_filter = PageFilter(filters)
+    n_figures = 0
+    n_lost_figures = 0
+    for (page_image, page_captions, gold_boxes) in labeled_pages:
+        n_figures += len(gold_boxes)
+        if page_filter.get_skip_reason(page_image, page_captions):
+            n_lost_figures += len(gold_boxes)
+    return {
+        'pages': page_filter.counts['pages'],
+        'skipped_pages': page_filter.counts['skipped'],
+        'skip_rate': page_filter.skip_rate,
+        'figures': n_figures,
+        'lost_figures': n_lost_figures,
+        'recall_loss': n_lost_figures / n_figures if n_figures else 0.,
+    }
@@ -1,3 +1,4 @@
+import collections
 import os
 import subprocess
 from typing import List, Optional, Iterable
@@ -9,6 +10,7 @@ import logging
 import shlex
 import contextlib
 import more_itertools
+import numpy as np
 
 
 # DPI used by pdffigures for json outputs; this is hard-coded as 72
@@ -62,10 +64,15 @@ class PDFFiguresExtractor(object):
 pdffigures_extractor = PDFFiguresExtractor()
 
 
-def figure_to_caption(figure: dict) -> datamodels.CaptionOnly:
+def figure_to_caption(
+    figure: dict,
+    caption_boundary: Optional[datamodels.BoxClass]=None
+) -> datamodels.CaptionOnly:
+    if caption_boundary is None:
+        caption_boundary = datamodels.BoxClass.from_dict(
+            figure['captionBoundary'])
     return datamodels.CaptionOnly(
-        caption_boundary=datamodels.BoxClass.
-        from_dict(figure['captionBoundary']),
+        caption_boundary=caption_boundary,
         page=figure['page'],
         caption_text=figure['caption'],
         name=figure['name'],
@@ -73,9 +80,15 @@ def figure_to_caption(figure: dict) -> datamodels.CaptionOnly:
     )
 
 
-def regionless_to_caption(regionless: dict) -> datamodels.CaptionOnly:
+def regionless_to_caption(
+    regionless: dict,
+    caption_boundary: Optional[datamodels.BoxClass]=None
+) -> datamodels.CaptionOnly:
+    if caption_boundary is None:
+        caption_boundary = datamodels.BoxClass.from_dict(
+            regionless['boundary'])
     return datamodels.CaptionOnly(
-        caption_boundary=datamodels.BoxClass.from_dict(regionless['boundary']),
+        caption_boundary=caption_boundary,
         page=regionless['page'],
         caption_text=regionless['text'],
         name=regionless['name'],
@@ -86,17 +99,97 @@ def regionless_to_caption(regionless: dict) -> datamodels.CaptionOnly:
 def get_captions(
     pdffigures_output: dict, target_dpi: int=settings.DEFAULT_INFERENCE_DPI
 ) -> List[datamodels.CaptionOnly]:
+    return get_captions_by_page(pdffigures_output, target_dpi).captions
+
+
+class PageCaptions(object):
+    """The captions on a single page.
+
+    :ivar List[CaptionOnly] captions: the captions, in the order
+      pdffigures2 output them.
+    :ivar BoxArray boundaries: the caption boundaries, with row i
+      holding captions[i].caption_boundary.
+    """
+    __slots__ = ('captions', 'boundaries')
+
+    def __init__(
+        self,
+        captions: List[datamodels.CaptionOnly],
+        boundaries: datamodels.BoxArray
+    ) -> None:
+        self.captions = captions
+        self.boundaries = boundaries
+
+    def __len__(self) -> int:
+        return len(self.captions)
+
+
+class CaptionIndex(object):
+    """The captions of a document, grouped by page.
+
+    :param List[CaptionOnly] captions: the captions of the document.
+    :param Optional[BoxArray] boundaries: the caption boundaries, if
+      already at hand; otherwise read from the captions.
+    """
+
+    def __init__(
+        self,
+        captions: List[datamodels.CaptionOnly],
+        boundaries: Optional[datamodels.BoxArray]=None
+    ) -> None:
+        if boundaries is None:
+            boundaries = datamodels.BoxArray.from_boxes(
+                [caption.caption_boundary for caption in captions])
+        self.captions = captions
+        self.boundaries = boundaries
+        indices_by_page = collections.defaultdict(list)
+        for (idx, caption) in enumerate(captions):
+            indices_by_page[caption.page].append(idx)
+        self._pages = {
+            page_num: PageCaptions(
+                [captions[idx] for idx in indices],
+                boundaries[np.array(indices)])
+            for (page_num, indices) in indices_by_page.items()
+        }
+        self._empty_page = PageCaptions(
+            [], datamodels.BoxArray(np.zeros((0, 4))))
+
+    def get_page(self, page_num: int) -> PageCaptions:
+        """Return the captions on page page_num, which may be empty."""
+        return self._pages.get(page_num, self._empty_page)
+
+    def __iter__(self) -> Iterable[datamodels.CaptionOnly]:
+        return iter(self.captions)
+
+    def __len__(self) -> int:
+        return len(self.captions)
+
+
+def get_captions_by_page(
+    pdffigures_output: dict, target_dpi: int=settings.DEFAULT_INFERENCE_DPI
+) -> CaptionIndex:
+    """Return the captions found by pdffigures, grouped by page.
+
+    The caption boundaries are scaled from pdffigures' 72 DPI to
+    target_dpi.
+    """
     figures = pdffigures_output.get('figures', [])
     regionless_captions = pdffigures_output.get('regionless-captions', [])
+    boundaries = datamodels.BoxArray.from_dicts(
+        [fig['captionBoundary'] for fig in figures] +
+        [reg['boundary'] for reg in regionless_captions]
+    ).rescale(target_dpi / PDFFIGURES_DPI)
+    boxes = boundaries.to_boxes()
     captions = (
-        [figure_to_caption(fig) for fig in figures] +
-        [regionless_to_caption(reg) for reg in regionless_captions]
+        [
+            figure_to_caption(fig, box)
+            for (fig, box) in zip(figures, boxes)
+        ] + [
+            regionless_to_caption(reg, box)
+            for (reg, box) in zip(regionless_captions, boxes[len(figures):])
+        ]
     )
-    for caption in captions:
-        caption.caption_boundary = caption.caption_boundary.rescale(
-            target_dpi / PDFFIGURES_DPI
-        )
-    return captions
+    return CaptionIndex(captions, boundaries)
 
 
 def get_figures(pdffigures_output: dict, target_dpi: int=settings.DEFAULT_INFERENCE_DPI
@@ -139,12 +139,16 @@ class FigureExtractionPipeline(object):
             )
 
         # 渲染高分辨率的PDF页面图像，适用于图像裁剪
-        figure_extraction.hi_res_rendering_paths = \
-            pdf_renderer.render(
-                pdf_path=figure_extraction.paths['PDF_PATH'],  # PDF文件路径
-                output_dir=figure_extraction.paths['BASE'],  # 输出渲染图像的目录
-                dpi=settings.DEFAULT_CROPPED_IMG_DPI  # 渲染图像的分辨率
-            )
+        # （直接从 PDF 渲染图像区域时跳过）
+        if settings.RENDER_CROPPED_PAGES:
+            figure_extraction.hi_res_rendering_paths = \
+                pdf_renderer.render(
+                    pdf_path=figure_extraction.paths['PDF_PATH'],  # PDF文件路径
+                    output_dir=figure_extraction.paths['BASE'],  # 输出渲染图像的目录
+                    dpi=settings.DEFAULT_CROPPED_IMG_DPI  # 渲染图像的分辨率
+                )
+        else:
+            figure_extraction.hi_res_rendering_paths = []
 
         # 使用pdffigures2工具提取PDF中的图像标题和位置
         figure_extraction.pdffigures_output_path = \
@@ -9,6 +9,7 @@ import re
 import shutil
 import string
 import subprocess
+import tempfile
 import typing
 
 import bs4
@@ -102,7 +103,9 @@ class PDFRenderer(object):
         :param Optional[int] max_pages: the maximum number of pages to
           render from the PDF.
         :param bool use_cache: whether or not to skip the rendering
-          operation if the pdf has already been rendered.
+          operation if the pdf has already been rendered. Pages already
+          rendered by render_page are reused too, and only the rest of
+          the pages rendered, if the renderer can count the PDF's pages.
         :param bool check_retcode: whether or not to check the return
           code from the subprocess used to render the PDF.
 
@@ -115,12 +118,84 @@ class PDFRenderer(object):
             raise ValueError(
                 "ext must be one of {}".format(', '.join(image_types)))
 
+        images_dir, image_output_path_prefix = self._get_images_dir(
+            pdf_path=pdf_path, output_dir=output_dir, dpi=dpi)
+        success_file_path = os.path.join(images_dir, '_SUCCESS')
+
+        if not os.path.exists(success_file_path) or not use_cache:
+            if os.path.exists(images_dir) and not use_cache:
+                logger.info("Overwriting {}.".format(images_dir))
+                shutil.rmtree(images_dir)
+            os.makedirs(images_dir, exist_ok=True)
+
+            num_pages = None
+            if glob.glob(image_output_path_prefix + '*.' + ext):
+                num_pages = self._count_pages(pdf_path)
+            # render into a temporary directory so that, without a
+            # success file, every page in images_dir is complete
+            tmp_dir = os.path.join(images_dir, '.tmp-render')
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+            os.makedirs(tmp_dir)
+            tmp_output_path_prefix = os.path.join(
+                tmp_dir, os.path.basename(image_output_path_prefix))
+            if num_pages is None:
+                self._rasterize_pdf(
+                    pdf_path=pdf_path,
+                    image_output_path_prefix=tmp_output_path_prefix,
+                    dpi=dpi,
+                    ext=ext,
+                    max_pages=max_pages,
+                    check_retcode=check_retcode)
+            else:
+                if max_pages is not None:
+                    num_pages = min(num_pages, max_pages)
+                missing_page_nums = [
+                    page_num for page_num in range(1, num_pages + 1)
+                    if not os.path.exists('{}{:04d}.{}'.format(
+                        image_output_path_prefix, page_num, ext))
+                ]
+                if missing_page_nums:
+                    self._rasterize_pages(
+                        pdf_path=pdf_path,
+                        page_nums=missing_page_nums,
+                        image_output_path_prefix=tmp_output_path_prefix,
+                        dpi=dpi,
+                        ext=ext,
+                        check_retcode=check_retcode)
+            # pages already rendered are kept
+            for file_name in os.listdir(tmp_dir):
+                tmp_path = os.path.join(tmp_dir, file_name)
+                output_path = os.path.join(images_dir, file_name)
+                if os.path.exists(output_path):
+                    os.remove(tmp_path)
+                else:
+                    os.rename(tmp_path, output_path)
+            os.rmdir(tmp_dir)
+
+            # add a success file to verify that the operation completed
+            with open(success_file_path, 'w') as f_out:
+                f_out.write('')
+
+        generated_image_paths = glob.glob(
+            image_output_path_prefix + '*.' + ext)
+
+        return sort_by_page_num(generated_image_paths)
+
+    def _get_images_dir(
+        self,
+        pdf_path: str,
+        output_dir: typing.Optional[str],
+        dpi: int
+    ) -> typing.Tuple[str, str]:
+        """Return the directory for pdf_path's rendered pages and the
+        prefix of their paths, see render."""
         if output_dir is None:
             output_dir = os.path.dirname(pdf_path)
 
         if not os.path.isdir(output_dir):
             raise IOError(
-                "Output directory ({}) does not exist.".format(output))
+                "Output directory ({}) does not exist.".format(output_dir))
 
         pdf_name = os.path.basename(pdf_path)
 
@@ -139,30 +214,125 @@ class PDFRenderer(object):
             pdf_name=pdf_name, dpi=dpi)
         image_output_path_prefix = os.path.join(
             images_dir, image_filename_prefix)
-        success_file_path = os.path.join(images_dir, '_SUCCESS')
+        return images_dir, image_output_path_prefix
 
-        if not os.path.exists(success_file_path) or not use_cache:
-            if os.path.exists(images_dir):
-                logger.info("Overwriting {}.".format(images_dir))
-                shutil.rmtree(images_dir)
-            os.makedirs(images_dir)
+    def render_page(
+        self,
+        pdf_path: str,
+        page_num: int,
+        output_dir: typing.Optional[str]=None,
+        dpi: int=settings.DEFAULT_INFERENCE_DPI,
+        ext: str='png',
+        use_cache: bool=True,
+        check_retcode: bool=False
+    ) -> str:
+        """Render a single page of a PDF, save it to disk and return its path.
+
+        The page is saved to the path that render would give it, so
+        callers that only need a few pages of a PDF can render just
+        those and read them as they would the output of render.
+
+        Parameters
+        ----------
+        :param str pdf_path: path to the pdf that should be rendered.
+        :param int page_num: the number of the page to render, starting
+          at 1 like the page numbers in rendered file names.
+        :param Optional[str] output_dir: path to the directory in which
+          to save output. If None, then output is saved in the same
+          directory as the PDF.
+        :param int dpi: the dpi at which to render the PDF.
+        :param str ext: the extension or file type of the generated
+          image, should be either 'png' or 'jpg'.
+        :param bool use_cache: whether or not to skip the rendering
+          operation if the page has already been rendered.
+        :param bool check_retcode: whether or not to check the return
+          code from the subprocess used to render the PDF.
 
-            self._rasterize_pdf(
+        Returns
+        -------
+        :return: the path to the rendered page
+        """
+        image_types = ['png', 'jpg']
+        if ext not in image_types:
+            raise ValueError(
+                "ext must be one of {}".format(', '.join(image_types)))
+        if page_num < 1:
+            raise ValueError("page_num must be at least 1.")
+
+        images_dir, image_output_path_prefix = self._get_images_dir(
+            pdf_path=pdf_path, output_dir=output_dir, dpi=dpi)
+        output_path = '{prefix}{page_num:04d}.{ext}'.format(
+            prefix=image_output_path_prefix, page_num=page_num, ext=ext)
+
+        if not os.path.exists(output_path) or not use_cache:
+            os.makedirs(images_dir, exist_ok=True)
+            # render to a temporary path so that a partially written
+            # page is never mistaken for a cached one
+            tmp_output_path = os.path.join(
+                images_dir, '.tmp-' + os.path.basename(output_path))
+            self._rasterize_page(
                 pdf_path=pdf_path,
-                image_output_path_prefix=image_output_path_prefix,
+                page_num=page_num,
+                output_path=tmp_output_path,
                 dpi=dpi,
                 ext=ext,
-                max_pages=max_pages,
                 check_retcode=check_retcode)
+            if os.path.exists(tmp_output_path):
+                os.rename(tmp_output_path, output_path)
 
-            # add a success file to verify that the operation completed
-            with open(success_file_path, 'w') as f_out:
-                f_out.write('')
+        return output_path
 
-        generated_image_paths = glob.glob(
-            image_output_path_prefix + '*.' + ext)
+    def _rasterize_page(
+        self,
+        pdf_path: str,
+        page_num: int,
+        output_path: str,
+        dpi: int,
+        ext: str,
+        check_retcode: bool
+    ) -> None:
+        """Rasterize a single page and save it to output_path.
 
-        return sort_by_page_num(generated_image_paths)
+        See render_page for a description of the parameters.
+        """
+        raise NotImplementedError(
+            "{} does not support rendering single pages.".format(
+                self.__class__.__name__))
+
+    def _count_pages(self, pdf_path: str) -> typing.Optional[int]:
+        """Return the number of pages in the PDF, or None if unknown.
+
+        render uses the count to render only the pages that
+        render_page has not, and renders the whole PDF without it.
+        """
+        return None
+
+    def _rasterize_pages(
+        self,
+        pdf_path: str,
+        page_nums: typing.List[int],
+        image_output_path_prefix: str,
+        dpi: int,
+        ext: str,
+        check_retcode: bool
+    ) -> None:
+        """Rasterize the pages numbered page_nums, in increasing order.
+
+        Each page is saved to the path formed by appending
+        '{page_num:04d}.{ext}' to image_output_path_prefix, as in
+        _rasterize_pdf. By default the pages are rasterized one at a
+        time with _rasterize_page; override this to rasterize them
+        together.
+        """
+        for page_num in page_nums:
+            self._rasterize_page(
+                pdf_path=pdf_path,
+                page_num=page_num,
+                output_path='{}{:04d}.{}'.format(
+                    image_output_path_prefix, page_num, ext),
+                dpi=dpi,
+                ext=ext,
+                check_retcode=check_retcode)
 
     def _rasterize_pdf(
         self,
@@ -198,6 +368,93 @@ class PDFRenderer(object):
             "Subclasses of PDFRenderer must implement _rasterize_pdf."
         )
 
+    def render_region(
+        self,
+        pdf_path: str,
+        page_num: int,
+        box: typing.Tuple[float, float, float, float],
+        page_height: float,
+        output_path: str,
+        dpi: int=settings.DEFAULT_CROPPED_IMG_DPI,
+        check_retcode: bool=False
+    ) -> str:
+        """Render a single region of a page and save it to disk.
+
+        Only the region is rasterized, so figures can be rendered at
+        high dpis without the cost of rendering their whole pages.
+
+        Parameters
+        ----------
+        :param str pdf_path: path to the pdf that should be rendered.
+        :param int page_num: the number of the page to render from,
+          starting at 1 like the page numbers in rendered file names.
+        :param Tuple[float, float, float, float] box: the region to
+          render as (x1, y1, x2, y2) in PDF points, measured from the
+          top left corner of the page like BoxClass.
+        :param float page_height: the height of the page in PDF
+          points.
+        :param str output_path: the path to save the image to, ending
+          in '.png' or '.jpg'.
+        :param int dpi: the dpi at which to render the region.
+        :param bool check_retcode: whether or not to check the return
+          code from the subprocess used to render the PDF.
+
+        Returns
+        -------
+        :return: output_path
+        """
+        ext = os.path.splitext(output_path)[1][1:]
+        image_types = ['png', 'jpg']
+        if ext not in image_types:
+            raise ValueError(
+                "ext must be one of {}".format(', '.join(image_types)))
+        x1, y1, x2, y2 = box
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError("box must have a positive width and height.")
+
+        self._rasterize_region(
+            pdf_path=pdf_path,
+            page_num=page_num,
+            box=box,
+            page_height=page_height,
+            output_path=output_path,
+            dpi=dpi,
+            ext=ext,
+            check_retcode=check_retcode)
+
+        return output_path
+
+    def get_page_sizes(
+        self,
+        pdf_path: str
+    ) -> typing.Optional[typing.List[typing.Tuple[float, float]]]:
+        """Return the (width, height) of each page in PDF points, as
+        the pages are rendered, or None if unknown.
+
+        Use these for the page_height of render_region rather than the
+        size of a rendered page, which is rounded to whole pixels.
+        """
+        return None
+
+    def _rasterize_region(
+        self,
+        pdf_path: str,
+        page_num: int,
+        box: typing.Tuple[float, float, float, float],
+        page_height: float,
+        output_path: str,
+        dpi: int,
+        ext: str,
+        check_retcode: bool
+    ) -> None:
+        """Rasterize a region of a page and save it to output_path.
+
+        See render_region for a description of the parameters.
+        """
+        raise NotImplementedError(
+            "{} does not support rendering regions.".format(
+                self.__class__.__name__))
+
     def extract_text(self, pdf_path: str, encoding: str='UTF-8'
                     ) -> typing.Optional[bs4.BeautifulSoup]:
         """Extract info about a PDF as XML returning the parser for it.
@@ -216,25 +473,44 @@ class PDFRenderer(object):
         -------
         :return: A parser for the XML that is saved to disk.
         """
-        # generate the html files
-        self._extract_text(pdf_path=pdf_path, encoding=encoding)
-
-        html = pdf_path[:-4] + '.html'
-        if not os.path.isfile(html):
-            html_soup = None
+        html = self.extract_text_path(pdf_path=pdf_path, encoding=encoding)
         try:
             with open(html, 'r') as f:
                 html_soup = bs4.BeautifulSoup(f, 'xml')
         except UnicodeDecodeError:
-            html_soup = None
-
-        if html_soup is None:
             raise exceptions.PDFProcessingError(
                 "Error in extracting xml for {}.".format(pdf_path)
             )
 
         return html_soup
 
+    def extract_text_path(self, pdf_path: str, encoding: str='UTF-8') -> str:
+        """Extract info about a PDF as XML returning the path to it.
+
+        See extract_text. The XML can then be read with
+        deepfigures.extraction.xml_parsing.parse_pdftotext_bbox.
+
+        Parameters
+        ----------
+        :param str pdf_path: the path to the pdf from which to extract
+          information.
+        :param str encoding: the encoding to use for the XML.
+
+        Returns
+        -------
+        :return: The path to the XML on disk.
+        """
+        # generate the html files
+        self._extract_text(pdf_path=pdf_path, encoding=encoding)
+
+        html = pdf_path[:-4] + '.html'
+        if not os.path.isfile(html):
+            raise exceptions.PDFProcessingError(
+                "Error in extracting xml for {}.".format(pdf_path)
+            )
+
+        return html
+
     def _extract_text(self, pdf_path: str, encoding: str='UTF-8') -> None:
         """Extract text from a PDF and save to disk as xml.
 
@@ -284,6 +560,161 @@ class GhostScriptRenderer(PDFRenderer):
             gs_args.insert(-2, '-dLastPage=%d' % max_pages)
         subprocess.run(gs_args, check=check_retcode)
 
+    def _rasterize_page(
+        self,
+        pdf_path: str,
+        page_num: int,
+        output_path: str,
+        dpi: int,
+        ext: str,
+        check_retcode: bool
+    ) -> None:
+        """Rasterize a single page using GhostScript."""
+        sdevice = 'png16m' if ext == 'png' else 'jpeg'
+        gs_args = [
+            'gs', '-dGraphicsAlphaBits=4', '-dTextAlphaBits=4', '-dNOPAUSE', '-dBATCH', '-dSAFER', '-dQUIET',
+            '-sDEVICE=' + sdevice,
+            '-r%d' % dpi, '-sOutputFile=' + output_path,
+            '-dFirstPage=%d' % page_num, '-dLastPage=%d' % page_num,
+            '-dBufferSpace=%d' % int(1e9),
+            '-dBandBufferSpace=%d' % int(5e8), '-sBandListStorage=memory',
+            '-c',
+            '%d setvmthreshold' % int(1e9), '-dNOGC',
+            '-dNumRenderingThreads=4', "-f", pdf_path
+        ]
+        subprocess.run(gs_args, check=check_retcode)
+
+    def _rasterize_pages(
+        self,
+        pdf_path: str,
+        page_nums: typing.List[int],
+        image_output_path_prefix: str,
+        dpi: int,
+        ext: str,
+        check_retcode: bool
+    ) -> None:
+        """Rasterize a list of pages with a single GhostScript process.
+
+        GhostScript numbers its output pages from 1, so they are written
+        to a temporary directory and renamed to their page numbers.
+        """
+        # e.g. '1,3-4,6'
+        page_ranges = []
+        for page_num in page_nums:
+            if page_ranges and page_ranges[-1][1] == page_num - 1:
+                page_ranges[-1][1] = page_num
+            else:
+                page_ranges.append([page_num, page_num])
+        page_list = ','.join(
+            str(first) if first == last else '%d-%d' % (first, last)
+            for (first, last) in page_ranges)
+        tmp_dir = tempfile.mkdtemp(
+            prefix='.tmp-pages-',
+            dir=os.path.dirname(image_output_path_prefix))
+        try:
+            sdevice = 'png16m' if ext == 'png' else 'jpeg'
+            gs_args = [
+                'gs', '-dGraphicsAlphaBits=4', '-dTextAlphaBits=4', '-dNOPAUSE', '-dBATCH', '-dSAFER', '-dQUIET',
+                '-sDEVICE=' + sdevice,
+                '-r%d' % dpi,
+                '-sOutputFile=' + os.path.join(tmp_dir, '%04d.' + ext),
+                '-sPageList=' + page_list,
+                '-dBufferSpace=%d' % int(1e9),
+                '-dBandBufferSpace=%d' % int(5e8), '-sBandListStorage=memory',
+                '-c',
+                '%d setvmthreshold' % int(1e9), '-dNOGC',
+                '-dNumRenderingThreads=4', "-f", pdf_path
+            ]
+            subprocess.run(gs_args, check=check_retcode)
+            for (output_num, page_num) in enumerate(page_nums, 1):
+                output_path = os.path.join(
+                    tmp_dir, '{:04d}.{}'.format(output_num, ext))
+                if os.path.exists(output_path):
+                    os.replace(output_path, '{}{:04d}.{}'.format(
+                        image_output_path_prefix, page_num, ext))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def _rasterize_region(
+        self,
+        pdf_path: str,
+        page_num: int,
+        box: typing.Tuple[float, float, float, float],
+        page_height: float,
+        output_path: str,
+        dpi: int,
+        ext: str,
+        check_retcode: bool
+    ) -> None:
+        """Rasterize a region of a page using GhostScript.
+
+        The output device is sized to the region, and the page is
+        shifted with PageOffset so that the region's lower left corner
+        lands on the device's origin. Everything outside the region is
+        clipped before it is rasterized.
+        """
+        x1, y1, x2, y2 = box
+        sdevice = 'png16m' if ext == 'png' else 'jpeg'
+        gs_args = [
+            'gs', '-dGraphicsAlphaBits=4', '-dTextAlphaBits=4', '-dNOPAUSE', '-dBATCH', '-dSAFER', '-dQUIET',
+            '-sDEVICE=' + sdevice,
+            '-r%d' % dpi, '-sOutputFile=' + output_path,
+            '-dFirstPage=%d' % page_num, '-dLastPage=%d' % page_num,
+            '-dDEVICEWIDTHPOINTS=%.3f' % (x2 - x1),
+            '-dDEVICEHEIGHTPOINTS=%.3f' % (y2 - y1),
+            '-dFIXEDMEDIA',
+            # PDF coordinates start from the bottom left of the page
+            '-c', '<</PageOffset [%.3f %.3f]>> setpagedevice' % (
+                -x1, -(page_height - y2)),
+            '-f', pdf_path
+        ]
+        subprocess.run(gs_args, check=check_retcode)
+
+    def _count_pages(self, pdf_path: str) -> typing.Optional[int]:
+        """Count the pages using pdfinfo, from the same package as pdftotext."""
+        try:
+            result = subprocess.run(
+                ['pdfinfo', pdf_path], stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            return None
+        match = re.search(rb'^Pages:\s*(\d+)', result.stdout, re.MULTILINE)
+        if result.returncode != 0 or match is None:
+            return None
+        return int(match.group(1))
+
+    def get_page_sizes(
+        self,
+        pdf_path: str
+    ) -> typing.Optional[typing.List[typing.Tuple[float, float]]]:
+        """Read the page sizes using pdfinfo.
+
+        GhostScript renders each page's MediaBox, turned by its Rotate.
+        """
+        num_pages = self._count_pages(pdf_path)
+        if num_pages is None:
+            return None
+        result = subprocess.run(
+            ['pdfinfo', '-box', '-f', '1', '-l', str(num_pages), pdf_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+        rotations = {
+            int(page_num): int(rotation) for (page_num, rotation) in re.findall(
+                rb'^Page\s+(\d+)\s+rot:\s*(-?\d+)', result.stdout, re.MULTILINE)}
+        sizes = []
+        for (page_num, x1, y1, x2, y2) in re.findall(
+                rb'^Page\s+(\d+)\s+MediaBox:' + rb'\s+([-\d.]+)' * 4,
+                result.stdout, re.MULTILINE):
+            width = abs(float(x2) - float(x1))
+            height = abs(float(y2) - float(y1))
+            if rotations.get(int(page_num), 0) % 180 != 0:
+                width, height = height, width
+            sizes.append((width, height))
+        if len(sizes) != num_pages:
+            return None
+        return sizes
+
     def _extract_text(self, pdf_path: str, encoding: str) -> None:
         """Extract text using pdftotext."""
         subprocess.run(['pdftotext', '-bbox', '-enc', encoding, pdf_path])
@@ -0,0 +1,159 @@
+"""Write and read detection results in different output profiles.
+
+The full ``PdfDetectionResult`` embeds the whole pdffigures2 output and
+every box the detector found, which for long documents is most of the
+file. The output profiles, set with ``settings.RESULT_PROFILE``, are:
+
+- 'full': the whole result in ``<name>deepfigures-results.json``.
+- 'slim': only the paired figures. raw_detected_boxes and
+  raw_pdffigures_output are null.
+- 'compressed': the whole result, gzipped to
+  ``<name>deepfigures-results.json.gz``.
+- 'sidecar': the paired figures in the result file, with the raw
+  outputs written to separate files next to it. The result's
+  ``sidecars`` key maps each raw field to the name of its file, which
+  ``ResultFile`` only reads when the field is first accessed.
+"""
+
+import os
+from typing import List, Optional
+
+from deepfigures import settings
+from deepfigures.extraction.datamodels import PdfDetectionResult
+from deepfigures.utils import file_util
+
+
+PROFILES = ['full', 'slim', 'compressed', 'sidecar']
+
+# The fields of PdfDetectionResult left out of slim and sidecar results,
+# with the suffixes of their sidecar files.
+RAW_FIELDS = {
+    'raw_detected_boxes': 'deepfigures-raw-boxes.json',
+    'raw_pdffigures_output': 'deepfigures-raw-pdffigures.json',
+}
+
+SIDECARS_KEY = 'sidecars'
+
+RESULT_SUFFIX = 'deepfigures-results.json'
+
+
+def get_result_path(
+        output_directory: str,
+        pdf_path: str,
+        profile: Optional[str]=None) -> str:
+    """Return the path of the result for pdf_path in a profile.
+
+    :param str output_directory: the directory holding the result.
+    :param str pdf_path: the path to the PDF.
+    :param Optional[str] profile: one of PROFILES, defaults to
+      settings.RESULT_PROFILE.
+    """
+    if profile is None:
+        profile = settings.RESULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(
+            'profile must be one of {}'.format(', '.join(PROFILES)))
+    path = os.path.join(
+        output_directory, os.path.basename(pdf_path)[:-4] + RESULT_SUFFIX)
+    if profile == 'compressed':
+        path += '.gz'
+    return path
+
+
+def write_result(
+        pdf_detection_result: PdfDetectionResult,
+        output_directory: str,
+        profile: Optional[str]=None) -> str:
+    """Write pdf_detection_result to output_directory.
+
+    :param PdfDetectionResult pdf_detection_result: the result to write.
+    :param str output_directory: the directory to write the result and
+      any sidecar files to.
+    :param Optional[str] profile: one of PROFILES, defaults to
+      settings.RESULT_PROFILE.
+
+    :returns: the path to the result file.
+    """
+    if profile is None:
+        profile = settings.RESULT_PROFILE
+    output_path = get_result_path(
+        output_directory, pdf_detection_result.pdf, profile)
+    result_dict = pdf_detection_result.to_dict()
+    if profile in ['slim', 'sidecar']:
+        raw_outputs = {
+            field: result_dict.get(field) for field in RAW_FIELDS
+        }
+        result_dict.update({field: None for field in RAW_FIELDS})
+        if profile == 'sidecar':
+            prefix = os.path.basename(output_path)[:-len(RESULT_SUFFIX)]
+            sidecars = {}
+            for (field, suffix) in RAW_FIELDS.items():
+                sidecars[field] = prefix + suffix
+                _write_json(
+                    os.path.join(output_directory, sidecars[field]),
+                    raw_outputs[field])
+            result_dict[SIDECARS_KEY] = sidecars
+    _write_json(output_path, result_dict)
+    return output_path
+
+
+def _write_json(path: str, obj) -> None:
+    file_util.write_json_atomic(
+        path,
+        obj,
+        indent=2,
+        sort_keys=True,
+        compact=settings.COMPACT_JSON_OUTPUT)
+
+
+class ResultFile(object):
+    """A result written by write_result, in any profile.
+
+    :param str path: the path to the result file.
+
+    :ivar dict data: the parsed result file. In the slim and sidecar
+      profiles its raw fields are None.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.data = file_util.read_json(path)
+        self._sidecar_data = {}
+
+    @property
+    def figures(self) -> List[dict]:
+        return self.data['figures']
+
+    def get_raw(self, field: str):
+        """Return the raw output field, reading its sidecar if needed.
+
+        :param str field: one of RAW_FIELDS.
+
+        :returns: the JSON data of the field, or None if it was not
+          written.
+        """
+        if field not in RAW_FIELDS:
+            raise ValueError(
+                'field must be one of {}'.format(', '.join(RAW_FIELDS)))
+        sidecars = self.data.get(SIDECARS_KEY) or {}
+        if field not in sidecars:
+            return self.data.get(field)
+        if field not in self._sidecar_data:
+            self._sidecar_data[field] = file_util.read_json(
+                os.path.join(os.path.dirname(self.path), sidecars[field]))
+        return self._sidecar_data[field]
+
+    @property
+    def raw_detected_boxes(self) -> Optional[List[List[dict]]]:
+        return self.get_raw('raw_detected_boxes')
+
+    @property
+    def raw_pdffigures_output(self) -> Optional[dict]:
+        return self.get_raw('raw_pdffigures_output')
+
+    def to_result(self) -> PdfDetectionResult:
+        """Return the result, with the raw outputs of any sidecars."""
+        result_dict = dict(self.data)
+        for field in RAW_FIELDS:
+            result_dict[field] = self.get_raw(field)
+        return PdfDetectionResult.from_dict(result_dict)
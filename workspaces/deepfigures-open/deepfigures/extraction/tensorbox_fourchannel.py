@@ -3,7 +3,7 @@
 import copy
 import os
 import tempfile
-from typing import List, Tuple, Iterable
+from typing import List, Optional, Tuple, Iterable, Union
 
 import numpy as np
 import tensorflow as tf
@@ -16,6 +16,7 @@ from deepfigures.extraction.datamodels import (
     CaptionOnly)
 from deepfigures.extraction import (
     figure_utils,
+    page_filter,
     pdffigures_wrapper,
     renderers)
 from deepfigures.extraction.pdffigures_wrapper import pdffigures_extractor
@@ -107,63 +108,78 @@ class TensorboxCaptionmaskDetector(object):
             feed_dict=feed)
         return (np_pred_boxes, np_pred_confidences)
 
-    def get_detections(
+    def get_page_detections(
             self,
-            page_images: List[np.ndarray],
+            page_image: np.ndarray,
             crop_whitespace: bool = True,
-            conf_threshold: float = .5) -> List[List[BoxClass]]:
-        page_datas = [
-            {
-                'page_image': page_image,
-                'orig_size': page_image.shape[:2],
-                'resized_page_image': image_util.imresize_multichannel(
-                    page_image, self.input_shape),
-            }
-            for page_image in page_images
-        ]
+            conf_threshold: float = .5,
+            ink_index: Optional[image_util.InkIndex] = None) -> List[BoxClass]:
+        """Detect the figures on a single page image.
 
-        predictions = [
-            self.detect_page(page_data['resized_page_image'])
-            for page_data in page_datas
-        ]
+        Only the page and its resized copy are held in memory, so callers
+        can stream pages through the detector one at a time.
 
-        for (page_data, prediction) in zip(page_datas, predictions):
-            (np_pred_boxes, np_pred_confidences) = prediction
-            new_img, rects = train_utils.add_rectangles(
-                self.hypes,
-                page_data['resized_page_image'],
-                np_pred_confidences,
-                np_pred_boxes,
-                use_stitching=True,
-                min_conf=conf_threshold,
-                show_suppressed=False)
+        :param Optional[InkIndex] ink_index: an index of page_image used to
+          crop whitespace, built here if not given.
+        """
+        orig_size = page_image.shape[:2]
+        resized_page_image = image_util.imresize_multichannel(
+            page_image, self.input_shape)
+        (np_pred_boxes, np_pred_confidences) = self.detect_page(
+            resized_page_image)
+        new_img, rects = train_utils.add_rectangles(
+            self.hypes,
+            resized_page_image,
+            np_pred_confidences,
+            np_pred_boxes,
+            use_stitching=True,
+            min_conf=conf_threshold,
+            show_suppressed=False)
+        detected_boxes = [
+            BoxClass(x1=r.x1, y1=r.y1, x2=r.x2, y2=r.y2).resize_by_page(
+                self.input_shape, orig_size)
+            for r in rects if r.score > conf_threshold
+        ]
+        if crop_whitespace:
+            if ink_index is None and detected_boxes:
+                ink_index = image_util.InkIndex(
+                    page_image, settings.BACKGROUND_COLOR)
             detected_boxes = [
-                BoxClass(x1=r.x1, y1=r.y1, x2=r.x2, y2=r.y2).resize_by_page(
-                    self.input_shape, page_data['orig_size'])
-                for r in rects if r.score > conf_threshold
+                box.crop_whitespace_edges(page_image, ink_index)
+                for box in detected_boxes
             ]
-            if crop_whitespace:
-                detected_boxes = [
-                    box.crop_whitespace_edges(page_data['page_image'])
-                    for box in detected_boxes
-                ]
-                detected_boxes = list(filter(None, detected_boxes))
-            page_data['detected_boxes'] = detected_boxes
-        return [page_data['detected_boxes'] for page_data in page_datas]
+            detected_boxes = list(filter(None, detected_boxes))
+        return detected_boxes
 
+    def get_detections(
+            self,
+            page_images: Iterable[np.ndarray],
+            crop_whitespace: bool = True,
+            conf_threshold: float = .5) -> List[List[BoxClass]]:
+        """Detect the figures on each page image.
 
-def detect_figures(
-    pdf: str,
-    pdffigures_captions: List[CaptionOnly],
-    detector: TensorboxCaptionmaskDetector,
-    conf_threshold: float
-) -> Tuple[List[Figure], List[List[BoxClass]]]:
-    page_image_files = pdf_renderer.render(pdf, dpi=settings.DEFAULT_INFERENCE_DPI)
-    page_tensors = []
+        page_images may be a generator, in which case each page is
+        released once its detections have been computed.
+        """
+        return [
+            self.get_page_detections(
+                page_image,
+                crop_whitespace=crop_whitespace,
+                conf_threshold=conf_threshold)
+            for page_image in page_images
+        ]
+
+
+def _iter_page_tensors(
+        page_image_files: List[str],
+        caption_index: pdffigures_wrapper.CaptionIndex,
+        image_channels: int) -> Iterable[np.ndarray]:
+    """Yield the network input for each page, reading one page at a time."""
+    rounded_boundaries = caption_index.boundaries.get_rounded().tolist()
     for f in page_image_files:
         page_im = image_util.read_tensor(f)
-        if detector.hypes['image_channels'] == 3:
-            page_tensors.append(page_im)
+        if image_channels == 3:
+            yield page_im
         else:
             im_with_mask = np.pad(
                 page_im,
@@ -171,38 +187,64 @@ def detect_figures(
                 mode='constant',
                 constant_values=CAPTION_CHANNEL_BACKGROUND
             )
-            for caption in pdffigures_captions:
-                (x1, y1, x2, y2) = caption.caption_boundary.get_rounded()
+            for (x1, y1, x2, y2) in rounded_boundaries:
                 im_with_mask[y1:y2, x1:x2, 3] = CAPTION_CHANNEL_MASK
-            page_tensors.append(im_with_mask)
-    figure_boxes_by_page = detector.get_detections(
-        page_tensors, conf_threshold=conf_threshold
+            yield im_with_mask
+
+
+def detect_figures(
+    pdf: str,
+    pdffigures_captions: Union[List[CaptionOnly], pdffigures_wrapper.CaptionIndex],
+    detector: TensorboxCaptionmaskDetector,
+    conf_threshold: float
+) -> Tuple[List[Figure], List[List[BoxClass]]]:
+    if isinstance(pdffigures_captions, pdffigures_wrapper.CaptionIndex):
+        caption_index = pdffigures_captions
+    else:
+        caption_index = pdffigures_wrapper.CaptionIndex(pdffigures_captions)
+    page_image_files = pdf_renderer.render(pdf, dpi=settings.DEFAULT_INFERENCE_DPI)
+    page_tensors = _iter_page_tensors(
+        page_image_files,
+        caption_index,
+        detector.hypes['image_channels'])
+    page_skipper = page_filter.PageFilter()
+    figure_boxes_by_page = []
+    # Page numbers are always 0 indexed
+    for (page_num, page_tensor) in enumerate(page_tensors):
+        if page_skipper.get_skip_reason(
+                page_tensor, caption_index.get_page(page_num).captions):
+            figure_boxes_by_page.append([])
+            continue
+        figure_boxes_by_page.append(detector.get_page_detections(
+            page_tensor, conf_threshold=conf_threshold
+        ))
+    captions_by_page = [
+        caption_index.get_page(page_num)
+        for page_num in range(len(figure_boxes_by_page))
+    ]
+    pairs_by_page = figure_utils.pair_boxes_by_page(
+        figure_boxes_by_page,
+        [page_captions.boundaries for page_captions in captions_by_page]
     )
     figures_by_page = []
-    for page_num in range(len(page_image_files)):
-        # Page numbers are always 0 indexed
+    for (page_num, (figure_indices, caption_indices)) in enumerate(pairs_by_page):
         figure_boxes = figure_boxes_by_page[page_num]
-        pf_page_captions = [
-            cap for cap in pdffigures_captions if cap.page == page_num
-        ]
-        caption_boxes = [cap.caption_boundary for cap in pf_page_captions]
-        (figure_indices, caption_indices) = figure_utils.pair_boxes(
-            figure_boxes, caption_boxes
-        )
+        page_captions = captions_by_page[page_num].captions
         figures_by_page.extend(
             [
                 Figure(
                     figure_boundary=figure_boxes[figure_idx],
-                    caption_boundary=caption_boxes[caption_idx],
-                    caption_text=pf_page_captions[caption_idx].caption_text,
-                    name=pf_page_captions[caption_idx].name,
-                    figure_type=pf_page_captions[caption_idx].figure_type,
+                    caption_boundary=page_captions[caption_idx].caption_boundary,
+                    caption_text=page_captions[caption_idx].caption_text,
+                    name=page_captions[caption_idx].name,
+                    figure_type=page_captions[caption_idx].figure_type,
                     page=page_num,
                 )
                 for (figure_idx,
                      caption_idx) in zip(figure_indices, caption_indices)
             ]
         )
+    page_skipper.log_summary(pdf)
     return figures_by_page, figure_boxes_by_page
 
 
@@ -220,11 +262,11 @@ def detect_batch(
             pdffigures_output = pdffigures_extractor.extract(
                 pdf_path,
                 working_dir)
-            pdffigures_captions = pdffigures_wrapper.get_captions(
+            caption_index = pdffigures_wrapper.get_captions_by_page(
                 pdffigures_output)
             figures_by_page, figure_boxes_by_page = detect_figures(
                 pdf_path,
-                pdffigures_captions,
+                caption_index,
                 detector,
                 conf_threshold=conf_threshold)
             yield PdfDetectionResult(
@@ -0,0 +1,121 @@
+"""Tests for deepfigures.extraction.datamodels."""
+
+import unittest
+
+import numpy as np
+
+from deepfigures.extraction.datamodels import (
+    BoxArray,
+    BoxClass,
+    Figure,
+    PdfDetectionResult,
+    enclosing_box)
+
+
+class BoxClassTest(unittest.TestCase):
+    """Test deepfigures.extraction.datamodels.BoxClass."""
+
+    def test_round_trip(self):
+        """Test boxes serialize to the same dicts as before."""
+        box = BoxClass(x1=1, y1=2.5, x2=3, y2=4)
+        self.assertEqual(
+            box.to_dict(), {'x1': 1.0, 'y1': 2.5, 'x2': 3.0, 'y2': 4.0})
+        self.assertIsInstance(box.to_dict()['x1'], float)
+        self.assertEqual(
+            BoxClass.from_dict(box.to_dict()).to_dict(), box.to_dict())
+
+    def test_nested_round_trip(self):
+        """Test boxes nested in traitlets models round trip."""
+        box = BoxClass(x1=1, y1=2, x2=3, y2=4)
+        result = PdfDetectionResult(
+            pdf='paper.pdf',
+            figures=[Figure(figure_boundary=box, caption_boundary=box)],
+            dpi=100,
+            raw_detected_boxes=[[box], []],
+            raw_pdffigures_output={})
+        json_data = result.to_dict()
+        self.assertEqual(json_data['raw_detected_boxes'], [[box.to_dict()], []])
+        self.assertEqual(
+            PdfDetectionResult.from_dict(json_data).to_dict(), json_data)
+
+    def test_from_xml(self):
+        """Test pdftotext word boxes are scaled from 72 dpi to target_dpi."""
+        word = {'xMin': '72', 'yMin': '36', 'xMax': '144', 'yMax': '54.5'}
+        self.assertEqual(
+            BoxClass.from_xml(word, target_dpi=144).to_dict(),
+            {'x1': 144.0, 'y1': 72.0, 'x2': 288.0, 'y2': 109.0})
+
+
+class BoxArrayTest(unittest.TestCase):
+    """Test deepfigures.extraction.datamodels.BoxArray."""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        coords = rng.uniform(-50, 500, size=(40, 4))
+        # Include touching, empty and inverted boxes.
+        coords[:10] = np.round(coords[:10] / 50) * 50
+        coords[::7, 2] = coords[::7, 0]
+        self.boxes = BoxArray(coords[:20])
+        self.others = BoxArray(coords[20:])
+
+    def assert_pairwise_equal(self, result, method):
+        expected = [
+            [getattr(box, method)(other) for other in self.others.to_boxes()]
+            for box in self.boxes.to_boxes()
+        ]
+        np.testing.assert_array_equal(result, expected)
+
+    def test_pairwise_methods(self):
+        """Test pairwise methods match BoxClass exactly."""
+        self.assert_pairwise_equal(
+            self.boxes.intersection(self.others), 'intersection')
+        self.assert_pairwise_equal(self.boxes.iou(self.others), 'iou')
+        self.assert_pairwise_equal(
+            self.boxes.contains_box(self.others), 'contains_box')
+        self.assert_pairwise_equal(
+            self.boxes.distance_to_other(self.others), 'distance_to_other')
+
+    def test_transforms(self):
+        """Test transformations match BoxClass."""
+        boxes = self.boxes.to_boxes()
+        self.assertEqual(
+            self.boxes.rescale(1.7).to_dicts(),
+            [box.rescale(1.7).to_dict() for box in boxes])
+        self.assertEqual(
+            self.boxes.expand_box(3.).crop_to_page((300, 200, 3)).to_dicts(),
+            [box.expand_box(3.).crop_to_page((300, 200, 3)).to_dict()
+             for box in boxes])
+        self.assertEqual(
+            self.boxes.resize_by_page((480, 640), (1100, 850)).to_dicts(),
+            [box.resize_by_page((480, 640), (1100, 850)).to_dict()
+             for box in boxes])
+        np.testing.assert_array_equal(
+            self.boxes.get_areas(), [box.get_area() for box in boxes])
+        np.testing.assert_array_equal(
+            self.boxes.get_rounded(), [box.get_rounded() for box in boxes])
+
+    def test_serialization(self):
+        """Test BoxArray serializes like a list of BoxClass."""
+        json_data = [box.to_dict() for box in self.boxes.to_boxes()]
+        self.assertEqual(self.boxes.to_dicts(), json_data)
+        np.testing.assert_array_equal(
+            BoxArray.from_dicts(json_data).coords, self.boxes.coords)
+        self.assertEqual(self.boxes[3].to_dict(), json_data[3])
+        self.assertEqual(len(self.boxes[2:5]), 3)
+        self.assertEqual(len(BoxArray.from_boxes([])), 0)
+
+    def test_from_xml(self):
+        """Test loading word boxes and enclosing them match BoxClass."""
+        words = [
+            {'xMin': str(x1), 'yMin': str(y1), 'xMax': str(x2), 'yMax': str(y2)}
+            for (x1, y1, x2, y2) in self.boxes.coords.tolist()
+        ]
+        for target_dpi in [72, 100, 300]:
+            boxes = BoxArray.from_xml(words, target_dpi)
+            expected = [BoxClass.from_xml(word, target_dpi) for word in words]
+            self.assertEqual(
+                boxes.to_dicts(), [box.to_dict() for box in expected])
+            self.assertEqual(
+                boxes.enclosing_box().to_dict(),
+                enclosing_box(expected).to_dict())
+        self.assertEqual(len(BoxArray.from_xml([])), 0)
@@ -0,0 +1,135 @@
+"""Tests for deepfigures.extraction.figure_store."""
+
+import os
+import tempfile
+import unittest
+
+from deepfigures.extraction import figure_store, result_io
+from deepfigures.extraction.datamodels import (
+    BoxClass,
+    Figure,
+    PdfDetectionResult)
+from deepfigures.utils import file_util
+
+
+PDF_HASH = 'a' * 40
+
+
+def make_figure(page, figure_type='Figure', name='1'):
+    return Figure(
+        figure_boundary=BoxClass(x1=10, y1=20, x2=110, y2=220),
+        caption_boundary=BoxClass(x1=10, y1=230, x2=110, y2=250),
+        caption_text='{} {}.'.format(figure_type, name),
+        name=name,
+        page=page,
+        figure_type=figure_type)
+
+
+class TestFigureStore(unittest.TestCase):
+    """Test ingesting figure JSON and querying the figure store."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store_directory = os.path.join(self.root, 'store')
+        # A detection result in the slim profile
+        result_dir = os.path.join(self.root, 'results', PDF_HASH)
+        os.makedirs(result_dir)
+        result_io.write_result(
+            PdfDetectionResult(
+                pdf='/work/paper.pdf',
+                figures=[make_figure(0), make_figure(2, 'Table', '1')],
+                dpi=100,
+                raw_detected_boxes=[],
+                raw_pdffigures_output={}),
+            result_dir,
+            'slim')
+        # A PubMed tar's figures, keyed by page image
+        pubmed_dir = os.path.join(self.root, 'pubmed', '00')
+        os.makedirs(pubmed_dir)
+        pdf_dir = os.path.join(self.root, 'intermediate', 'PMC1')
+        os.makedirs(pdf_dir)
+        with open(os.path.join(pdf_dir, 'PMC1.pdf.sha1'), 'w') as f:
+            print('b' * 40, file=f)
+        page_name = os.path.join(
+            pdf_dir, 'PMC1.pdf-images', 'ghostscript', 'dpi100',
+            'PMC1.pdf-dpi100-page0002.png')
+        file_util.write_json_atomic(
+            os.path.join(pubmed_dir, 'PMC1.json'),
+            {page_name: [make_figure(1).to_dict()]})
+        file_util.write_json_atomic(
+            os.path.join(pubmed_dir, 'PMC2.json'),
+            {page_name: [make_figure(1, name='2').to_dict()]})
+
+        figure_store.ingest(
+            self.store_directory,
+            figure_store.find_json_files(os.path.join(self.root, 'results'), 'deepfigures'),
+            'deepfigures')
+        figure_store.ingest(
+            self.store_directory,
+            figure_store.find_json_files(os.path.join(self.root, 'pubmed'), 'pubmed'),
+            'pubmed',
+            rows_per_file=1)
+        self.store = figure_store.FigureStore(self.store_directory)
+
+    def test_ingest(self):
+        """Test ingest writes one row per figure, partitioned by source."""
+        self.assertEqual(self.store.sources, ['deepfigures', 'pubmed'])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.store_directory, 'source=pubmed'))),
+            ['part-00000.parquet', 'part-00001.parquet'])
+        figures = self.store.read()
+        self.assertEqual(len(figures), 4)
+        row = figures[figures.source == 'deepfigures'].iloc[0]
+        self.assertEqual(row.pdf, '/work/paper.pdf')
+        self.assertEqual(row.pdf_hash, PDF_HASH)
+        self.assertEqual(
+            (row.figure_x1, row.figure_y1, row.figure_x2, row.figure_y2),
+            (10, 20, 110, 220))
+        row = figures[figures.source == 'pubmed'].iloc[0]
+        self.assertEqual((row.pdf, row.pdf_hash, row.page), ('PMC1.pdf', 'b' * 40, 1))
+
+    def test_filters(self):
+        """Test filtering on columns and on the source partition."""
+        figures = self.store.read(
+            columns=['pdf', 'name'],
+            filters=[('source', '==', 'pubmed'), ('name', 'in', ['2'])])
+        self.assertEqual(list(figures.columns), ['pdf', 'name'])
+        self.assertEqual(figures.values.tolist(), [['PMC1.pdf', '2']])
+        self.assertEqual(
+            len(self.store.read(filters=[('page', '>', 5)])), 0)
+        with self.assertRaises(ValueError):
+            self.store.read(filters=[('page', '~', 1)])
+
+    def test_count(self):
+        """Test counting figures in total and by group."""
+        self.assertEqual(self.store.count(), 4)
+        self.assertEqual(
+            self.store.count(by=['source', 'figure_type']),
+            {
+                ('deepfigures', 'Figure'): 1,
+                ('deepfigures', 'Table'): 1,
+                ('pubmed', 'Figure'): 2,
+            })
+        self.assertEqual(
+            self.store.count(by=['page'], filters=[('source', '!=', 'pubmed')]),
+            {0: 1, 2: 1})
+
+    def test_reingest_replaces_partition(self):
+        """Test ingesting a source again replaces its figures."""
+        figure_store.ingest(self.store_directory, [], 'pubmed')
+        self.assertEqual(self.store.count(by=['source']), {'deepfigures': 2})
+
+    def test_failed_ingest_keeps_partition(self):
+        """Test a failed ingest leaves the partition's figures in place."""
+        def json_paths():
+            yield from figure_store.find_json_files(
+                os.path.join(self.root, 'pubmed'), 'pubmed')
+            raise RuntimeError('listing failed')
+        with self.assertRaises(RuntimeError):
+            figure_store.ingest(
+                self.store_directory, json_paths(), 'pubmed', rows_per_file=1)
+        self.assertEqual(
+            self.store.count(by=['source']), {'deepfigures': 2, 'pubmed': 2})
+        self.assertEqual(
+            sorted(os.listdir(self.store_directory)),
+            ['source=deepfigures', 'source=pubmed'])
@@ -0,0 +1,60 @@
+"""Tests for deepfigures.extraction.figure_utils."""
+
+import unittest
+
+import numpy as np
+import scipy.optimize as opt
+
+from deepfigures.extraction import figure_utils
+from deepfigures.extraction.datamodels import BoxArray
+
+
+def reference_pair_boxes(a_boxes, b_boxes):
+    """Pair boxes by filling in the cost matrix one pair at a time."""
+    cost_matrix = np.zeros([len(a_boxes), len(b_boxes)])
+    for (a_idx, a_box) in enumerate(a_boxes):
+        for (b_idx, b_box) in enumerate(b_boxes):
+            cost_matrix[a_idx, b_idx] = a_box.distance_to_other(b_box)
+    return opt.linear_sum_assignment(cost_matrix)
+
+
+class PairBoxesTest(unittest.TestCase):
+    """Test pair_boxes and pair_boxes_by_page."""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.pages = []
+        for _ in range(200):
+            boxes = []
+            for _ in range(2):
+                coords = rng.randint(0, 800, size=(rng.randint(0, 6), 4))
+                coords[:, 2:] = coords[:, :2] + rng.randint(
+                    5, 300, size=(len(coords), 2))
+                boxes.append(BoxArray(coords).to_boxes())
+            self.pages.append(tuple(boxes))
+
+    def assert_pairs_equal(self, pairs, expected):
+        np.testing.assert_array_equal(pairs[0], expected[0])
+        np.testing.assert_array_equal(pairs[1], expected[1])
+
+    def test_pair_boxes(self):
+        """Test pair_boxes matches filling the matrix with a loop."""
+        for (a_boxes, b_boxes) in self.pages:
+            expected = reference_pair_boxes(a_boxes, b_boxes)
+            self.assert_pairs_equal(
+                figure_utils.pair_boxes(a_boxes, b_boxes), expected)
+            self.assert_pairs_equal(
+                figure_utils.pair_boxes(
+                    BoxArray.from_boxes(a_boxes), BoxArray.from_boxes(b_boxes)),
+                expected)
+
+    def test_pair_boxes_by_page(self):
+        """Test pair_boxes_by_page matches pairing each page."""
+        pairs_by_page = figure_utils.pair_boxes_by_page(
+            [a_boxes for (a_boxes, _) in self.pages],
+            [b_boxes for (_, b_boxes) in self.pages])
+        self.assertEqual(len(pairs_by_page), len(self.pages))
+        for ((a_boxes, b_boxes), pairs) in zip(self.pages, pairs_by_page):
+            self.assert_pairs_equal(
+                pairs, reference_pair_boxes(a_boxes, b_boxes))
+        self.assertEqual(figure_utils.pair_boxes_by_page([], []), [])
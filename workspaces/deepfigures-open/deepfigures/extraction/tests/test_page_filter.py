@@ -0,0 +1,99 @@
+"""Tests for deepfigures.extraction.page_filter."""
+
+import os
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from deepfigures import settings
+from deepfigures.extraction import page_filter
+from deepfigures.extraction.datamodels import BoxClass, CaptionOnly
+from deepfigures.utils import file_util
+
+
+def make_caption(page):
+    return CaptionOnly(
+        caption_boundary=BoxClass(x1=10, y1=10, x2=100, y2=20),
+        caption_text='Figure 1: A figure.',
+        name='1',
+        figure_type='Figure',
+        page=page)
+
+
+class PageFilterTest(unittest.TestCase):
+    """Test deepfigures.extraction.page_filter.PageFilter."""
+
+    def setUp(self):
+        self.blank = np.full((1100, 850, 3), 255, dtype=np.uint8)
+        self.text = self.blank.copy()
+        for y in range(100, 1000, 20):
+            for x in range(100, 750, 8):
+                self.text[y:y + 10, x:x + 5] = 0
+        self.plot = self.text.copy()
+        self.plot[300:600, 200] = 0
+        self.plot[600, 200:600] = 0
+
+    def test_blank(self):
+        """Test blank pages are only skipped by the blank filter."""
+        captions = [make_caption(0)]
+        page_skipper = page_filter.PageFilter(['blank'])
+        self.assertEqual(
+            page_skipper.get_skip_reason(self.blank, captions), 'blank')
+        self.assertIsNone(page_skipper.get_skip_reason(self.text, captions))
+        self.assertEqual(page_skipper.skip_rate, 0.5)
+
+    def test_captionless(self):
+        """Test pages without captions are skipped."""
+        page_skipper = page_filter.PageFilter(['captionless'])
+        self.assertEqual(
+            page_skipper.get_skip_reason(self.plot, []), 'captionless')
+        self.assertIsNone(
+            page_skipper.get_skip_reason(self.plot, [make_caption(0)]))
+
+    def test_text_only(self):
+        """Test text_only keeps pages with long lines."""
+        captions = [make_caption(0)]
+        page_skipper = page_filter.PageFilter(['text_only'])
+        self.assertEqual(
+            page_skipper.get_skip_reason(self.text, captions), 'text_only')
+        self.assertIsNone(page_skipper.get_skip_reason(self.plot, captions))
+
+    def test_unknown_filter(self):
+        """Test unknown filter names raise a ValueError."""
+        with self.assertRaises(ValueError):
+            page_filter.PageFilter(['blank', 'fast'])
+
+
+class EvaluateTest(unittest.TestCase):
+    """Test deepfigures.extraction.page_filter.evaluate."""
+
+    def test_no_recall_loss_on_test_paper(self):
+        """Test the filters lose no figures on the end to end test paper."""
+        result = file_util.read_json(os.path.join(
+            settings.TEST_DATA_DIR,
+            'endtoend/_work_tests_data_endtoend_paper.pdf-result.json'))
+        labeled_pages = []
+        for page_num in range(6):
+            page_image_path = os.path.join(
+                settings.TEST_DATA_DIR,
+                'pdfrenderer/ghostscript-renderings/'
+                'paper.pdf-dpi100-page{:04d}.png'.format(page_num + 1))
+            with Image.open(page_image_path) as im:
+                page_image = np.asarray(im.convert('RGB'))
+            page_captions = [
+                make_caption(page_num)
+                for figure in result['raw_pdffigures_output']['figures']
+                if figure['page'] == page_num
+            ]
+            gold_boxes = [
+                BoxClass.from_dict(figure['figure_boundary'])
+                for figure in result['figures']
+                if figure['page'] == page_num
+            ]
+            labeled_pages.append((page_image, page_captions, gold_boxes))
+        for filters in [['captionless'], ['text_only'], page_filter.FILTERS]:
+            evaluation = page_filter.evaluate(labeled_pages, filters)
+            self.assertEqual(evaluation['figures'], 6)
+            self.assertEqual(evaluation['skipped_pages'], 3)
+            self.assertEqual(evaluation['recall_loss'], 0.)
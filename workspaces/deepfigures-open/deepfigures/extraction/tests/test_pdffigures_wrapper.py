@@ -0,0 +1,74 @@
+"""Tests for deepfigures.extraction.pdffigures_wrapper."""
+
+import unittest
+
+from deepfigures.extraction import pdffigures_wrapper
+from deepfigures.extraction.datamodels import BoxClass
+
+
+def make_pdffigures_output():
+    boundary = {'x1': 10., 'y1': 20.5, 'x2': 110., 'y2': 40.}
+    return {
+        'figures': [
+            {
+                'captionBoundary': dict(boundary, y1=20.5 + page),
+                'caption': 'Figure {}.'.format(page),
+                'name': str(page),
+                'figType': 'Figure',
+                'page': page,
+            } for page in [2, 0, 2]
+        ],
+        'regionless-captions': [
+            {
+                'boundary': boundary,
+                'text': 'Table 1.',
+                'name': '1',
+                'figType': 'Table',
+                'page': 0,
+            }
+        ],
+    }
+
+
+class TestGetCaptionsByPage(unittest.TestCase):
+    """Test deepfigures.extraction.pdffigures_wrapper.get_captions_by_page."""
+
+    def test_matches_rescaling_each_caption(self):
+        """Test the boundaries match rescaling each caption separately."""
+        pdffigures_output = make_pdffigures_output()
+        caption_index = pdffigures_wrapper.get_captions_by_page(
+            pdffigures_output, target_dpi=100)
+        expected = [
+            BoxClass.from_dict(fig['captionBoundary']).rescale(100 / 72).to_dict()
+            for fig in pdffigures_output['figures']
+        ] + [
+            BoxClass.from_dict(reg['boundary']).rescale(100 / 72).to_dict()
+            for reg in pdffigures_output['regionless-captions']
+        ]
+        self.assertEqual(
+            [caption.caption_boundary.to_dict() for caption in caption_index],
+            expected)
+        self.assertEqual(caption_index.boundaries.to_dicts(), expected)
+
+    def test_groups_captions_by_page_in_order(self):
+        """Test get_page keeps the pdffigures order within each page."""
+        caption_index = pdffigures_wrapper.get_captions_by_page(
+            make_pdffigures_output())
+        self.assertEqual(len(caption_index), 4)
+        self.assertEqual(
+            [caption.caption_text for caption in caption_index.get_page(0).captions],
+            ['Figure 0.', 'Table 1.'])
+        self.assertEqual(
+            [caption.caption_text for caption in caption_index.get_page(2).captions],
+            ['Figure 2.', 'Figure 2.'])
+        page = caption_index.get_page(2)
+        self.assertEqual(
+            page.boundaries.to_dicts(),
+            [caption.caption_boundary.to_dict() for caption in page.captions])
+
+    def test_pages_without_captions_are_empty(self):
+        """Test get_page returns no captions for pages without any."""
+        caption_index = pdffigures_wrapper.get_captions_by_page({})
+        page = caption_index.get_page(1)
+        self.assertEqual(len(page), 0)
+        self.assertEqual(len(page.boundaries), 0)
@@ -56,6 +56,124 @@ class PDFRendererTest(unittest.TestCase):
             renderers.PDFRenderer()
 
 
+class StubRenderer(renderers.PDFRenderer):
+    """A PDFRenderer which records the pages it rasterizes.
+
+    :ivar Optional[int] num_pages: the number of pages _count_pages
+      returns, also the number _rasterize_pdf writes.
+    :ivar List[str] rasterized: the paths written, in order.
+    :ivar List[List[int]] page_lists: the pages of each call to
+      _rasterize_pages.
+    """
+    RENDERING_ENGINE_NAME = 'stub'
+
+    def __init__(self, num_pages):
+        super().__init__()
+        self.num_pages = num_pages
+        self.counts_pages = True
+        self.rasterized = []
+        self.page_lists = []
+
+    def _write(self, path):
+        with open(path, 'w') as f:
+            f.write(path)
+        self.rasterized.append(path)
+
+    def _count_pages(self, pdf_path):
+        return self.num_pages if self.counts_pages else None
+
+    def _rasterize_pdf(self, pdf_path, image_output_path_prefix, dpi, ext,
+                       max_pages, check_retcode):
+        for page_num in range(1, min(self.num_pages, max_pages or 1e9) + 1):
+            self._write('{}{:04d}.{}'.format(
+                image_output_path_prefix, page_num, ext))
+
+    def _rasterize_page(self, pdf_path, page_num, output_path, dpi, ext,
+                        check_retcode):
+        self._write(output_path)
+
+    def _rasterize_pages(self, pdf_path, page_nums, image_output_path_prefix,
+                         dpi, ext, check_retcode):
+        self.page_lists.append(page_nums)
+        super()._rasterize_pages(
+            pdf_path, page_nums, image_output_path_prefix, dpi, ext,
+            check_retcode)
+
+
+class PDFRendererCacheTest(unittest.TestCase):
+    """Test PDFRenderer.render reuses pages from PDFRenderer.render_page."""
+
+    def setUp(self):
+        self.tmp_output_dir = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.tmp_output_dir, 'paper.pdf')
+        self.pdf_renderer = StubRenderer(num_pages=6)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_output_dir)
+
+    def _render_pages(self, page_nums):
+        return [
+            self.pdf_renderer.render_page(self.pdf_path, page_num)
+            for page_num in page_nums]
+
+    def _get_output_names(self):
+        return sorted(
+            file_name
+            for dir_path, dir_names, file_names in os.walk(
+                    self.tmp_output_dir)
+            for file_name in file_names)
+
+    def test_renders_missing_pages(self):
+        """Test only the pages not rendered yet are rasterized."""
+        rendered_pages = self._render_pages([2, 5])
+        paths = self.pdf_renderer.render(self.pdf_path)
+        self.assertEqual(len(paths), 6)
+        self.assertEqual(len(self.pdf_renderer.rasterized), 6)
+        self.assertEqual(self.pdf_renderer.page_lists, [[1, 3, 4, 6]])
+        self.assertEqual([paths[1], paths[4]], rendered_pages)
+        for path in paths:
+            self.assertEqual(
+                [rasterized.endswith(os.path.basename(path))
+                 for rasterized in self.pdf_renderer.rasterized].count(True),
+                1)
+        self.assertIn('_SUCCESS', self._get_output_names())
+        # and the cached pages are used from now on
+        self.pdf_renderer.render(self.pdf_path)
+        self._render_pages([3])
+        self.assertEqual(len(self.pdf_renderer.rasterized), 6)
+
+    def test_max_pages(self):
+        """Test the missing pages are limited to max_pages."""
+        self._render_pages([2])
+        paths = self.pdf_renderer.render(self.pdf_path, max_pages=4)
+        self.assertEqual(len(paths), 4)
+        self.assertEqual(len(self.pdf_renderer.rasterized), 4)
+        self.assertEqual(self.pdf_renderer.page_lists, [[1, 3, 4]])
+
+    def test_uncounted_pages(self):
+        """Test the whole PDF is rasterized if the pages can't be counted."""
+        self.pdf_renderer.counts_pages = False
+        self._render_pages([2])
+        paths = self.pdf_renderer.render(self.pdf_path)
+        self.assertEqual(len(paths), 6)
+        self.assertEqual(len(self.pdf_renderer.rasterized), 7)
+        # the page already rendered is kept
+        with open(paths[1]) as f:
+            self.assertEqual(f.read(), self.pdf_renderer.rasterized[0])
+        self.assertEqual(
+            self._get_output_names(),
+            ['_SUCCESS'] + [
+                'paper.pdf-dpi100-page{:04d}.png'.format(page_num)
+                for page_num in range(1, 7)])
+
+    def test_busts_cache(self):
+        """Test that passing use_cache False rasterizes every page."""
+        self._render_pages([2, 5])
+        paths = self.pdf_renderer.render(self.pdf_path, use_cache=False)
+        self.assertEqual(len(paths), 6)
+        self.assertEqual(len(self.pdf_renderer.rasterized), 8)
+
+
 class PDFRendererSubclassTestMixin(object):
     """A mixin for making tests of PDFRenderer subclasses.
 
@@ -292,6 +410,103 @@ class PDFRendererSubclassTestMixin(object):
                         os.path.getmtime(path),
                         msg="{path} mtime did not change.".format(path=path))
 
+    def test_render_page(self):
+        """Test render_page renders one page to the path render uses."""
+        ext = 'png'
+        with self.setup_and_teardown(ext=ext):
+            output_path = self.pdf_renderer.render_page(
+                pdf_path=self.pdf_path,
+                page_num=2,
+                output_dir=self.tmp_output_dir,
+                ext=ext,
+                check_retcode=True)
+            self.assertEqual(output_path, self.expected_dir_structure[2])
+            output_dir_paths = [
+                os.path.join(dir_path, file_name)
+                for dir_path, dir_names, file_names in os.walk(
+                        self.tmp_output_dir)
+                for file_name in file_names
+            ]
+            self.assertEqual(output_dir_paths, [output_path])
+            test_image = imread(output_path)
+            reference_image = imread(
+                os.path.join(
+                    self.MANUALLY_INSPECTED_RENDERINGS_DIR,
+                    os.path.split(output_path)[-1]))
+            self.assertLess(
+                np.sum(np.abs(test_image - reference_image)) / test_image.size,
+                5.0)
+            # rendering the page again uses the cached copy
+            mtime = os.path.getmtime(output_path)
+            time.sleep(1)
+            self.pdf_renderer.render_page(
+                pdf_path=self.pdf_path,
+                page_num=2,
+                output_dir=self.tmp_output_dir,
+                ext=ext,
+                check_retcode=True)
+            self.assertEqual(mtime, os.path.getmtime(output_path))
+
+    def test_render_region(self):
+        """Test render_region matches the same region of the page."""
+        ext = 'png'
+        with self.setup_and_teardown(ext=ext):
+            reference_image = imread(
+                os.path.join(
+                    self.MANUALLY_INSPECTED_RENDERINGS_DIR,
+                    self.pdf_rendered_page_template.format(
+                        page_num=2, ext=ext)))
+            # convert from pixels at the inference dpi to PDF points
+            scale = 72 / settings.DEFAULT_INFERENCE_DPI
+            x1, y1, x2, y2 = 100, 200, 500, 400
+            _, page_height = self.pdf_renderer.get_page_sizes(self.pdf_path)[1]
+            output_path = self.pdf_renderer.render_region(
+                pdf_path=self.pdf_path,
+                page_num=2,
+                box=(x1 * scale, y1 * scale, x2 * scale, y2 * scale),
+                page_height=page_height,
+                output_path=os.path.join(self.tmp_output_dir, 'region.png'),
+                dpi=settings.DEFAULT_INFERENCE_DPI,
+                check_retcode=True)
+            test_image = imread(output_path)
+            self.assertEqual(test_image.shape[:2], (y2 - y1, x2 - x1))
+            self.assertLess(
+                np.sum(np.abs(
+                    test_image.astype(float) -
+                    reference_image[y1:y2, x1:x2].astype(float))
+                ) / test_image.size,
+                5.0)
+
+    def test_get_page_sizes(self):
+        """Test get_page_sizes matches the sizes of the rendered pages."""
+        ext = 'png'
+        with self.setup_and_teardown(ext=ext):
+            page_sizes = self.pdf_renderer.get_page_sizes(self.pdf_path)
+            self.assertEqual(len(page_sizes), self.pdf_num_pages)
+            scale = settings.DEFAULT_INFERENCE_DPI / 72
+            for (page_num, (width, height)) in enumerate(page_sizes, 1):
+                reference_image = imread(
+                    os.path.join(
+                        self.MANUALLY_INSPECTED_RENDERINGS_DIR,
+                        self.pdf_rendered_page_template.format(
+                            page_num=page_num, ext=ext)))
+                self.assertAlmostEqual(
+                    reference_image.shape[0], height * scale, delta=1)
+                self.assertAlmostEqual(
+                    reference_image.shape[1], width * scale, delta=1)
+
+    def test_render_region_rejects_bad_arguments(self):
+        """Test render_region rejects bad extensions and empty boxes."""
+        with self.setup_and_teardown(ext='png'):
+            with self.assertRaises(ValueError):
+                self.pdf_renderer.render_region(
+                    self.pdf_path, 1, (0, 0, 10, 10), 792,
+                    os.path.join(self.tmp_output_dir, 'region.gif'))
+            with self.assertRaises(ValueError):
+                self.pdf_renderer.render_region(
+                    self.pdf_path, 1, (10, 0, 10, 10), 792,
+                    os.path.join(self.tmp_output_dir, 'region.png'))
+
 
 class GhostScriptRendererTest(
         PDFRendererSubclassTestMixin,
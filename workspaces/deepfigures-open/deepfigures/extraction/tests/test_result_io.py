@@ -0,0 +1,98 @@
+"""Tests for deepfigures.extraction.result_io."""
+
+import os
+import tempfile
+import unittest
+
+from deepfigures.extraction import result_io
+from deepfigures.extraction.datamodels import (
+    BoxClass,
+    Figure,
+    PdfDetectionResult)
+
+
+def make_result():
+    box = BoxClass(x1=10, y1=20, x2=300, y2=400)
+    return PdfDetectionResult(
+        pdf='/work/paper.pdf',
+        figures=[
+            Figure(
+                figure_boundary=box,
+                caption_boundary=box,
+                caption_text='Figure 1.',
+                name='1',
+                page=0,
+                figure_type='Figure')
+        ],
+        dpi=100,
+        raw_detected_boxes=[[box], []],
+        raw_pdffigures_output={'figures': [], 'regionless-captions': []},
+        error=None)
+
+
+class TestWriteResult(unittest.TestCase):
+    """Test deepfigures.extraction.result_io.write_result."""
+
+    def setUp(self):
+        self.result = make_result()
+        self.output_directory = tempfile.mkdtemp()
+
+    def test_full_profiles_round_trip(self):
+        """Test the full and compressed profiles keep every field."""
+        for (profile, name) in [
+                ('full', 'paperdeepfigures-results.json'),
+                ('compressed', 'paperdeepfigures-results.json.gz')]:
+            path = result_io.write_result(
+                self.result, self.output_directory, profile)
+            self.assertEqual(os.path.basename(path), name)
+            result_file = result_io.ResultFile(path)
+            self.assertEqual(result_file.data, self.result.to_dict())
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(2), b'\x1f\x8b')
+
+    def test_slim(self):
+        """Test the slim profile drops the raw outputs."""
+        path = result_io.write_result(
+            self.result, self.output_directory, 'slim')
+        result_file = result_io.ResultFile(path)
+        self.assertEqual(result_file.figures, self.result.to_dict()['figures'])
+        self.assertIsNone(result_file.raw_detected_boxes)
+        self.assertIsNone(result_file.raw_pdffigures_output)
+        self.assertEqual(os.listdir(self.output_directory), [os.path.basename(path)])
+        self.assertEqual(
+            len(result_file.to_result().figures), len(self.result.figures))
+
+    def test_sidecar(self):
+        """Test the sidecar profile reads the raw outputs lazily."""
+        path = result_io.write_result(
+            self.result, self.output_directory, 'sidecar')
+        self.assertEqual(
+            sorted(os.listdir(self.output_directory)),
+            [
+                'paperdeepfigures-raw-boxes.json',
+                'paperdeepfigures-raw-pdffigures.json',
+                'paperdeepfigures-results.json',
+            ])
+        result_file = result_io.ResultFile(path)
+        self.assertIsNone(result_file.data['raw_detected_boxes'])
+        os.remove(os.path.join(
+            self.output_directory, 'paperdeepfigures-raw-pdffigures.json'))
+        # Only the sidecar which is accessed is read
+        self.assertEqual(
+            result_file.raw_detected_boxes,
+            self.result.to_dict()['raw_detected_boxes'])
+        self.assertEqual(result_file.figures, self.result.to_dict()['figures'])
+
+    def test_sidecar_to_result(self):
+        """Test to_result restores the raw outputs from the sidecars."""
+        path = result_io.write_result(
+            self.result, self.output_directory, 'sidecar')
+        self.assertEqual(
+            result_io.ResultFile(path).to_result().to_dict(),
+            self.result.to_dict())
+
+    def test_unknown_profile(self):
+        """Test unknown profiles are rejected."""
+        with self.assertRaises(ValueError):
+            result_io.write_result(
+                self.result, self.output_directory, 'tiny')
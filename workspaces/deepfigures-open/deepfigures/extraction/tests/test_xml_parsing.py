@@ -0,0 +1,112 @@
+"""Tests for deepfigures.extraction.xml_parsing."""
+
+import io
+import unittest
+
+import numpy as np
+
+from deepfigures.extraction import xml_parsing
+
+
+# Output in the form of pdftotext -bbox
+BBOX_HTML = b"""<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<title></title>
+<meta name="Producer" content="pdftotext"/>
+</head>
+<body>
+<doc>
+  <page width="612.000000" height="792.000000">
+    <word xMin="72.000000" yMin="36.000000" xMax="100.500000" yMax="48.000000">Figure</word>
+    <word xMin="102.000000" yMin="36.000000" xMax="110.000000" yMax="48.000000">1:</word>
+    <word xMin="112.000000" yMin="36.000000" xMax="150.000000" yMax="48.000000">R&amp;D</word>
+  </page>
+  <page width="612.000000" height="792.000000">
+  </page>
+  <page width="612.000000" height="792.000000">
+    <word xMin="1.000000" yMin="2.000000" xMax="3.000000" yMax="4.000000">\xc3\xa6ther</word>
+  </page>
+</doc>
+</body>
+</html>
+"""
+
+NXML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<article xmlns:xlink="http://www.w3.org/1999/xlink">
+  <body>
+    <sec>
+      <p>Some text <!-- a comment --> in the body.</p>
+      <fig id="F1">
+        <label>Figure 1</label>
+        <caption><p>A <italic>plot</italic> of data.</p></caption>
+        <graphic xlink:href="paper-f1"/>
+      </fig>
+      <table-wrap id="T1">
+        <label>Table 1</label>
+        <caption><title>Results</title></caption>
+        <table>
+          <tr><td>x<sup>2</sup></td><td>1.5 2.5</td></tr>
+          <tr><th>Name</th><th>Value</th></tr>
+        </table>
+        <table-wrap-foot><fn><p>Note one.</p></fn></table-wrap-foot>
+        <fig id="F2"><label>Figure 2</label><graphic href="paper-f2"/></fig>
+      </table-wrap>
+      <fig id="F3"><caption>No label</caption><graphic/></fig>
+    </sec>
+  </body>
+</article>
+"""
+
+
+class TestParsePdftotextBbox(unittest.TestCase):
+    """Test deepfigures.extraction.xml_parsing.parse_pdftotext_bbox."""
+
+    def test_parse(self):
+        """Test the words and boxes of each page are read in order."""
+        pages = xml_parsing.parse_pdftotext_bbox(io.BytesIO(BBOX_HTML))
+        self.assertEqual([len(page) for page in pages], [3, 0, 1])
+        self.assertEqual(pages[0].texts, ['Figure', '1:', 'R&D'])
+        self.assertEqual(pages[2].texts, ['æther'])
+        np.testing.assert_array_equal(
+            pages[0].boxes.coords[0], [72., 36., 100.5, 48.])
+        self.assertEqual(pages[1].boxes.coords.shape, (0, 4))
+
+
+class TestParseNxmlFigures(unittest.TestCase):
+    """Test deepfigures.extraction.xml_parsing.parse_nxml_figures."""
+
+    def setUp(self):
+        self.figures = xml_parsing.parse_nxml_figures(io.BytesIO(NXML))
+
+    def test_order(self):
+        """Test figures come before tables, each in document order."""
+        self.assertEqual(
+            [(figure.name, figure.label) for figure in self.figures],
+            [('fig', 'Figure 1'), ('fig', 'Figure 2'), ('fig', None),
+             ('table-wrap', 'Table 1')])
+
+    def test_figures(self):
+        """Test the text and graphic of figures are read."""
+        (figure_1, figure_2, figure_3, _) = self.figures
+        self.assertEqual(figure_1.caption, 'A plot of data.')
+        self.assertTrue(figure_1.has_graphic)
+        self.assertEqual(figure_1.graphic_href, 'paper-f1')
+        self.assertEqual(figure_2.caption, None)
+        self.assertEqual(figure_2.graphic_href, 'paper-f2')
+        self.assertEqual(figure_3.caption, 'No label')
+        self.assertTrue(figure_3.has_graphic)
+        self.assertIsNone(figure_3.graphic_href)
+        self.assertEqual(figure_1.table_tokens, [])
+
+    def test_tables(self):
+        """Test the cells of tables are split into tokens."""
+        table = self.figures[-1]
+        self.assertEqual(table.caption, 'Results')
+        # The label and graphic of the nested figure are searched too
+        self.assertEqual(table.label, 'Table 1')
+        self.assertEqual(table.graphic_href, 'paper-f2')
+        self.assertEqual(
+            table.table_tokens, ['Name', 'Value', 'x', '2', '1.5', '2.5'])
+        self.assertEqual(table.footer_tokens, ['Note', 'one.'])
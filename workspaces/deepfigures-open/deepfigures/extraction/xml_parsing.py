@@ -0,0 +1,198 @@
+"""Streaming parsers for the XML documents that describe a PDF.
+
+These read pdftotext's -bbox output and the .nxml article files from
+PubMed Central with lxml's iterparse. They keep only compact records of
+the words and figures, and clear each element once it has been read, so
+the document's tree is never held in memory as a whole.
+"""
+
+from typing import IO, Iterator, List, Optional, Union
+
+from lxml import etree
+import numpy as np
+
+from deepfigures.extraction import datamodels
+
+
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+
+# The elements of an .nxml file read into NxmlFigure records.
+FIGURE_TAGS = ('fig', 'table-wrap')
+
+Source = Union[str, IO[bytes]]
+
+
+class PageWords(object):
+    """The words on a page of pdftotext's -bbox output.
+
+    :ivar List[str] texts: the text of each word.
+    :ivar BoxArray boxes: the word boxes in points (72 dpi), with row i
+      holding the box of texts[i].
+    """
+    __slots__ = ('texts', 'boxes')
+
+    def __init__(self, texts: List[str], boxes: datamodels.BoxArray) -> None:
+        self.texts = texts
+        self.boxes = boxes
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+class NxmlFigure(object):
+    """A figure or table in an .nxml file.
+
+    :ivar str name: the element's name, 'fig' or 'table-wrap'.
+    :ivar Optional[str] label: the text of the first label element in
+      the figure, or None if there is none.
+    :ivar Optional[str] caption: the text of the first caption element.
+    :ivar bool has_graphic: whether the figure has a graphic element.
+    :ivar Optional[str] graphic_href: the xlink:href attribute of the
+      first graphic element, or else its href attribute.
+    :ivar List[str] table_tokens: the tokens of the th cells and then
+      the td cells. Each child of a cell is split into tokens on its
+      own, so markup such as <sup> separates tokens.
+    :ivar List[str] footer_tokens: the tokens of the table-wrap-foot
+      elements.
+    """
+    __slots__ = (
+        'name', 'label', 'caption', 'has_graphic', 'graphic_href',
+        'table_tokens', 'footer_tokens')
+
+    def __init__(
+        self,
+        name: str,
+        label: Optional[str]=None,
+        caption: Optional[str]=None,
+        has_graphic: bool=False,
+        graphic_href: Optional[str]=None,
+        table_tokens: Optional[List[str]]=None,
+        footer_tokens: Optional[List[str]]=None
+    ) -> None:
+        self.name = name
+        self.label = label
+        self.caption = caption
+        self.has_graphic = has_graphic
+        self.graphic_href = graphic_href
+        self.table_tokens = table_tokens or []
+        self.footer_tokens = footer_tokens or []
+
+
+def _clear(element: etree._Element) -> None:
+    """Free element's contents and the siblings already read before it."""
+    element.clear(keep_tail=True)
+    while element.getprevious() is not None:
+        del element.getparent()[0]
+
+
+def _get_text(element: etree._Element) -> str:
+    return ''.join(element.itertext())
+
+
+def _find_first(element: etree._Element, name: str) -> Optional[etree._Element]:
+    return next(element.iter('{*}' + name), None)
+
+
+def _iter_child_tokens(element: etree._Element) -> Iterator[str]:
+    pieces = [element.text]
+    for child in element:
+        pieces.append(_get_text(child))
+        pieces.append(child.tail)
+    for piece in pieces:
+        if piece:
+            yield from piece.split()
+
+
+def parse_pdftotext_bbox(source: Source) -> List[PageWords]:
+    """Read the words on each page of pdftotext's -bbox output.
+
+    :param Source source: the path to the XML, or a binary file object.
+
+    :returns: the words of each page, in order.
+    """
+    pages = []
+    texts = []
+    coords = []
+    for (_, element) in etree.iterparse(
+            source, events=('end',), tag=('{*}word', '{*}page'),
+            recover=True, huge_tree=True):
+        if etree.QName(element).localname == 'word':
+            texts.append(_get_text(element))
+            coords.append((
+                element.get('xMin'), element.get('yMin'),
+                element.get('xMax'), element.get('yMax')))
+        else:
+            pages.append(PageWords(
+                texts, datamodels.BoxArray(np.array(coords, dtype=np.float64))))
+            texts = []
+            coords = []
+        _clear(element)
+    return pages
+
+
+def _read_figure(element: etree._Element) -> NxmlFigure:
+    name = etree.QName(element).localname
+    label = _find_first(element, 'label')
+    caption = _find_first(element, 'caption')
+    graphic = _find_first(element, 'graphic')
+    graphic_href = None
+    if graphic is not None:
+        graphic_href = graphic.get(XLINK_HREF)
+        if graphic_href is None:
+            graphic_href = graphic.get('href')
+    table_tokens = []
+    footer_tokens = []
+    if name == 'table-wrap':
+        table_tokens = [
+            token
+            for cell_name in ['th', 'td']
+            for cell in element.iter('{*}' + cell_name)
+            for token in _iter_child_tokens(cell)
+        ]
+        footer_tokens = [
+            token
+            for footer in element.iter('{*}table-wrap-foot')
+            for token in _get_text(footer).split()
+        ]
+    return NxmlFigure(
+        name=name,
+        label=None if label is None else _get_text(label),
+        caption=None if caption is None else _get_text(caption),
+        has_graphic=graphic is not None,
+        graphic_href=graphic_href,
+        table_tokens=table_tokens,
+        footer_tokens=footer_tokens)
+
+
+def parse_nxml_figures(source: Source) -> List[NxmlFigure]:
+    """Read the figures and tables of an .nxml file.
+
+    :param Source source: the path to the .nxml file, or a binary file
+      object.
+
+    :returns: the fig elements and then the table-wrap elements, each in
+      document order, including any nested in one another.
+    """
+    figures = {name: [] for name in FIGURE_TAGS}
+    # the document order of the figures being read, innermost last
+    open_figures = []
+    n_figures = 0
+    for (event, element) in etree.iterparse(
+            source, events=('start', 'end'), recover=True, huge_tree=True,
+            remove_comments=True, remove_pis=True):
+        name = etree.QName(element).localname
+        if event == 'start':
+            if name in FIGURE_TAGS:
+                open_figures.append(n_figures)
+                n_figures += 1
+            continue
+        if name in FIGURE_TAGS:
+            figures[name].append((open_figures.pop(), _read_figure(element)))
+        # The text of nested figures is part of the figures around them
+        if len(open_figures) == 0:
+            _clear(element)
+    return [
+        figure
+        for name in FIGURE_TAGS
+        for (_, figure) in sorted(figures[name], key=lambda x: x[0])
+    ]
@@ -34,6 +34,12 @@ DEFAULT_INFERENCE_DPI = 100
 DEFAULT_CROPPED_IMG_DPI = 200
 BACKGROUND_COLOR = 255
 
+# whether the extraction pipeline renders every page at
+# DEFAULT_CROPPED_IMG_DPI for cropping figures. Set it to False when
+# figures are rendered straight from the PDF instead (see
+# PDFRenderer.render_region and the region backend of cut_images.py)
+RENDER_CROPPED_PAGES = True
+
 # weights for the model
 TENSORBOX_MODEL = {
     'save_dir': os.path.join(BASE_DIR, 'weights/'),
@@ -47,6 +53,18 @@ PDFFIGURES_JAR_PATH = os.path.join(
     'bin/',
     PDFFIGURES_JAR_NAME)
 
+# filters from deepfigures.extraction.page_filter.FILTERS used to skip
+# inference on pages which cannot contain a figure
+PAGE_FILTERS = ['blank', 'captionless']
+
+# write result JSON without whitespace, using orjson if it's installed,
+# instead of indenting it for readability
+COMPACT_JSON_OUTPUT = False
+
+# how detection results are written, one of
+# deepfigures.extraction.result_io.PROFILES
+RESULT_PROFILE = 'full'
+
 # PDF Rendering backend settings
 DEEPFIGURES_PDF_RENDERER = 'deepfigures.extraction.renderers.GhostScriptRenderer'
 
@@ -7,36 +7,222 @@ import traitlets
 
 JsonData = typing.Union[list, dict, str, int, float]
 
+# Types which serialize to themselves.
+_JSON_SCALAR_TYPES = frozenset([str, int, float, bool, type(None)])
+
+# Trait types whose validated values are json scalars, with the type of
+# value each one stores unchanged.
+_SCALAR_TRAIT_TYPES = {
+    traitlets.Unicode: str,
+    traitlets.Int: int,
+    traitlets.Float: float,
+    traitlets.Bool: bool,
+}
+
+
+def _serialize(obj):
+    # Check the exact types of the most common values before falling
+    # back to isinstance, which also accepts subclasses.
+    obj_type = type(obj)
+    if obj_type in _JSON_SCALAR_TYPES:
+        return obj
+    elif obj_type is list:
+        return [_serialize(v) for v in obj]
+    elif obj_type is dict:
+        return _serialize_dict(obj, _serialize)
+    elif isinstance(obj, (JsonSerializable, JsonRecord)):
+        return obj.to_dict()
+    elif isinstance(obj, list):
+        return [_serialize(v) for v in obj]
+    elif isinstance(obj, dict):
+        return _serialize_dict(obj, _serialize)
+    else:
+        return obj
+
+
+def _serialize_dict(obj: dict, serialize_value: typing.Callable) -> dict:
+    res_dict = dict()
+    for (key, value) in obj.items():
+        assert type(key) == str
+        res_dict[key] = serialize_value(value)
+    return res_dict
+
+
+def _is_record_trait(trait: traitlets.TraitType) -> bool:
+    """Return True if trait holds a JsonSerializable or JsonRecord."""
+    return (
+        isinstance(trait, traitlets.Instance) and
+        isinstance(trait.klass, type) and
+        issubclass(trait.klass, (JsonSerializable, JsonRecord)))
+
+
+def _get_value_trait(trait: traitlets.Dict) -> typing.Optional[traitlets.TraitType]:
+    # traitlets 5 renamed Dict._trait to Dict._value_trait
+    return getattr(trait, '_value_trait', getattr(trait, '_trait', None))
+
+
+def _compile_serializer(
+        trait: typing.Optional[traitlets.TraitType]) -> typing.Optional[typing.Callable]:
+    """Return a function serializing the values of trait.
+
+    Returns None if values serialize to themselves. The functions give
+    the same result as JsonSerializable.serialize on any value the trait
+    accepts, but skip the type checks which the trait makes redundant.
+    """
+    if type(trait) in _SCALAR_TRAIT_TYPES:
+        return None
+    if _is_record_trait(trait):
+        return lambda v: None if v is None else v.to_dict()
+    if type(trait) is traitlets.List:
+        serialize_element = _compile_serializer(trait._trait)
+        if serialize_element is None:
+            return lambda v: None if v is None else list(v)
+        return lambda v: None if v is None else [serialize_element(e) for e in v]
+    if type(trait) is traitlets.Dict:
+        serialize_value = _compile_serializer(_get_value_trait(trait)) or (lambda v: v)
+        return lambda v: None if v is None else _serialize_dict(v, serialize_value)
+    return _serialize
+
+
+def _compile_deserializer(
+        trait: typing.Optional[traitlets.TraitType]) -> typing.Optional[typing.Callable]:
+    """Return a function deserializing json data for trait.
+
+    Returns None if the json data is used as is. See
+    JsonSerializable.deserialize.
+    """
+    if _is_record_trait(trait):
+        klass = trait.klass
+        return lambda data: None if data is None else klass.from_dict(data)
+    if isinstance(trait, traitlets.List):
+        deserialize_element = _compile_deserializer(trait._trait) or (lambda data: data)
+
+        def deserialize_list(data):
+            if data is None:
+                return None
+            assert isinstance(data, list)
+            return [deserialize_element(element) for element in data]
+        return deserialize_list
+    if isinstance(trait, traitlets.Dict):
+        # Assume all dictionary keys are strings
+        deserialize_value = _compile_deserializer(_get_value_trait(trait)) or (lambda data: data)
+
+        def deserialize_dict(data):
+            if data is None:
+                return None
+            assert isinstance(data, dict)
+            return _serialize_dict(data, deserialize_value)
+        return deserialize_dict
+    return None
+
+
+def _compile_validator(
+        trait: typing.Optional[traitlets.TraitType]) -> typing.Optional[typing.Callable]:
+    """Return a cheap test that a deserialized value needs no validation.
+
+    The test returns True only for values which trait would store
+    unchanged. Returns None if there is no such test for trait.
+    """
+    if trait is None or type(trait) is traitlets.Any:
+        return lambda v: True
+    allow_none = trait.allow_none
+    if type(trait) in _SCALAR_TRAIT_TYPES:
+        if getattr(trait, 'min', None) is not None or getattr(trait, 'max', None) is not None:
+            return None
+        value_type = _SCALAR_TRAIT_TYPES[type(trait)]
+        return lambda v: type(v) is value_type or (v is None and allow_none)
+    if _is_record_trait(trait):
+        klass = trait.klass
+        return lambda v: isinstance(v, klass) or (v is None and allow_none)
+    if type(trait) is traitlets.List:
+        is_valid_element = _compile_validator(trait._trait)
+        if is_valid_element is None:
+            return None
+        (minlen, maxlen) = (trait._minlen, trait._maxlen)
+        return lambda v: (
+            (v is None and allow_none) or
+            (type(v) is list and minlen <= len(v) <= maxlen and
+             all(is_valid_element(e) for e in v)))
+    if type(trait) is traitlets.Dict:
+        is_valid_value = _compile_validator(_get_value_trait(trait))
+        if is_valid_value is None or trait._key_trait is not None or trait._per_key_traits:
+            return None
+        return lambda v: (
+            (v is None and allow_none) or
+            (type(v) is dict and all(is_valid_value(e) for e in v.values())))
+    return None
+
+
+class _TraitCodec(object):
+    """The serializers and deserializers for one JsonSerializable class.
+
+    :ivar dict serializers: maps each trait name to a function
+      serializing its values, or to None for values serialized as is.
+    :ivar dict deserializers: the same for deserializing json data.
+    :ivar Optional[dict] validators: maps each trait name to a test that
+      a deserialized value would be stored unchanged by the trait. None
+      if instances of the class must always be built through __init__.
+    """
+
+    def __init__(self, cls: type) -> None:
+        traits = cls.class_traits()
+        self.serializers = {
+            k: _compile_serializer(trait) for (k, trait) in traits.items()
+        }
+        self.deserializers = {
+            k: _compile_deserializer(trait) for (k, trait) in traits.items()
+        }
+        self.validators = {
+            k: _compile_validator(trait) for (k, trait) in traits.items()
+        }
+        has_handlers = any(
+            isinstance(v, traitlets.traitlets.EventHandler)
+            for klass in cls.__mro__ for v in vars(klass).values())
+        if (None in self.validators.values() or has_handlers or
+                cls.__init__ is not traitlets.HasTraits.__init__):
+            self.validators = None
+
+
+_codecs = {}  # type: typing.Dict[type, _TraitCodec]
+
+
+def _get_codec(cls: type) -> _TraitCodec:
+    codec = _codecs.get(cls)
+    if codec is None:
+        codec = _codecs[cls] = _TraitCodec(cls)
+    return codec
+
 
 class JsonSerializable(traitlets.HasTraits):
     def to_dict(self) -> dict:
         """Recursively convert objects to dicts to allow json serialization."""
-        return {
-            JsonSerializable.serialize(k): JsonSerializable.serialize(v)
-            for (k, v) in self._trait_values.items()
-        }
+        serializers = _get_codec(type(self)).serializers
+        res_dict = dict()
+        for (k, v) in self._trait_values.items():
+            serialize = serializers.get(k, _serialize)
+            res_dict[k] = v if serialize is None else serialize(v)
+        return res_dict
 
     @staticmethod
-    def serialize(obj: typing.Union['JsonSerializable', JsonData]):
-        if isinstance(obj, JsonSerializable):
-            return obj.to_dict()
-        elif isinstance(obj, list):
-            return [JsonSerializable.serialize(v) for v in obj]
-        elif isinstance(obj, dict):
-            res_dict = dict()
-            for (key, value) in obj.items():
-                assert type(key) == str
-                res_dict[key] = JsonSerializable.serialize(value)
-            return res_dict
-        else:
-            return obj
+    def serialize(obj: typing.Union['JsonSerializable', 'JsonRecord', JsonData]):
+        return _serialize(obj)
 
     @classmethod
     def from_dict(cls, json_data: dict):
         assert (type(json_data) == dict)
+        codec = _get_codec(cls)
         args = {}
-        for (k, v) in cls.class_traits().items():
-            args[k] = JsonSerializable.deserialize(v, json_data[k])
+        for (k, deserialize) in codec.deserializers.items():
+            v = json_data[k]
+            args[k] = v if deserialize is None else deserialize(v)
+        validators = codec.validators
+        if validators is not None and all(
+                validators[k](v) for (k, v) in args.items()):
+            # Every value would be stored unchanged, so skip the
+            # validation and notifications of __init__.
+            obj = cls.__new__(cls)
+            obj._trait_values.update(args)
+            return obj
         return cls(**args)
 
     @staticmethod
@@ -45,25 +231,37 @@ class JsonSerializable(traitlets.HasTraits):
         N.B. Using this function on complex objects is not advised; prefer to use an explicit serialization scheme.
         """
         # Note: calling importlib.reload on this file breaks issubclass (http://stackoverflow.com/a/11461574/6174778)
-        if isinstance(target_trait, traitlets.Instance
-                     ) and issubclass(target_trait.klass, JsonSerializable):
-            return target_trait.klass.from_dict(json_data)
-        elif isinstance(target_trait, traitlets.List):
-            assert isinstance(json_data, list)
-            return [
-                JsonSerializable.deserialize(target_trait._trait, element) for element in json_data
-            ]
-        elif isinstance(target_trait, traitlets.Dict):
-            # Assume all dictionary keys are strings
-            assert isinstance(json_data, dict)
-            res_dict = dict()
-            for (key, value) in json_data.items():
-                assert type(key) == str
-                res_dict[key] = JsonSerializable.deserialize(target_trait._trait, value)
-            return res_dict
-        else:
+        deserialize = _compile_deserializer(target_trait)
+        if deserialize is None:
             return json_data
+        return deserialize(json_data)
 
     def __repr__(self):
         traits_list = ['%s=%s' % (k, repr(v)) for (k, v) in self._trait_values.items()]
         return type(self).__name__ + '(' + ', '.join(traits_list) + ')'
+
+
+class JsonRecord(object):
+    """A lightweight alternative to JsonSerializable for simple records.
+
+    Subclasses list their fields in __slots__ and set them in __init__.
+    Records skip the validation and bookkeeping of traitlets, which
+    makes them much cheaper to create in bulk, and serialize to the same
+    JSON as the equivalent JsonSerializable.
+    """
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        return {
+            k: _serialize(getattr(self, k))
+            for k in self.__slots__
+        }
+
+    @classmethod
+    def from_dict(cls, json_data: dict):
+        assert (type(json_data) == dict)
+        return cls(**{k: json_data[k] for k in cls.__slots__})
+
+    def __repr__(self):
+        fields_list = ['%s=%s' % (k, repr(getattr(self, k))) for k in self.__slots__]
+        return type(self).__name__ + '(' + ', '.join(fields_list) + ')'
@@ -12,11 +12,17 @@ import tempfile
 import hashlib
 import subprocess
 from os.path import abspath, dirname, join
+import gzip
 from gzip import GzipFile
 
 import arrow
 import boto3
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 ROOT = abspath(dirname(dirname(dirname(__file__))))
 
 
@@ -343,27 +349,67 @@ def slurp(filename, mode='r', encoding=None):
 
 def read_json(filename):
     """Read  JSON from `filename`."""
-    with open(_expand(filename), 'rt') as f:
-        return json.load(f)
+    with open(_expand(filename), 'rb') as f:
+        data = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, which the json module accepts
+            pass
+    return json.loads(data)
+
+
+def dumps_json(obj, indent=None, sort_keys=None, compact=False) -> bytes:
+    """Encode `obj` as UTF-8 JSON.
 
+    By default the output is exactly that of `json.dump`. If `compact` is
+    true, `indent` is ignored and the JSON is written without whitespace
+    or escaping of non-ASCII characters, using orjson when it is
+    installed. orjson is several times faster than the json module but
+    writes NaN and infinite floats as null; objects it cannot encode,
+    such as integers wider than 64 bits, fall back to the json module.
+    """
+    if compact:
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                return orjson.dumps(obj, option=option)
+            except orjson.JSONEncodeError:
+                pass
+        return json.dumps(
+            obj, separators=(',', ':'), sort_keys=bool(sort_keys),
+            ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys).encode('utf-8')
+
+
+def write_json(filename, obj, indent=None, sort_keys=None, compact=False):
+    """Write JSON to `filename`, see `dumps_json`."""
+    data = dumps_json(obj, indent=indent, sort_keys=sort_keys, compact=compact)
+    with open(_expand(filename), 'wb') as f:
+        f.write(data)
 
-def write_json(filename, obj, indent=None, sort_keys=None):
-    """Write JSON to `filename`"""
-    with open(_expand(filename), 'w') as f:
-        json.dump(obj, f, indent=indent, sort_keys=sort_keys)
 
+def write_json_atomic(filename, obj, indent=None, sort_keys=None, compact=False):
+    """Write JSON to `filename` such that `filename` never exists in a partially written state.
 
-def write_json_atomic(filename, obj, indent=None, sort_keys=None):
-    """Write JSON to `filename` such that `filename` never exists in a partially written state."""
+    As with `open`, the JSON is gzipped if `filename` ends in .gz.
+    """
     filename = _expand(filename)
     if filename.startswith('s3://'):
         write_json(
-            filename, obj, indent, sort_keys
+            filename, obj, indent, sort_keys, compact
         )  # s3 operations are already atomic
+        return
+    data = dumps_json(obj, indent=indent, sort_keys=sort_keys, compact=compact)
+    if filename.endswith('.gz'):
+        data = gzip.compress(data, compresslevel=6)
     with tempfile.NamedTemporaryFile(
-        'w', dir=os.path.dirname(filename), delete=False
+        'wb', dir=os.path.dirname(filename), delete=False
     ) as f:
-        json.dump(obj, f, indent=indent, sort_keys=sort_keys)
+        f.write(data)
         tempname = f.name
     os.rename(tempname, filename)
 
@@ -508,20 +554,91 @@ def copy(src: str, dst: str) -> None:
             dst_f.write(chunk)
 
 
-def extract_tarfile_from_bytes(b: bytes, dst: str, mode='r') -> None:
+TarMemberFilter = typing.Callable[[tarfile.TarInfo], bool]
+
+
+def suffix_filter(*suffixes: str, exclude: bool=False) -> TarMemberFilter:
+    """Return a member filter for `extract_tarfile` which keeps the
+    regular files whose names end in one of `suffixes`, ignoring case.
+
+    If `exclude`, the filter instead keeps every member but those files.
+    """
+    suffixes = tuple(suffix.lower() for suffix in suffixes)
+
+    def _filter(member: tarfile.TarInfo) -> bool:
+        matches = member.isfile() and member.name.lower().endswith(suffixes)
+        return matches != exclude
+
+    return _filter
+
+
+def _extract_members(
+    t: tarfile.TarFile,
+    dst: str,
+    member_filter: typing.Optional[TarMemberFilter]=None,
+    max_member_size: typing.Optional[int]=None
+) -> typing.List[str]:
+    extracted = []
+    for member in t:
+        # A streamed TarFile remembers every member it has read, which
+        # would grow with the archive
+        t.members = []
+        if member_filter is not None and not member_filter(member):
+            continue
+        if max_member_size is not None and member.size > max_member_size:
+            logging.info(
+                'Skipping %s of %d bytes' % (member.name, member.size))
+            continue
+        t.extract(member, path=dst)
+        extracted.append(member.name)
+    return extracted
+
+
+def extract_tarfile_from_bytes(
+    b: bytes,
+    dst: str,
+    mode='r',
+    member_filter: typing.Optional[TarMemberFilter]=None,
+    max_member_size: typing.Optional[int]=None
+) -> typing.List[str]:
+    """Extract the tarfile in `b` to `dst`, see `extract_tarfile`."""
     seekable_f = io.BytesIO(b)
     safe_makedirs(os.path.dirname(dst))
     with tarfile.open(fileobj=seekable_f, mode=mode) as t:
-        t.extractall(path=dst)
-
-
-def extract_tarfile(src: str, dst: str, streaming=True) -> None:
-    """Extract a tarfile at 'src' to 'dst'."""
+        return _extract_members(t, dst, member_filter, max_member_size)
+
+
+def extract_tarfile(
+    src: str,
+    dst: str,
+    streaming=True,
+    member_filter: typing.Optional[TarMemberFilter]=None,
+    max_member_size: typing.Optional[int]=None
+) -> typing.List[str]:
+    """Extract a tarfile at 'src' to 'dst'.
+
+    The archive is read as a stream, one member at a time, so memory use
+    does not grow with its size. Compressed archives are detected
+    automatically.
+
+    :param str src: the path to the tarfile.
+    :param str dst: the directory to extract into.
+    :param bool streaming: whether to stream the tarfile from S3 rather
+      than copying it to the local cache first.
+    :param Optional[TarMemberFilter] member_filter: if given, only the
+      members for which it returns True are extracted, see
+      `suffix_filter`.
+    :param Optional[int] max_member_size: if given, members larger than
+      this many bytes are skipped.
+
+    :returns: the names of the extracted members.
+    """
     src = _expand(src)
     dst = _expand(dst)
-    with open(src, mode='rb', streaming=streaming) as f:
-        b = f.read()
-    extract_tarfile_from_bytes(b, dst)
+    safe_makedirs(os.path.dirname(dst))
+    with open(src, mode='rb', streaming=streaming) as f, \
+            tarfile.open(fileobj=f, mode='r|*') as t:
+        return _extract_members(t, dst, member_filter, max_member_size)
 
 
 def compute_sha1(filename: str, buf_size=int(1e6)) -> str:
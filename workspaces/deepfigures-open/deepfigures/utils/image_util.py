@@ -1,8 +1,9 @@
 import os
 import typing
+import cv2
 import numpy as np
-from scipy import misc
-from deepfigures.utils import file_util
+from PIL import Image
+from deepfigures.utils import file_util, image_ops
 import logging
 
 class FileTooLargeError(Exception):
@@ -21,7 +22,8 @@ def read_tensor(path: str, maxsize: int=None) -> typing.Optional[np.ndarray]:
     (_, ext) = os.path.splitext(path)
     ext = ext.lower()
     if ext in {'.png', '.jpg', '.jpeg'}:
-        res = misc.imread(path, mode='RGB')
+        with Image.open(path) as im:
+            res = np.asarray(im.convert('RGB'))
         assert len(res.shape) == 3
         assert res.shape[2] == 3
         return res
@@ -47,16 +49,102 @@ def write_tensor(dst: str, value: np.ndarray) -> None:
 
 def imresize_multichannel(im: np.ndarray, target_size: typing.Tuple[int, int],
                           **kwargs) -> np.ndarray:
-    n_channels = im.shape[2]
-    resized_channels = [
-        misc.imresize(im[:, :, n], target_size, **kwargs) for n in range(n_channels)
-    ]
-    return np.stack(resized_channels, axis=2)
+    """Resize all channels of im at once, see image_ops.resize for kwargs."""
+    return image_ops.resize(im, target_size, **kwargs)
 
 
 def imrescale_multichannel(im: np.ndarray, scale_factor: float, **kwargs) -> np.ndarray:
-    n_channels = im.shape[2]
-    resized_channels = [
-        misc.imresize(im[:, :, n], scale_factor, **kwargs) for n in range(n_channels)
-    ]
-    return np.stack(resized_channels, axis=2)
+    """Rescale all channels of im at once, see image_ops.rescale for kwargs."""
+    return image_ops.rescale(im, scale_factor, **kwargs)
+
+
+def _slice_bounds(start: int, stop: int, length: int) -> typing.Tuple[int, int]:
+    """Return the bounds of seq[start:stop] for a sequence of length."""
+    (start, stop, _) = slice(start, stop).indices(length)
+    return (start, stop)
+
+
+def _ink_mask(im: np.ndarray, background_color: int) -> np.ndarray:
+    """Return the mask of pixels which differ from the background."""
+    # Much faster than (im != background_color).any(axis=2), which reduces
+    # over the short, innermost axis.
+    ink = im[:, :, 0] != background_color
+    for channel in range(1, im.shape[2]):
+        ink |= im[:, :, channel] != background_color
+    return ink
+
+
+def ink_extent(
+        im: np.ndarray,
+        box: typing.Tuple[int, int, int, int],
+        background_color: int) -> typing.Optional[typing.Tuple[int, int, int, int]]:
+    """Return the bounding box of the non-background pixels of im[box].
+
+    :param np.ndarray im: an HWC image.
+    :param Tuple[int, int, int, int] box: the region (x1, y1, x2, y2) to
+      search. The bounds are interpreted as python slice bounds, so
+      negative values count from the end of the image.
+    :param int background_color: the value of background pixels in every
+      channel.
+
+    :returns: the smallest (x1, y1, x2, y2) in page coordinates containing
+      every non-background pixel of the region, or None if there are none.
+    """
+    (height, width) = im.shape[:2]
+    (x1, x2) = _slice_bounds(box[0], box[2], width)
+    (y1, y2) = _slice_bounds(box[1], box[3], height)
+    ink = _ink_mask(im[y1:y2, x1:x2], background_color)
+    ink_columns = np.flatnonzero(ink.any(axis=0))
+    if len(ink_columns) == 0:
+        return None
+    ink_rows = np.flatnonzero(ink.any(axis=1))
+    return (
+        x1 + int(ink_columns[0]), y1 + int(ink_rows[0]),
+        x1 + int(ink_columns[-1]) + 1, y1 + int(ink_rows[-1]) + 1)
+
+
+class InkIndex(object):
+    """A summed area table of the non-background pixels of an image.
+
+    Building the index costs about as much as one call to ink_extent over
+    the whole image. Afterwards, finding the extent of the ink in any box
+    only takes time proportional to the box's perimeter.
+
+    :param np.ndarray im: an HWC image.
+    :param int background_color: the value of background pixels in every
+      channel.
+    """
+
+    def __init__(self, im: np.ndarray, background_color: int) -> None:
+        ink = _ink_mask(im, background_color)
+        (height, width) = ink.shape
+        # Doubles count exactly past the range of 32 bit ints
+        depth = cv2.CV_32S if height * width < 2 ** 31 else cv2.CV_64F
+        # table[y, x] holds the number of ink pixels in im[:y, :x]
+        self.table = cv2.integral(ink.view(np.uint8), sdepth=depth)
+
+    @property
+    def shape(self) -> typing.Tuple[int, int]:
+        (height, width) = self.table.shape
+        return (height - 1, width - 1)
+
+    def ink_extent(
+            self,
+            box: typing.Tuple[int, int, int, int]
+    ) -> typing.Optional[typing.Tuple[int, int, int, int]]:
+        """Return the same result as ink_extent on the indexed image."""
+        (height, width) = self.shape
+        (x1, x2) = _slice_bounds(box[0], box[2], width)
+        (y1, y2) = _slice_bounds(box[1], box[3], height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        # Cumulative ink counts in the box, up to each column and row.
+        columns = self.table[y2, x1:x2 + 1] - self.table[y1, x1:x2 + 1]
+        if columns[-1] == columns[0]:
+            return None
+        rows = self.table[y1:y2 + 1, x2] - self.table[y1:y2 + 1, x1]
+        return (
+            x1 + int(np.searchsorted(columns, columns[0], side='right')) - 1,
+            y1 + int(np.searchsorted(rows, rows[0], side='right')) - 1,
+            x1 + int(np.searchsorted(columns, columns[-1], side='left')),
+            y1 + int(np.searchsorted(rows, rows[-1], side='left')))
@@ -1,4 +1,13 @@
-from _stringmatch import lib
+import collections
+from typing import List, Optional, Sequence
+
+from _stringmatch import ffi, lib
+
+
+INT_MAX = 2 ** 31 - 1
+
+MatchResult = collections.namedtuple(
+    'MatchResult', ['start_pos', 'end_pos', 'cost'])
 
 
 def match(key: str, text: str):
@@ -7,3 +16,26 @@ def match(key: str, text: str):
     minimum edit distance (Levenshtein) to key.
     '''
     return lib.match(key, text)
+
+
+def match_many(
+        keys: Sequence[str], text: str, max_cost: Optional[int]=None
+) -> List[MatchResult]:
+    '''
+    Match each of keys against text, as match does, in a single call.
+
+    The matching runs without holding the GIL, so several texts can be
+    matched from different threads at once. If max_cost is given, the
+    start of matches costing more than it is not searched for and their
+    start_pos is -1; a max_cost of -1 finds only the cost and end of
+    every match, which takes a fraction of the time.
+    '''
+    key_buffers = [ffi.new('wchar_t[]', key) for key in keys]
+    results = ffi.new('MatchResult[]', len(keys))
+    lib.match_many(
+        ffi.new('wchar_t*[]', key_buffers), len(keys), text,
+        INT_MAX if max_cost is None else max_cost, results)
+    return [
+        MatchResult(result.start_pos, result.end_pos, result.cost)
+        for result in results
+    ]
@@ -1,5 +1,9 @@
 #include <stdlib.h>
+#include <stdint.h>
 #include <limits.h>
+#include <wchar.h>
+#include <algorithm>
+#include <vector>
 
 /* start_pos is inclusive, end_pos is exclusive. */
 struct MatchResult {
@@ -22,7 +26,7 @@ class IntMatrix {
     }
 
     ~IntMatrix() {
-      delete data;
+      delete[] data;
     }
 
     int* operator[](const int x) {
@@ -38,10 +42,8 @@ class IntMatrix {
  * (Levenshtein) to key. Given a key of length n and text of length m, we can
  * do this in O(n*m) time using dynamic programming.
  */
-MatchResult match(const wchar_t* key, const wchar_t* text) {
-  const int key_len = wcslen(key);
-  const int text_len = wcslen(text);
-
+static MatchResult match_dp(const wchar_t* key, const int key_len,
+                            const wchar_t* text, const int text_len) {
   MatchResult res;
 
   IntMatrix distance = IntMatrix(key_len+1, text_len+1);
@@ -98,3 +100,158 @@ MatchResult match(const wchar_t* key, const wchar_t* text) {
   res.cost = best_dist;
   return res;
 }
+
+
+typedef uint64_t Word;
+static const int WORD_SIZE = 64;
+static const Word HIGH_BIT = (Word)1 << (WORD_SIZE - 1);
+static const int ASCII_SIZE = 128;
+
+
+/*
+ * Find the cost and the first end position of the best match of key in text
+ * with Myers' bit-parallel algorithm, in O(m*ceil(n/64)) time.
+ *
+ * Each column of the dynamic programming matrix is kept as bit vectors of the
+ * vertical differences between its rows, split into blocks of 64 rows. The
+ * cost of the last row is tracked from the horizontal differences.
+ */
+static void match_cost(const wchar_t* key, const int key_len,
+                       const wchar_t* text, const int text_len,
+                       int* best_cost, int* best_end_pos) {
+  const int num_blocks = (key_len + WORD_SIZE - 1) / WORD_SIZE;
+  const int last_row_bit = (key_len - 1) % WORD_SIZE;
+
+  // The key's distinct characters, the last row of peq being for the others
+  std::vector<wchar_t> alphabet(key, key + key_len);
+  std::sort(alphabet.begin(), alphabet.end());
+  alphabet.erase(std::unique(alphabet.begin(), alphabet.end()), alphabet.end());
+  const int num_chars = alphabet.size();
+  int ascii_idx[ASCII_SIZE];
+  for (int c = 0; c < ASCII_SIZE; c++) {
+    ascii_idx[c] = num_chars;
+  }
+  for (int i = 0; i < num_chars; i++) {
+    if (alphabet[i] >= 0 && alphabet[i] < ASCII_SIZE) {
+      ascii_idx[alphabet[i]] = i;
+    }
+  }
+
+  // peq[c][block] has the bits set for the rows whose key character is c
+  std::vector<Word> peq((num_chars + 1) * num_blocks, 0);
+  for (int key_idx = 0; key_idx < key_len; key_idx++) {
+    int c = std::lower_bound(alphabet.begin(), alphabet.end(), key[key_idx]) -
+      alphabet.begin();
+    peq[c * num_blocks + key_idx / WORD_SIZE] |= (Word)1 << (key_idx % WORD_SIZE);
+  }
+
+  // The first column is 0, 1, ..., key_len
+  std::vector<Word> pv(num_blocks, ~(Word)0);
+  std::vector<Word> mv(num_blocks, 0);
+  int cost = key_len;
+
+  *best_cost = INT_MAX;
+  *best_end_pos = 0;
+  for (int text_idx = 0; text_idx < text_len; text_idx++) {
+    const wchar_t ch = text[text_idx];
+    int c;
+    if (ch >= 0 && ch < ASCII_SIZE) {
+      c = ascii_idx[ch];
+    } else {
+      c = std::lower_bound(alphabet.begin(), alphabet.end(), ch) -
+        alphabet.begin();
+      if (c == num_chars || alphabet[c] != ch) {
+        c = num_chars;
+      }
+    }
+    const Word* eq_blocks = &peq[c * num_blocks];
+    // The first row is 0 everywhere since the match may start anywhere
+    int hin = 0;
+    for (int block = 0; block < num_blocks; block++) {
+      const Word pv_in = pv[block];
+      const Word mv_in = mv[block];
+      Word eq = eq_blocks[block];
+      const Word xv = eq | mv_in;
+      if (hin < 0) {
+        eq |= 1;
+      }
+      const Word xh = (((eq & pv_in) + pv_in) ^ pv_in) | eq;
+      Word ph = mv_in | ~(xh | pv_in);
+      Word mh = pv_in & xh;
+      if (block == num_blocks - 1) {
+        cost += (int)((ph >> last_row_bit) & 1) - (int)((mh >> last_row_bit) & 1);
+      }
+      const int hout = (ph & HIGH_BIT) ? 1 : ((mh & HIGH_BIT) ? -1 : 0);
+      ph <<= 1;
+      mh <<= 1;
+      if (hin < 0) {
+        mh |= 1;
+      } else if (hin > 0) {
+        ph |= 1;
+      }
+      pv[block] = mh | ~(xv | ph);
+      mv[block] = ph & xv;
+      hin = hout;
+    }
+    if (cost < *best_cost) {
+      *best_cost = cost;
+      *best_end_pos = text_idx + 1;
+      if (cost == 0) {
+        // Later matches can only tie
+        break;
+      }
+    }
+  }
+}
+
+
+/*
+ * Find the best match of key in text, as match_dp does, but in
+ * O(m*ceil(n/64) + n*(2n+cost)) time.
+ *
+ * match_cost finds the cost and end of the match. A match of that cost
+ * covers at most key_len + cost characters, so match_dp is then only run on
+ * the text just before the end to find where the match starts. Restricting
+ * the text can only raise the distances of cells off the best match's path
+ * and leaves those on it unchanged, so match_dp breaks ties the same way.
+ *
+ * If the best match costs more than max_cost, its start is not searched for
+ * and start_pos is -1.
+ */
+static MatchResult match_bounded(const wchar_t* key, const int key_len,
+                                 const wchar_t* text, const int text_len,
+                                 const int max_cost) {
+  if (key_len == 0 || text_len == 0) {
+    return match_dp(key, key_len, text, text_len);
+  }
+  MatchResult res;
+  match_cost(key, key_len, text, text_len, &res.cost, &res.end_pos);
+  if (res.cost > max_cost) {
+    res.start_pos = -1;
+    return res;
+  }
+  const int window_start = std::max(0, res.end_pos - key_len - res.cost);
+  MatchResult window_res = match_dp(
+    key, key_len, text + window_start, res.end_pos - window_start);
+  res.start_pos = window_res.start_pos + window_start;
+  return res;
+}
+
+
+MatchResult match(const wchar_t* key, const wchar_t* text) {
+  return match_bounded(key, wcslen(key), text, wcslen(text), INT_MAX);
+}
+
+
+/*
+ * Match each of num_keys keys against the same text, writing the results to
+ * results. See match_bounded for max_cost.
+ */
+void match_many(const wchar_t** keys, const int num_keys, const wchar_t* text,
+                const int max_cost, MatchResult* results) {
+  const int text_len = wcslen(text);
+  for (int key_idx = 0; key_idx < num_keys; key_idx++) {
+    results[key_idx] = match_bounded(
+      keys[key_idx], wcslen(keys[key_idx]), text, text_len, max_cost);
+  }
+}
@@ -17,6 +17,8 @@ typedef struct {
     int cost;
 } MatchResult;
 MatchResult match(const wchar_t* a, const wchar_t* b);
+void match_many(const wchar_t** keys, const int num_keys, const wchar_t* text,
+                const int max_cost, MatchResult* results);
 ''')
 
 if __name__ == '__main__':
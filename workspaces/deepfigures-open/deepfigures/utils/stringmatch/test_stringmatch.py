@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from deepfigures.utils.stringmatch import match
+from deepfigures.utils.stringmatch import match, match_many
 
 
 def test_match():
@@ -49,6 +49,43 @@ def test_unicode_match():
     assert m.end_pos == 7
 
 
+def test_long_key_match():
+    # Keys longer than 64 characters span several bit vector blocks
+    key = 'abcdefghij' * 15
+    text = 'xyz' + key[:70] + 'q' + key[71:] + 'xyz'
+    m = match(key, text)
+    assert m.cost == 1
+    assert m.start_pos == 3
+    assert m.end_pos == 153
+
+    m = match(key, 'zz' + key[:100])
+    assert m.cost == 50
+    assert m.start_pos == 2
+    assert m.end_pos == 102
+
+
+def test_match_many():
+    keys = ['hello', 'e', 'bab', 'ab', '', 'こんにちは世界']
+    for text in ['hello', 'cac', 'ba', 'こんばんは世界', '']:
+        results = match_many(keys, text)
+        assert len(results) == len(keys)
+        for key, result in zip(keys, results):
+            m = match(key, text)
+            assert (result.start_pos, result.end_pos, result.cost) == \
+                (m.start_pos, m.end_pos, m.cost)
+    assert match_many([], 'hello') == []
+
+
+def test_match_many_max_cost():
+    results = match_many(['hello', 'help', 'world'], 'say hello', max_cost=1)
+    assert [tuple(result) for result in results] == \
+        [(4, 9, 0), (4, 7, 1), (-1, 7, 4)]
+
+    # A max_cost of -1 finds only costs and end positions
+    results = match_many(['hello', 'help'], 'say hello', max_cost=-1)
+    assert [tuple(result) for result in results] == [(-1, 9, 0), (-1, 7, 1)]
+
+
 if __name__ == '__main__':
     import pytest
 
@@ -0,0 +1,134 @@
+"""Tests for deepfigures.utils.config and JSON reading and writing."""
+
+import json
+import os
+import tempfile
+import unittest
+
+import traitlets
+
+from deepfigures.extraction.datamodels import (
+    BoxClass,
+    CaptionOnly,
+    Figure,
+    PdfDetectionResult)
+from deepfigures.utils import config, file_util
+
+
+class HandledRecord(config.JsonSerializable):
+    value = traitlets.Int()
+
+    @traitlets.validate('value')
+    def _validate_value(self, proposal):
+        return abs(proposal['value'])
+
+
+def make_result():
+    figures = [
+        Figure(
+            figure_boundary=BoxClass(x1=10, y1=20.5, x2=300, y2=400),
+            caption_boundary=BoxClass(x1=10, y1=410, x2=300, y2=430),
+            caption_text='Figure {}: café résumé.'.format(i),
+            name=str(i),
+            page=i,
+            figure_type='Figure',
+            dpi=100)
+        for i in range(3)
+    ]
+    return PdfDetectionResult(
+        pdf='/work/paper.pdf',
+        figures=figures,
+        dpi=100,
+        raw_detected_boxes=[[BoxClass(x1=1, y1=2, x2=3, y2=4)], []],
+        raw_pdffigures_output={
+            'figures': [{'name': '1', 'page': 0, 'imageText': ['a', 'b']}],
+            'regionless-captions': [],
+        },
+        error=None)
+
+
+class TestJsonSerializable(unittest.TestCase):
+    """Test deepfigures.utils.config.JsonSerializable."""
+
+    def test_round_trip(self):
+        """Test from_dict inverts to_dict, including nested dict traits."""
+        result_dict = make_result().to_dict()
+        result = PdfDetectionResult.from_dict(json.loads(json.dumps(result_dict)))
+        self.assertEqual(result.to_dict(), result_dict)
+        self.assertIsInstance(result.figures[0], Figure)
+        self.assertIsInstance(result.figures[0].figure_boundary, BoxClass)
+        self.assertIsInstance(result.raw_detected_boxes[0][0], BoxClass)
+
+    def test_round_trip_none(self):
+        """Test traits allowing None round trip when they are None."""
+        result_dict = PdfDetectionResult(
+            pdf='/work/paper.pdf', figures=[], dpi=100,
+            raw_detected_boxes=None, raw_pdffigures_output=None,
+            error='pdffigures failed').to_dict()
+        self.assertEqual(
+            PdfDetectionResult.from_dict(result_dict).to_dict(), result_dict)
+
+    def test_to_dict_keeps_only_set_traits(self):
+        """Test to_dict only includes traits which have values."""
+        self.assertEqual(
+            sorted(CaptionOnly(name='1').to_dict()),
+            ['caption_text', 'dpi', 'figure_type', 'name', 'page'])
+
+    def test_from_dict_validates(self):
+        """Test from_dict validates and casts values like __init__."""
+        figure_dict = make_result().figures[0].to_dict()
+        figure_dict['page'] = 'one'
+        with self.assertRaises(traitlets.TraitError):
+            Figure.from_dict(figure_dict)
+        figure_dict['page'] = 1
+        figure_dict['caption_text'] = b'Figure 1.'
+        self.assertEqual(Figure.from_dict(figure_dict).caption_text, 'Figure 1.')
+
+    def test_from_dict_runs_handlers(self):
+        """Test from_dict runs the validators of classes which have them."""
+        self.assertEqual(HandledRecord.from_dict({'value': -3}).value, 3)
+
+    def test_serialize(self):
+        """Test serialize converts records nested in lists and dicts."""
+        box = BoxClass(x1=1, y1=2, x2=3, y2=4)
+        self.assertEqual(
+            config.JsonSerializable.serialize({'a': [box, None, 1.5]}),
+            {'a': [box.to_dict(), None, 1.5]})
+
+
+class TestWriteJson(unittest.TestCase):
+    """Test deepfigures.utils.file_util.write_json_atomic."""
+
+    def setUp(self):
+        self.result_dict = make_result().to_dict()
+        self.path = os.path.join(tempfile.mkdtemp(), 'result.json')
+
+    def test_pretty(self):
+        """Test the default output matches json.dump."""
+        file_util.write_json_atomic(
+            self.path, self.result_dict, indent=2, sort_keys=True)
+        with open(self.path) as f:
+            self.assertEqual(
+                f.read(),
+                json.dumps(self.result_dict, indent=2, sort_keys=True))
+
+    def test_compact(self):
+        """Test compact output has no whitespace and reads back the same."""
+        file_util.write_json_atomic(
+            self.path, self.result_dict, indent=2, sort_keys=True,
+            compact=True)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        self.assertNotIn(b'\n', data)
+        self.assertNotIn(b', ', data)
+        self.assertEqual(file_util.read_json(self.path), self.result_dict)
+        self.assertEqual(
+            PdfDetectionResult.from_dict(
+                file_util.read_json(self.path)).to_dict(),
+            self.result_dict)
+
+    def test_compact_fallback(self):
+        """Test compact output of values orjson can't encode."""
+        obj = {'big': 2 ** 70, 'text': 'café'}
+        file_util.write_json_atomic(self.path, obj, compact=True)
+        self.assertEqual(file_util.read_json(self.path), obj)
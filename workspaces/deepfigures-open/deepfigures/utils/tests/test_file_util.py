@@ -0,0 +1,100 @@
+"""Test deepfigures.utils.file_util."""
+
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+
+from deepfigures.utils import file_util
+
+
+def _make_tar(members, mode='w:gz'):
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode=mode) as t:
+        for (name, data) in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    return f.getvalue()
+
+
+class TestExtractTarfile(unittest.TestCase):
+    """Test deepfigures.utils.file_util.extract_tarfile."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+        self.members = [
+            ('paper/paper.pdf', b'%PDF-1.4'),
+            ('paper/paper.nxml', b'<article/>'),
+            ('paper/F1.JPG', b'\xff\xd8' * 8),
+            ('paper/movie.avi', b'\x00' * 64)
+        ]
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _extract(self, tar_bytes, **kwargs):
+        src = os.path.join(self.tmpdir, 'src.tar')
+        with open(src, 'wb') as f:
+            f.write(tar_bytes)
+        dst = os.path.join(self.tmpdir, 'dst/')
+        return dst, file_util.extract_tarfile(src, dst, **kwargs)
+
+    def test_extract_all(self):
+        """Test every member is extracted by default."""
+        dst, extracted = self._extract(_make_tar(self.members))
+        self.assertEqual(extracted, [name for (name, _) in self.members])
+        for (name, data) in self.members:
+            with open(os.path.join(dst, name), 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def test_uncompressed(self):
+        """Test uncompressed tarfiles are detected."""
+        dst, extracted = self._extract(_make_tar(self.members, mode='w'))
+        self.assertEqual(len(extracted), len(self.members))
+
+    def test_member_filter(self):
+        """Test only the members passing the filter are extracted."""
+        dst, extracted = self._extract(
+            _make_tar(self.members),
+            member_filter=file_util.suffix_filter('.pdf', '.jpg'))
+        self.assertEqual(extracted, ['paper/paper.pdf', 'paper/F1.JPG'])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(dst, 'paper'))),
+            ['F1.JPG', 'paper.pdf'])
+
+    def test_exclude_filter(self):
+        """Test members matching an exclude filter are skipped."""
+        dst, extracted = self._extract(
+            _make_tar(self.members),
+            member_filter=file_util.suffix_filter('.avi', exclude=True))
+        self.assertEqual(
+            extracted, ['paper/paper.pdf', 'paper/paper.nxml', 'paper/F1.JPG'])
+        self.assertFalse(
+            os.path.exists(os.path.join(dst, 'paper/movie.avi')))
+
+    def test_members_not_kept(self):
+        """Test skipped and extracted members are not kept in memory."""
+        f = io.BytesIO(_make_tar(self.members, mode='w'))
+        with tarfile.open(fileobj=f, mode='r|') as t:
+            extracted = file_util._extract_members(
+                t, self.tmpdir, member_filter=file_util.suffix_filter('.pdf'))
+            self.assertEqual(extracted, ['paper/paper.pdf'])
+            self.assertEqual(t.members, [])
+
+    def test_max_member_size(self):
+        """Test members larger than max_member_size are skipped."""
+        dst, extracted = self._extract(
+            _make_tar(self.members), max_member_size=16)
+        self.assertEqual(
+            extracted, ['paper/paper.pdf', 'paper/paper.nxml', 'paper/F1.JPG'])
+        self.assertFalse(
+            os.path.exists(os.path.join(dst, 'paper/movie.avi')))
+
+    def test_not_a_tarfile(self):
+        """Test a gzipped file which is not a tarfile raises ReadError."""
+        with self.assertRaises(tarfile.ReadError):
+            self._extract(gzip.compress(b'\\documentclass{article}\n' * 40))
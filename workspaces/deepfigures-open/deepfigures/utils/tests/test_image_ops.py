@@ -0,0 +1,88 @@
+"""Test deepfigures.utils.image_ops."""
+
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from deepfigures.utils import image_ops
+
+
+def resize_per_channel(im, target_size, interp):
+    """Resize each channel separately, as scipy.misc.imresize did."""
+    size = (target_size[1], target_size[0])
+    return np.stack([
+        np.asarray(Image.fromarray(im[:, :, n]).resize(
+            size, resample=image_ops.PIL_INTERPOLATIONS[interp]))
+        for n in range(im.shape[2])
+    ], axis=2)
+
+
+class TestResize(unittest.TestCase):
+    """Test deepfigures.utils.image_ops.resize."""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.im = rng.randint(0, 256, size=(110, 85, 4), dtype=np.uint8)
+
+    def test_pil_matches_per_channel_resize(self):
+        """Test the pil backend matches resizing channel by channel."""
+        for n_channels in [1, 2, 3, 4]:
+            im = self.im[:, :, :n_channels]
+            for interp in ['nearest', 'bilinear', 'cubic', 'lanczos']:
+                for target_size in [(64, 48), (220, 170)]:
+                    np.testing.assert_array_equal(
+                        image_ops.resize(im, target_size, interp=interp),
+                        resize_per_channel(im, target_size, interp))
+
+    def test_cv2_close_to_pil(self):
+        """Test the cv2 backend nearly matches the pil backend."""
+        # Upsample a smooth image, where the backends should nearly agree.
+        im = np.linspace(0, 255, 30 * 20 * 4).reshape((30, 20, 4)).astype(np.uint8)
+        pil_im = image_ops.resize(im, (60, 40), backend='pil')
+        cv2_im = image_ops.resize(im, (60, 40), backend='cv2')
+        self.assertEqual(cv2_im.shape, (60, 40, 4))
+        self.assertLessEqual(
+            np.abs(pil_im.astype(int) - cv2_im.astype(int)).max(), 16)
+
+    def test_cv2_keeps_single_channel(self):
+        """Test the cv2 backend keeps a trailing singleton channel."""
+        im = self.im[:, :, :1]
+        self.assertEqual(
+            image_ops.resize(im, (20, 10), backend='cv2').shape, (20, 10, 1))
+
+    def test_invalid_arguments(self):
+        """Test resize rejects unknown backends, interps and dtypes."""
+        with self.assertRaises(ValueError):
+            image_ops.resize(self.im, (10, 10), backend='skimage')
+        with self.assertRaises(ValueError):
+            image_ops.resize(self.im, (10, 10), interp='spline')
+        with self.assertRaises(ValueError):
+            image_ops.resize(self.im.astype(np.float32), (10, 10))
+
+
+class TestRescale(unittest.TestCase):
+    """Test deepfigures.utils.image_ops.rescale."""
+
+    def test_rescale(self):
+        """Test rescale truncates the output size."""
+        im = np.zeros((101, 99, 3), dtype=np.uint8)
+        self.assertEqual(image_ops.rescale(im, 0.5).shape, (50, 49, 3))
+        with self.assertRaises(ValueError):
+            image_ops.rescale(im, 0.001)
+
+
+class TestResizeBatch(unittest.TestCase):
+    """Test deepfigures.utils.image_ops.resize_batch."""
+
+    def test_resize_batch(self):
+        """Test resize_batch matches resizing the images one at a time."""
+        rng = np.random.RandomState(1)
+        ims = [
+            rng.randint(0, 256, size=(100 + i, 80, 3), dtype=np.uint8)
+            for i in range(5)
+        ]
+        resized = image_ops.resize_batch(ims, (48, 64), max_workers=3)
+        self.assertEqual(len(resized), len(ims))
+        for im, res in zip(ims, resized):
+            np.testing.assert_array_equal(res, image_ops.resize(im, (48, 64)))
@@ -0,0 +1,60 @@
+"""Test deepfigures.utils.image_util."""
+
+import unittest
+
+import numpy as np
+
+from deepfigures.utils import image_util
+
+
+def reference_ink_extent(im, box, background_color):
+    """Find the ink extent by painting the outside of the box white."""
+    (x1, y1, x2, y2) = box
+    white_im = im.copy()
+    white_im[:, :x1] = background_color
+    white_im[:, x2:] = background_color
+    white_im[:y1, :] = background_color
+    white_im[y2:, :] = background_color
+    is_white = (white_im == background_color).all(axis=2)
+    ink_columns = np.where(~is_white.all(axis=0))[0]
+    ink_rows = np.where(~is_white.all(axis=1))[0]
+    if len(ink_columns) == 0:
+        return None
+    return (
+        ink_columns[0], ink_rows[0], ink_columns[-1] + 1, ink_rows[-1] + 1)
+
+
+class TestInkExtent(unittest.TestCase):
+    """Test ink_extent and InkIndex.ink_extent."""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.im = np.full((120, 90, 4), 255, dtype=np.uint8)
+        for _ in range(15):
+            (y, x) = (rng.randint(0, 120), rng.randint(0, 90))
+            (h, w) = (rng.randint(1, 10), rng.randint(1, 10))
+            self.im[y:y + h, x:x + w, rng.randint(0, 4)] = rng.randint(0, 255)
+        self.boxes = [
+            (0, 0, 90, 120),
+            (10, 20, 10, 80),
+            (50, 40, 30, 30),
+            (-20, 5, -3, 200),
+            (-200, -200, 200, 200),
+        ] + [
+            tuple(rng.randint(-130, 130, size=4)) for _ in range(500)
+        ]
+
+    def test_matches_reference(self):
+        """Test both implementations match cropping a whitened copy."""
+        ink_index = image_util.InkIndex(self.im, 255)
+        for box in self.boxes:
+            expected = reference_ink_extent(self.im, box, 255)
+            self.assertEqual(image_util.ink_extent(self.im, box, 255), expected)
+            self.assertEqual(ink_index.ink_extent(box), expected)
+
+    def test_blank_image(self):
+        """Test an image with no ink has no extent."""
+        im = np.full((20, 30, 3), 255, dtype=np.uint8)
+        self.assertIsNone(image_util.ink_extent(im, (0, 0, 30, 20), 255))
+        self.assertIsNone(
+            image_util.InkIndex(im, 255).ink_extent((0, 0, 30, 20)))
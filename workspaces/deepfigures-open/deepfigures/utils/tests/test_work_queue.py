@@ -0,0 +1,255 @@
+"""Test deepfigures.utils.work_queue."""
+
+import concurrent.futures
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from deepfigures.utils import work_queue
+
+
+def _touch(path):
+    if path.endswith('fail'):
+        raise ValueError(path)
+    with open(path, 'w'):
+        pass
+
+
+def _check_fan_out(path):
+    # the last item waits for the items before it to finish
+    budget = work_queue._budget
+    deadline = time.time() + (5 if path.endswith('last') else 0)
+    while not budget.fan_out_allowed() and time.time() < deadline:
+        time.sleep(0.01)
+    with open(path, 'w') as f:
+        f.write(str(budget.fan_out_allowed()))
+
+
+def _sleep(item):
+    time.sleep(0.1)
+
+
+def _check_unit_held(path):
+    # every unit but the one held by this item is free
+    budget = work_queue._budget
+    taken = 0
+    while budget.acquire(blocking=False):
+        taken += 1
+    for _ in range(taken):
+        budget.release()
+    with open(path, 'w') as f:
+        f.write(str(taken))
+
+
+def _count_free_units(budget, timeout=5.0):
+    # wait for the running items to give back their units
+    deadline = time.time() + timeout
+    while True:
+        free = 0
+        while budget.acquire(blocking=False):
+            free += 1
+        for _ in range(free):
+            budget.release()
+        if free == budget.size or time.time() > deadline:
+            return free
+        time.sleep(0.01)
+
+
+class TestRunWorkQueue(unittest.TestCase):
+    """Test deepfigures.utils.work_queue.run_work_queue."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+        self.items = [
+            os.path.join(self.tmpdir, 'item-%d' % i) for i in range(20)]
+        self.manifest_path = os.path.join(self.tmpdir, 'manifest/done.txt')
+        self.reports = []
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _run(self, items):
+        return work_queue.run_work_queue(
+            _touch, iter(items), processes=2, max_pending=3,
+            manifest_path=self.manifest_path, report=self.reports.append)
+
+    def test_run(self):
+        """Test func is called on every item and failures are counted."""
+        fail = os.path.join(self.tmpdir, 'fail')
+        progress = self._run(self.items + [fail])
+        for item in self.items:
+            self.assertTrue(os.path.exists(item))
+        self.assertEqual(
+            (progress.completed, progress.failed, progress.listed),
+            (20, 1, 21))
+        self.assertTrue(progress.listing_done)
+        self.assertEqual(progress.eta, 0)
+        self.assertEqual(self.reports, [progress])
+        with open(self.manifest_path) as f:
+            self.assertEqual(sorted(f.read().split()), sorted(self.items))
+
+    def test_restart(self):
+        """Test items in the manifest are skipped on restart."""
+        self._run(self.items[:5])
+        # an item cut off by a crash is run again
+        with open(self.manifest_path, 'a') as f:
+            f.write(self.items[5][:-1])
+        for item in self.items:
+            if os.path.exists(item):
+                os.remove(item)
+        progress = self._run(self.items)
+        self.assertEqual((progress.completed, progress.skipped), (15, 5))
+        for item in self.items:
+            self.assertEqual(os.path.exists(item), item not in self.items[:5])
+        manifest = work_queue.Manifest(self.manifest_path)
+        self.assertEqual(manifest.items, set(self.items))
+        manifest.close()
+
+    def test_fan_out(self):
+        """Test fan out is only allowed once the queue drains."""
+        items = self.items[:4] + [os.path.join(self.tmpdir, 'last')]
+        work_queue.run_work_queue(
+            _check_fan_out, iter(items), processes=2, max_pending=2,
+            concurrency=4, report=self.reports.append)
+        for (item, allowed) in [(items[0], 'False'), (items[-1], 'True')]:
+            with open(item) as f:
+                self.assertEqual(f.read(), allowed)
+
+    def test_parent_raises(self):
+        """Test an error collecting the results is raised, not hung on."""
+        errors = []
+
+        def fail_report(progress):
+            raise RuntimeError('report failed')
+
+        def run():
+            try:
+                work_queue.run_work_queue(
+                    _sleep, iter(self.items), processes=2, max_pending=2,
+                    report=fail_report, report_interval=0)
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout=20)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([str(e) for e in errors], ['report failed'])
+
+    def test_concurrency(self):
+        """Test each item holds a unit of the concurrency budget."""
+        work_queue.run_work_queue(
+            _check_unit_held, iter(self.items[:1]), processes=1,
+            concurrency=3, report=self.reports.append)
+        with open(self.items[0]) as f:
+            self.assertEqual(f.read(), '2')
+
+
+class TestParallelImap(unittest.TestCase):
+    """Test deepfigures.utils.work_queue.parallel_imap."""
+
+    def tearDown(self):
+        work_queue.set_concurrency_budget(None)
+
+    def _sleep_and_return(self, item):
+        time.sleep(0.05 * (item % 3))
+        self.threads.add(threading.current_thread().name)
+        return item
+
+    def test_serial(self):
+        """Test items run in the calling thread without a budget."""
+        self.threads = set()
+        self.assertEqual(
+            list(work_queue.parallel_imap(self._sleep_and_return, range(6))),
+            list(range(6)))
+        self.assertEqual(self.threads, {threading.current_thread().name})
+
+    def test_parallel(self):
+        """Test items run in parallel and results keep their order."""
+        work_queue.set_concurrency_budget(work_queue.ConcurrencyBudget(4))
+        self.threads = set()
+        start_time = time.time()
+        self.assertEqual(
+            list(work_queue.parallel_imap(self._sleep_and_return, range(12))),
+            list(range(12)))
+        self.assertLess(time.time() - start_time, 0.4)
+        self.assertGreater(len(self.threads), 1)
+
+    def test_nested(self):
+        """Test nested calls finish when the budget is used up."""
+        work_queue.set_concurrency_budget(work_queue.ConcurrencyBudget(2))
+
+        def outer(item):
+            return sum(work_queue.parallel_imap(
+                lambda x: x * item, range(10)))
+
+        self.assertEqual(
+            list(work_queue.parallel_imap(outer, range(8))),
+            [45 * item for item in range(8)])
+
+    def test_stop_early(self):
+        """Test items are not started once the caller stops."""
+        work_queue.set_concurrency_budget(work_queue.ConcurrencyBudget(2))
+        called = []
+
+        def record(item):
+            called.append(item)
+            return item
+
+        for item in work_queue.parallel_imap(record, range(100)):
+            if item == 3:
+                break
+        self.assertLess(len(called), 10)
+
+    def test_close_returns_units(self):
+        """Test the units of started items are given back once closed."""
+        budget = work_queue.ConcurrencyBudget(4)
+        work_queue.set_concurrency_budget(budget)
+        # with one thread, the items after the first two wait in its
+        # queue and are cancelled
+        work_queue._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1)
+        running = threading.Event()
+        gate = threading.Event()
+        called = []
+
+        def wait(item):
+            called.append(item)
+            if item > 0:
+                running.set()
+                gate.wait(5)
+            return item
+
+        results = work_queue.parallel_imap(wait, range(100))
+        self.assertEqual(next(results), 0)
+        self.assertTrue(running.wait(5))
+        results.close()
+        gate.set()
+        self.assertEqual(_count_free_units(budget), 4)
+        self.assertEqual(called, [0, 1])
+
+    def test_should_stop(self):
+        """Test running items see the caller stop."""
+        work_queue.set_concurrency_budget(work_queue.ConcurrencyBudget(2))
+        running = threading.Event()
+        stopped = []
+
+        def wait_for_stop(item):
+            if item > 0:
+                running.set()
+                deadline = time.time() + 5
+                while not work_queue.should_stop() and time.time() < deadline:
+                    time.sleep(0.01)
+                stopped.append(work_queue.should_stop())
+            return item
+
+        results = work_queue.parallel_imap(wait_for_stop, range(10))
+        self.assertEqual(next(results), 0)
+        self.assertTrue(running.wait(5))
+        self.assertFalse(work_queue.should_stop())
+        results.close()
+        self.assertEqual(_count_free_units(work_queue._budget), 2)
+        self.assertEqual(set(stopped), {True})
@@ -0,0 +1,414 @@
+"""A work queue which streams items to a pool of processes.
+
+Items are read lazily from an iterable and handed to the workers as they
+become free, with only a bounded number waiting at a time, so a slow item
+never holds up the rest and listing the items overlaps the work on them.
+Completed items may be recorded in a manifest, so that an interrupted run
+can be restarted without repeating them.
+
+Within an item, work can fan out to threads with parallel_imap. A
+ConcurrencyBudget shared by every worker process caps the tasks running at
+once, so the threads only use the cores which other items leave idle,
+such as at the end of a run.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from typing import (
+    Any, Callable, Deque, Iterable, Iterator, Optional, Set, Tuple, TypeVar)
+
+from deepfigures.utils import file_util
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class ConcurrencyBudget(object):
+    """A number of units, each letting one task run, shared between the
+    threads and processes of a run.
+
+    A budget must be created before the processes sharing it, and passed
+    to them when they are started, e.g. as an argument to a Pool's
+    initializer. Using it as a context manager holds one unit.
+
+    parallel_imap only takes the units left free once fan out is
+    allowed, so that its threads don't take units from whole processes
+    waiting for one. run_work_queue allows it once its queue drains.
+
+    :param bool fan_out: whether to allow fan out from the start.
+
+    :ivar int size: the number of units.
+    """
+
+    def __init__(self, size: int, fan_out: bool=True) -> None:
+        if size < 1:
+            raise ValueError('size must be at least 1.')
+        self.size = size
+        self._semaphore = multiprocessing.BoundedSemaphore(size)
+        self._fan_out = multiprocessing.Event()
+        if fan_out:
+            self._fan_out.set()
+
+    def acquire(self, blocking: bool=True) -> bool:
+        """Take a unit, waiting for one to be free if blocking, and return
+        whether one was taken."""
+        return self._semaphore.acquire(blocking)
+
+    def release(self) -> None:
+        """Give back a unit."""
+        self._semaphore.release()
+
+    def allow_fan_out(self) -> None:
+        """Let parallel_imap take the free units, in every process."""
+        self._fan_out.set()
+
+    def fan_out_allowed(self) -> bool:
+        """Return whether parallel_imap may take the free units."""
+        return self._fan_out.is_set()
+
+    def __enter__(self) -> 'ConcurrencyBudget':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+
+# The budget of this process, and the executor running its threads
+_budget = None  # type: Optional[ConcurrencyBudget]
+_executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+_executor_lock = threading.Lock()
+# The stop flag of the parallel_imap call whose task a thread is running
+_task_state = threading.local()
+
+
+def set_concurrency_budget(budget: Optional[ConcurrencyBudget]) -> None:
+    """Set the budget parallel_imap draws on in this process.
+
+    run_work_queue sets it in its workers; set it directly to fan out
+    work in a single process. With no budget, parallel_imap is serial.
+    """
+    global _budget, _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _budget = budget
+        _executor = None
+
+
+def _get_executor(budget: ConcurrencyBudget) -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Every task submitted holds a unit, so none ever waits for
+            # a thread
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=budget.size)
+        return _executor
+
+
+def should_stop() -> bool:
+    """Return whether the caller of the parallel_imap running this task
+    has stopped reading its results.
+
+    Tasks may check this before an expensive step and return early, as
+    their results will be discarded. Always False outside of the tasks
+    parallel_imap starts on its threads.
+    """
+    stopped = getattr(_task_state, 'stopped', None)
+    return stopped is not None and stopped.is_set()
+
+
+def _run_with_unit(
+    budget: ConcurrencyBudget,
+    stopped: threading.Event,
+    func: Callable[[T], R],
+    item: T
+) -> Optional[R]:
+    _task_state.stopped = stopped
+    try:
+        if stopped.is_set():
+            return None
+        return func(item)
+    finally:
+        _task_state.stopped = None
+        budget.release()
+
+
+def parallel_imap(func: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+    """Yield func of each of items, in order, running them in parallel as
+    far as this process's ConcurrencyBudget allows.
+
+    Before each result is waited for, the following items are started on
+    threads of a shared executor while units of the budget are free.
+    Otherwise the next item is run in the calling thread, so calls may be
+    nested without deadlocking, and with no free units this is the same
+    as a serial loop. Items are read lazily, so if the caller stops
+    early the items not yet started are never run. Once the generator
+    is closed, the started items which are not yet running are
+    cancelled and their units given back, and those already running
+    may end early by checking should_stop.
+
+    :param Callable[[T], R] func: the function to call, which must be
+      safe to call from several threads at once.
+    :param Iterable[T] items: the items.
+
+    :yields: func of each item, in the order of items. An exception
+      raised by func is raised when its result is reached.
+    """
+    budget = _budget
+    items = iter(items)
+    started = collections.deque()  # type: Deque[concurrent.futures.Future]
+    items_done = False
+    stopped = threading.Event()
+    try:
+        while True:
+            while (budget is not None and not items_done and
+                   budget.fan_out_allowed() and
+                   budget.acquire(blocking=False)):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    budget.release()
+                    items_done = True
+                    break
+                started.append(_get_executor(budget).submit(
+                    _run_with_unit, budget, stopped, func, item))
+            if len(started) > 0:
+                yield started.popleft().result()
+            elif items_done:
+                return
+            else:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                yield func(item)
+    finally:
+        # Reached with items still started if the caller closed the
+        # generator or func raised
+        stopped.set()
+        for future in started:
+            if future.cancel():
+                budget.release()
+
+
+class Manifest(object):
+    """A file listing the completed items, one per line.
+
+    :ivar str path: the path to the manifest.
+    :ivar Set[str] items: the completed items.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.items = set()  # type: Set[str]
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                contents = f.read()
+            # A crash may have cut off the last line while it was being
+            # written, in which case it is dropped and that item run again
+            complete_len = contents.rfind(b'\n') + 1
+            if complete_len < len(contents):
+                os.truncate(path, complete_len)
+            self.items.update(
+                line for line in
+                contents[:complete_len].decode('utf-8').split('\n') if line)
+        else:
+            file_util.safe_makedirs(os.path.dirname(os.path.abspath(path)))
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, item: str) -> None:
+        """Record item as completed."""
+        self.items.add(item)
+        self._file.write(item + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Progress(object):
+    """The progress of a run of a work queue.
+
+    :ivar int completed: the number of items completed.
+    :ivar int failed: the number of items which raised an exception.
+    :ivar int skipped: the number of items skipped as already in the
+      manifest.
+    :ivar int listed: the number of items read from the iterable and not
+      skipped.
+    :ivar bool listing_done: whether the iterable has been exhausted.
+    :ivar float elapsed: the seconds since the run started.
+    """
+    __slots__ = (
+        'completed', 'failed', 'skipped', 'listed', 'listing_done', 'elapsed')
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.listed = 0
+        self.listing_done = False
+        self.elapsed = 0.0
+
+    @property
+    def rate(self) -> float:
+        """The number of items finished per second."""
+        if self.elapsed == 0:
+            return 0.0
+        return (self.completed + self.failed) / self.elapsed
+
+    @property
+    def eta(self) -> Optional[float]:
+        """The seconds until every item is finished at the current rate, or
+        None if the items are still being listed."""
+        if not self.listing_done or self.rate == 0:
+            return None
+        return (self.listed - self.completed - self.failed) / self.rate
+
+    def __str__(self) -> str:
+        eta = self.eta
+        return '%d completed, %d failed, %d skipped of %d%s listed; %.2f/s, ETA %s' % (
+            self.completed, self.failed, self.skipped,
+            self.listed + self.skipped, '' if self.listing_done else '+',
+            self.rate, 'unknown' if eta is None else '%.0fs' % eta)
+
+
+def _call(func: Callable[[Any], Any], item: Any) -> Tuple[Any, Optional[str]]:
+    try:
+        if _budget is None:
+            func(item)
+        else:
+            with _budget:
+                func(item)
+    except Exception:
+        return item, traceback.format_exc()
+    return item, None
+
+
+def run_work_queue(
+    func: Callable[[str], Any],
+    items: Iterable[str],
+    processes: Optional[int]=None,
+    max_pending: Optional[int]=None,
+    manifest_path: Optional[str]=None,
+    report: Callable[[Progress], None]=logger.info,
+    report_interval: float=60.0,
+    concurrency: Optional[int]=None
+) -> Progress:
+    """Call func on each of items in a pool of processes.
+
+    Items are dispatched one at a time, in the order they finish rather
+    than the order given. An item for which func raises an exception is
+    logged and counted as failed, and the run carries on.
+
+    :param Callable[[str], Any] func: the function to call, which must be
+      picklable. Its return value is discarded.
+    :param Iterable[str] items: the items, which are read lazily.
+    :param Optional[int] processes: the number of worker processes,
+      os.cpu_count() by default.
+    :param Optional[int] max_pending: the most items read from items but
+      not yet finished, twice processes by default.
+    :param Optional[str] manifest_path: if given, items listed in the
+      manifest at this path are skipped and completed items are added to
+      it, see Manifest. Failed items are not added, so they are retried
+      when the run is restarted.
+    :param Callable[[Progress], None] report: called with the progress
+      every report_interval seconds and once at the end.
+    :param float report_interval: the seconds between reports.
+    :param Optional[int] concurrency: if given, the size of a
+      ConcurrencyBudget shared by the workers. Each item holds a unit
+      while it runs, and once every item has been listed and fewer are
+      pending than there are processes, func may use the units left
+      free by idle workers through parallel_imap.
+
+    :returns: the progress of the finished run.
+    """
+    processes = processes or os.cpu_count()
+    max_pending = max_pending or 2 * processes
+    manifest = Manifest(manifest_path) if manifest_path is not None else None
+    pending = threading.BoundedSemaphore(max_pending)
+    progress = Progress()
+    budget = None
+    if concurrency is not None:
+        budget = ConcurrencyBudget(concurrency, fan_out=False)
+    # set when the main thread stops collecting results
+    stopped = threading.Event()
+
+    def update_fan_out() -> None:
+        # Until some processes have no items left to run, their units
+        # are only freed briefly between items, and fanning out into
+        # them would keep the next items waiting
+        if (budget is not None and progress.listing_done and
+                progress.listed - progress.completed - progress.failed <
+                processes):
+            budget.allow_fan_out()
+
+    def produce() -> Iterator[str]:
+        # Run by the pool's task handler thread, which blocks here until
+        # the main thread collects a result. The pool joins this thread
+        # when it is terminated, so it must not block once stopped.
+        for item in items:
+            if manifest is not None and item in manifest:
+                progress.skipped += 1
+                continue
+            while not pending.acquire(timeout=0.1):
+                if stopped.is_set():
+                    return
+            if stopped.is_set():
+                return
+            progress.listed += 1
+            yield item
+        progress.listing_done = True
+        update_fan_out()
+
+    start_time = time.time()
+    last_report = start_time
+    try:
+        with multiprocessing.Pool(
+                processes=processes,
+                initializer=set_concurrency_budget,
+                initargs=(budget,)) as pool:
+            try:
+                for (item, error) in pool.imap_unordered(
+                        functools.partial(_call, func), produce()):
+                    pending.release()
+                    if error is None:
+                        progress.completed += 1
+                        if manifest is not None:
+                            manifest.add(item)
+                    else:
+                        progress.failed += 1
+                        logger.error('Failed on %s:\n%s' % (item, error))
+                    update_fan_out()
+                    now = time.time()
+                    if now - last_report >= report_interval:
+                        progress.elapsed = now - start_time
+                        report(progress)
+                        last_report = now
+            finally:
+                # e.g. if report raised, unblock produce before the pool
+                # is terminated
+                stopped.set()
+    finally:
+        if manifest is not None:
+            manifest.close()
+    progress.elapsed = time.time() - start_time
+    report(progress)
+    return progress
@@ -17,6 +17,7 @@ from scripts import (
     detectfigures,
     generatearxiv,
     generatepubmed,
+    ingestfigures,
     testunits)
 
 
@@ -59,6 +60,7 @@ subcommands = [
     detectfigures.detectfigures,
     generatearxiv.generatearxiv,
     generatepubmed.generatepubmed,
+    ingestfigures.ingestfigures,
     testunits.testunits
 ]
 
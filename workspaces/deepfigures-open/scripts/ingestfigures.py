@@ -0,0 +1,75 @@
+"""Compact figure JSON files into a columnar figure store.
+
+See ``ingestfigures.py --help`` for more information.
+"""
+
+import logging
+
+import click
+
+
+logger = logging.getLogger(__name__)
+
+
+@click.command(
+    context_settings={
+        'help_option_names': ['-h', '--help']
+    })
+@click.option(
+    '--results-dir',
+    type=click.Path(exists=True, file_okay=False),
+    help='a directory of deepfigures-results.json files, e.g. the'
+         ' output directory of detectfigures.')
+@click.option(
+    '--pubmed-dir',
+    type=click.Path(exists=True, file_okay=False),
+    help='a directory of PubMed figure JSON files, e.g.'
+         ' LOCAL_FIGURE_JSON_DIR.')
+@click.option(
+    '--arxiv-dir',
+    type=click.Path(exists=True, file_okay=False),
+    help='a directory of arXiv figure JSON files, e.g.'
+         ' ARXIV_FIGURE_JSON_DIR.')
+@click.option(
+    '--rows-per-file',
+    type=int,
+    default=500000,
+    help='write a Parquet file each time this many figures are read.')
+@click.argument(
+    'store_directory',
+    type=click.Path(file_okay=False))
+def ingestfigures(
+        store_directory,
+        results_dir=None,
+        pubmed_dir=None,
+        arxiv_dir=None,
+        rows_per_file=500000):
+    """Compact figure JSON files into the store at STORE_DIRECTORY.
+
+    Each of the given directories is searched recursively, and its
+    figures replace that source's partition of the store.
+    """
+    # import lazily to speed up response time for returning help text
+    from deepfigures.extraction import figure_store
+
+    directories = {
+        'deepfigures': results_dir,
+        'pubmed': pubmed_dir,
+        'arxiv': arxiv_dir,
+    }
+    if not any(directories.values()):
+        raise click.UsageError(
+            'Pass at least one of --results-dir, --pubmed-dir or --arxiv-dir.')
+    for (source, directory) in directories.items():
+        if directory is None:
+            continue
+        json_paths = figure_store.find_json_files(directory, source)
+        logger.info(
+            'Ingesting %d %s JSON files from %s',
+            len(json_paths), source, directory)
+        figure_store.ingest(
+            store_directory, json_paths, source, rows_per_file=rows_per_file)
+
+
+if __name__ == '__main__':
+    ingestfigures()